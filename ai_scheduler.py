@@ -0,0 +1,134 @@
+# ai_scheduler.py
+"""
+Планировщик исходящих запросов к ИИ.
+Ограничивает число одновременных запросов к DeepSeek и ставит остальные
+в очередь: у каждого пользователя не больше одного ожидающего вопроса,
+новый вопрос занимает место старого в очереди. Обслуживание - по порядку
+постановки, пользователь с уже выполняющимся запросом пропускается.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from config import AI_MAX_IN_FLIGHT
+
+POSITION_UPDATE_INTERVAL = 2.0  # как часто сообщать позицию в очереди (сек)
+
+
+class QuestionReplaced(Exception):
+    """Ожидавший вопрос заменён более новым вопросом того же пользователя"""
+
+
+class _Ticket:
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.enqueued_at = time.monotonic()
+        self.granted = asyncio.get_running_loop().create_future()
+
+
+class AIScheduler:
+    def __init__(self, max_in_flight: int = AI_MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self._queue = OrderedDict()   # user_id -> _Ticket, в порядке постановки
+        self._running_users = set()
+        # Метрики
+        self.completed = 0
+        self.replaced = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.upstream_total = 0.0
+        self.upstream_max = 0.0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._running_users)
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def position(self, user_id: int) -> int:
+        """Позиция в очереди, начиная с 1 (0 - не в очереди)"""
+        for i, uid in enumerate(self._queue, 1):
+            if uid == user_id:
+                return i
+        return 0
+
+    def _dispatch(self):
+        for uid in list(self._queue):
+            if self.in_flight >= self.max_in_flight:
+                return
+            if uid in self._running_users:
+                continue
+            ticket = self._queue.pop(uid)
+            self._running_users.add(uid)
+            ticket.granted.set_result(time.monotonic())
+
+    def _enqueue(self, user_id: int) -> _Ticket:
+        ticket = _Ticket(user_id)
+        old = self._queue.get(user_id)
+        if old is not None and not old.granted.done():
+            old.granted.set_exception(QuestionReplaced())
+            self.replaced += 1
+        # Присваивание существующему ключу сохраняет место пользователя в очереди
+        self._queue[user_id] = ticket
+        self._dispatch()
+        return ticket
+
+    @asynccontextmanager
+    async def slot(self, user_id: int, on_position=None):
+        """Дождаться своей очереди и выполнить запрос внутри блока.
+
+        on_position(pos) - корутина, вызывается при изменении позиции в очереди.
+        Поднимает QuestionReplaced, если пользователь прислал новый вопрос раньше,
+        чем подошла очередь этого.
+        """
+        ticket = self._enqueue(user_id)
+        last_position = None
+        try:
+            while not ticket.granted.done():
+                pos = self.position(user_id)
+                if on_position is not None and pos and pos != last_position:
+                    last_position = pos
+                    await on_position(pos)
+                try:
+                    await asyncio.wait_for(asyncio.shield(ticket.granted), POSITION_UPDATE_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            granted_at = ticket.granted.result()
+        except BaseException:
+            # Отмена или замена: убираем свой билет из очереди
+            if self._queue.get(user_id) is ticket:
+                del self._queue[user_id]
+            if ticket.granted.done() and not ticket.granted.exception():
+                self._running_users.discard(user_id)
+                self._dispatch()
+            raise
+
+        wait = granted_at - ticket.enqueued_at
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        try:
+            yield
+        finally:
+            upstream = time.monotonic() - granted_at
+            self.upstream_total += upstream
+            self.upstream_max = max(self.upstream_max, upstream)
+            self.completed += 1
+            self._running_users.discard(user_id)
+            self._dispatch()
+
+    def stats(self) -> dict:
+        done = self.completed or 1
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "completed": self.completed,
+            "replaced": self.replaced,
+            "wait_avg": self.wait_total / done,
+            "wait_max": self.wait_max,
+            "upstream_avg": self.upstream_total / done,
+            "upstream_max": self.upstream_max,
+        }
@@ -0,0 +1,61 @@
+# answer_cache.py
+"""
+Кэш ответов ИИ на первые вопросы по конкурсу.
+Ключ - (id конкурса, хэш файла положения, нормализованный вопрос), поэтому
+замена PDF автоматически делает старые ответы недоступными. Записи живут
+AI_CACHE_TTL секунд и вытесняются по LRU; хранятся в SQLite и переживают рестарт.
+"""
+
+import re
+
+from config import AI_CACHE_TTL, AI_CACHE_MAX_ENTRIES
+from database import run_db, get_contest_file_hash, get_cached_answer, save_cached_answer, count_cached_answers
+
+hits = 0
+misses = 0
+
+
+def normalize_question(text: str) -> str:
+    """Регистр, ё/е, пунктуация и лишние пробелы не должны влиять на ключ"""
+    text = text.lower().replace("ё", "е")
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def _lookup(contest_id: int, question: str):
+    file_hash = get_contest_file_hash(contest_id)
+    if file_hash is None:
+        return None
+    return get_cached_answer(contest_id, file_hash, normalize_question(question), AI_CACHE_TTL)
+
+
+def _store(contest_id: int, question: str, answer: str):
+    file_hash = get_contest_file_hash(contest_id)
+    if file_hash is not None:
+        save_cached_answer(contest_id, file_hash, normalize_question(question), answer,
+                           AI_CACHE_TTL, AI_CACHE_MAX_ENTRIES)
+
+
+async def lookup_answer(contest_id: int, question: str):
+    """Ответ из кэша или None (учитывается в счётчиках попаданий/промахов)"""
+    global hits, misses
+    answer = await run_db(_lookup, contest_id, question)
+    if answer is None:
+        misses += 1
+    else:
+        hits += 1
+    return answer
+
+
+async def store_answer(contest_id: int, question: str, answer: str):
+    await run_db(_store, contest_id, question, answer)
+
+
+async def get_stats() -> dict:
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+        "entries": await run_db(count_cached_answers),
+    }
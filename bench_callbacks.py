@@ -0,0 +1,121 @@
+# bench_callbacks.py
+"""
+Бенчмарк разбора инлайн-кнопок.
+Сравнивает старую цепочку startswith + split (как было в contests/AI хендлерах)
+с CallbackData + словарным роутером на всех видах кнопок конкурсов и ИИ.
+Хендлеры - пустые заглушки, меряется только выбор хендлера и разбор полей.
+Запуск: python bench_callbacks.py [кол-во нажатий]
+"""
+
+import sys
+import time
+
+from callbacks import CallbackRouter, ContestsCallback, ContestAction, AICallback, AIAction
+
+
+# ---------------- СТАРАЯ СХЕМА ----------------
+def legacy_dispatch(data: str):
+    """Копия прежних цепочек if из contests_inline_callback_handler и ai_inline_callback_handler"""
+    if data.startswith("contests_"):
+        if data.startswith("contests_show_dept_"):
+            return "show_dept", int(data.split("_")[3])
+        if data.startswith("contests_upload_dept_"):
+            return "upload_dept", int(data.split("_")[3])
+        if data.startswith("contests_delete_dept_"):
+            return "delete_dept", int(data.split("_")[3])
+        if data.startswith("contests_download_"):
+            return "download", int(data.split("_")[2])
+        if data.startswith("contests_delete_"):
+            return "delete", int(data.split("_")[2])
+        if data == "contests_back_to_depts":
+            return "back", 0
+        if data.startswith("contests_cancel_"):
+            return "cancel", 0
+    if data.startswith("ai_"):
+        if data.startswith("ai_dept_"):
+            return "dept", int(data.split("_")[2])
+        if data.startswith("ai_select_"):
+            return "select", int(data.split("_")[2])
+        if data == "ai_back_to_depts":
+            return "back", 0
+        if data == "ai_end_dialog":
+            return "end", 0
+    return None
+
+
+LEGACY_BUTTONS = [
+    "contests_show_dept_3", "contests_upload_dept_3", "contests_delete_dept_3",
+    "contests_download_1542", "contests_delete_1542", "contests_back_to_depts", "contests_cancel_show",
+    "ai_dept_3", "ai_select_1542", "ai_back_to_depts", "ai_end_dialog",
+]
+
+
+# ---------------- НОВАЯ СХЕМА ----------------
+contests_router = CallbackRouter(ContestsCallback)
+ai_router = CallbackRouter(AICallback)
+for action in ContestAction:
+    contests_router.route(action)(action.value)
+for action in AIAction:
+    ai_router.route(action)(action.value)
+ROUTERS = {"contests": contests_router, "ai": ai_router}
+
+NEW_BUTTONS = [
+    ContestsCallback(action=ContestAction.SHOW_DEPT, id=3).pack(),
+    ContestsCallback(action=ContestAction.UPLOAD_DEPT, id=3).pack(),
+    ContestsCallback(action=ContestAction.DELETE_DEPT, id=3).pack(),
+    ContestsCallback(action=ContestAction.DOWNLOAD, id=1542).pack(),
+    ContestsCallback(action=ContestAction.DELETE, id=1542).pack(),
+    ContestsCallback(action=ContestAction.BACK).pack(),
+    ContestsCallback(action=ContestAction.CANCEL).pack(),
+    AICallback(action=AIAction.DEPT, id=3).pack(),
+    AICallback(action=AIAction.SELECT, id=1542).pack(),
+    AICallback(action=AIAction.BACK).pack(),
+    AICallback(action=AIAction.END).pack(),
+]
+
+
+def router_dispatch(data: str):
+    # в боте роутер выбирает фильтр aiogram по префиксу; здесь - тот же словарь
+    router = ROUTERS.get(data.split(":", 1)[0])
+    handler, cb = router.resolve(data)
+    return handler, cb.id
+
+
+def uncached_dispatch(data: str):
+    """Без кэша разбора: каждое нажатие проходит через pydantic"""
+    router = ROUTERS.get(data.split(":", 1)[0])
+    cb = router._parse(data)
+    return router.routes.get(cb.action), cb.id
+
+
+def run(name: str, dispatch, buttons: list, count: int):
+    n = len(buttons)
+    for data in buttons:  # проверка: все кнопки распознаются
+        assert dispatch(data) is not None and dispatch(data)[0] is not None, data
+    started = time.perf_counter()
+    for i in range(count):
+        dispatch(buttons[i % n])
+    elapsed = time.perf_counter() - started
+    print(f"{name:<28} {count / elapsed:>12,.0f} нажатий/с   {elapsed / count * 1e6:6.2f} мкс на нажатие")
+
+    # по видам кнопок: у цепочки if время зависит от позиции проверки
+    for data in buttons:
+        started = time.perf_counter()
+        for _ in range(count // n):
+            dispatch(data)
+        per_call = (time.perf_counter() - started) / (count // n) * 1e6
+        print(f"   {data:<34} {per_call:6.2f} мкс")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    print(f"Кнопок: {len(NEW_BUTTONS)} видов, нажатий: {count}\n")
+    run("startswith-цепочка (было)", legacy_dispatch, LEGACY_BUTTONS, count)
+    print()
+    run("CallbackData без кэша", uncached_dispatch, NEW_BUTTONS, count)
+    print()
+    run("CallbackData + словарь", router_dispatch, NEW_BUTTONS, count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# bench_db.py
+"""
+Микро-бенчмарк слоя БД.
+Сравнивает задержку обработки колбэков: старый подход (sqlite3.connect на
+каждый запрос прямо в event loop) против пула долгоживущих соединений,
+работающего вне event loop. Запуск: python bench_db.py [кол-во колбэков]
+"""
+
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import database
+
+CALLBACKS = 1000
+CONTESTS = 500
+TELEGRAM_RTT = 0.005  # имитация ответа в Telegram (callback.answer / edit_text)
+
+
+def _prepare_db(path):
+    """Копия БД с синтетическими конкурсами, чтобы не трогать рабочую"""
+    if os.path.exists("data/contests.db"):
+        shutil.copy("data/contests.db", path)
+    database.DB_PATH = path
+    database.init_db()
+    conn = database.get_connection()
+    departments = [d[0] for d in database.get_all_departments()]
+    with conn:
+        conn.executemany(
+            "INSERT INTO contests (title, contest_date, file_name, file_path, department_id) VALUES (?, ?, ?, ?, ?)",
+            [(f"Конкурс {i}", f"{random.randint(1, 28):02d}.{random.randint(1, 12):02d}.2024",
+              f"{i}.pdf", f"contests_files/{i}.pdf", random.choice(departments))
+             for i in range(CONTESTS)]
+        )
+    return departments
+
+
+# ---------------- СТАРЫЙ ПОДХОД ----------------
+def _legacy_query(path, sql, args=()):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute(sql, args)
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+
+async def legacy_callback(path, dept_id):
+    # Клавиатура отделов + список конкурсов + карточка конкурса
+    _legacy_query(path, "SELECT id, name FROM departments ORDER BY name")
+    contests = _legacy_query(path, "SELECT id, title, contest_date, file_name, file_path FROM contests "
+                                   "WHERE department_id = ? ORDER BY contest_date DESC", (dept_id,))
+    if contests:
+        _legacy_query(path, "SELECT c.id, c.title FROM contests c LEFT JOIN departments d "
+                            "ON c.department_id = d.id WHERE c.id = ?", (contests[0][0],))
+    await asyncio.sleep(TELEGRAM_RTT)
+
+
+# ---------------- ПУЛ СОЕДИНЕНИЙ ----------------
+async def pooled_callback(path, dept_id):
+    await database.get_all_departments_async()
+    contests = await database.get_contests_by_department_async(dept_id)
+    if contests:
+        await database.get_contest_by_id_async(contests[0][0])
+    await asyncio.sleep(TELEGRAM_RTT)
+
+
+async def _run(handler, path, departments, count):
+    """Все колбэки приходят разом; задержка считается от момента прихода"""
+    latencies = []
+    lags = []
+    done = asyncio.Event()
+
+    async def one(dept_id, arrived):
+        await handler(path, dept_id)
+        latencies.append((time.perf_counter() - arrived) * 1000)
+
+    async def ticker():
+        # Насколько event loop опаздывает с обработкой других апдейтов
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - start - 0.001) * 1000)
+
+    tick = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(one(random.choice(departments), started) for _ in range(count)))
+    total = time.perf_counter() - started
+    done.set()
+    await tick
+    return latencies, lags, total
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _report(name, latencies, lags, total):
+    print(f"{name:<8} p50 = {statistics.median(latencies):8.2f} мс   "
+          f"p99 = {_percentile(latencies, 0.99):8.2f} мс   "
+          f"лаг loop max = {max(lags):8.2f} мс   всего = {total:6.2f} с")
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else CALLBACKS
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "bench.db")
+    try:
+        departments = _prepare_db(path)
+        print(f"Симулируем {count} одновременных колбэков, {CONTESTS} конкурсов\n")
+        _report("legacy", *await _run(legacy_callback, path, departments, count))
+        _report("pool", *await _run(pooled_callback, path, departments, count))
+    finally:
+        database.close_db()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+# bench_deepseek.py
+"""
+Тестовый стенд клиента DeepSeek с локальным фейковым сервером.
+Сравнивает задержку запроса: новая ClientSession на каждый вопрос (как было)
+против общего keep-alive клиента. Каждый 10-й запрос сервер сначала
+отвечает 429, чтобы проверить повторы с джиттером.
+Запуск: python bench_deepseek.py [кол-во запросов]
+"""
+
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("ADMIN_ID", "0")
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+
+import aiohttp
+from aiohttp import web
+
+from deepseek import DeepSeekClient
+
+HOST, PORT = "127.0.0.1", 8765
+REQUESTS = 200
+SERVER_DELAY = 0.005  # "время генерации" ответа фейковой моделью
+
+
+def make_app():
+    state = {"count": 0, "throttled": set()}
+
+    async def chat(request: web.Request):
+        body = await request.json()
+        state["count"] += 1
+        rid = body["messages"][-1]["content"]
+        if rid.endswith("0") and rid not in state["throttled"]:
+            state["throttled"].add(rid)
+            return web.json_response({"error": "rate limit"}, status=429, headers={"Retry-After": "0.01"})
+        await asyncio.sleep(SERVER_DELAY)
+        return web.json_response({
+            "choices": [{"message": {"role": "assistant", "content": f"ответ на {rid}"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5},
+        })
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat)
+    return app, state
+
+
+async def per_request_session(base_url, i):
+    payload = {"model": "deepseek-chat", "messages": [{"role": "user", "content": str(i)}], "max_tokens": 150}
+    for _ in range(5):
+        async with aiohttp.ClientSession() as sess:
+            async with sess.post(f"{base_url}/chat/completions", json=payload, timeout=60) as resp:
+                if resp.status == 429:
+                    await asyncio.sleep(0.01)
+                    continue
+                return await resp.json()
+
+
+async def measure(name, call, count):
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        await call(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:<22} p50 = {statistics.median(latencies):7.2f} мс   "
+          f"среднее = {statistics.mean(latencies):7.2f} мс   p99 = {p99:7.2f} мс")
+    return statistics.mean(latencies)
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else REQUESTS
+    logging.getLogger("deepseek").setLevel(logging.ERROR)
+    app, state = make_app()
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+    base_url = f"http://{HOST}:{PORT}/v1"
+    try:
+        print(f"Фейковый DeepSeek на {base_url}, {count} запросов последовательно\n")
+        old = await measure("сессия на запрос", lambda i: per_request_session(base_url, i), count)
+        state["throttled"].clear()
+        async with DeepSeekClient("bench", base_url=base_url, backoff=0.01) as client:
+            messages = lambda i: [{"role": "user", "content": str(i)}]
+            new = await measure("общий keep-alive клиент", lambda i: client.chat(messages(i)), count)
+        print(f"\nЭкономия на запрос: {old - new:.2f} мс (без TLS; с реальным HTTPS разница больше)")
+        print(f"Запросов к серверу за оба прогона (с повторами после 429): {state['count']}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
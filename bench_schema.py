@@ -0,0 +1,131 @@
+# bench_schema.py
+"""
+Бенчмарк запросов списков конкурсов на синтетической базе (по умолчанию 100 000 конкурсов).
+"Было" - схема без индекса по отделу и дате: выборка всего отдела с сортировкой
+по текстовому contest_date и листание через OFFSET. "Стало" - схема после миграций:
+страница по курсору (contest_day, id) из индекса idx_contests_dept_day.
+Для каждого запроса печатается медиана и план выполнения SQLite.
+Запуск: python bench_schema.py [кол-во конкурсов]
+"""
+
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import database
+
+CONTESTS = 100_000
+REPEAT = 30
+PAGE = database.CONTESTS_PAGE_SIZE
+DEEP_PAGE = 200  # номер страницы для "глубокого" листания
+
+
+def _prepare_db(path, count):
+    database.DB_PATH = path
+    database.init_db()
+    conn = database.get_connection()
+    departments = [d[0] for d in database.get_all_departments()]
+    rows = []
+    for i in range(count):
+        day = f"{random.randint(1, 28):02d}.{random.randint(1, 12):02d}.{random.randint(2015, 2026)}"
+        rows.append((f"Конкурс {i}", day, database.parse_contest_day(day), f"{i}.pdf",
+                     f"contests_files/{i:064x}.pdf", random.choice(departments), f"{i:064x}", 100_000 + i))
+    with conn:
+        conn.executemany(
+            "INSERT INTO contests (title, contest_date, contest_day, file_name, file_path, department_id, file_hash, file_size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("ANALYZE")
+    return departments
+
+
+def _legacy_copy(path):
+    """Копия базы со схемой "как было": без индекса отдел + дата"""
+    legacy = path + ".legacy"
+    database.close_db()
+    shutil.copy(path, legacy)
+    conn = sqlite3.connect(legacy)
+    conn.execute("DROP INDEX idx_contests_dept_day")
+    conn.execute("ANALYZE")
+    conn.commit()
+    return conn
+
+
+def _measure(conn, sql, args_fn):
+    times = []
+    for _ in range(REPEAT):
+        args = args_fn()
+        started = time.perf_counter()
+        conn.execute(sql, args).fetchall()
+        times.append((time.perf_counter() - started) * 1000)
+    plan = " | ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, args_fn()))
+    return statistics.median(times), plan
+
+
+def _report(name, result):
+    ms, plan = result
+    print(f"  {name:<34} {ms:9.3f} мс   {plan}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else CONTESTS
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "bench.db")
+    try:
+        started = time.perf_counter()
+        departments = _prepare_db(path, count)
+        print(f"{count} конкурсов в {len(departments)} отделах, база за {time.perf_counter() - started:.1f} с, "
+              f"медиана из {REPEAT} запросов\n")
+
+        # курсор глубокой страницы берём заранее из новой схемы
+        conn = database.get_connection()
+        dept = departments[0]
+        deep = conn.execute("SELECT contest_day, id FROM contests WHERE department_id = ? "
+                            "ORDER BY contest_day DESC, id DESC LIMIT 1 OFFSET ?", (dept, DEEP_PAGE * PAGE - 1)).fetchone()
+        random_dept = lambda: (random.choice(departments),)
+
+        new = {
+            "первая страница отдела": _measure(
+                conn, "SELECT id, title, contest_date, file_name, file_path, contest_day FROM contests "
+                      "WHERE department_id = ? ORDER BY contest_day DESC, id DESC LIMIT ?",
+                lambda: (random.choice(departments), PAGE + 1)),
+            f"страница {DEEP_PAGE} по курсору": _measure(
+                conn, "SELECT id, title, contest_date, file_name, file_path, contest_day FROM contests "
+                      "WHERE department_id = ? AND (contest_day, id) < (?, ?) ORDER BY contest_day DESC, id DESC LIMIT ?",
+                lambda: (dept, deep[0], deep[1], PAGE + 1)),
+            "число конкурсов отдела": _measure(
+                conn, "SELECT COUNT(*) FROM contests WHERE department_id = ?", random_dept),
+        }
+
+        legacy = _legacy_copy(path)
+        old = {
+            "весь отдел, ORDER BY contest_date": _measure(
+                legacy, "SELECT id, title, contest_date, file_name, file_path FROM contests "
+                        "WHERE department_id = ? ORDER BY contest_date DESC", random_dept),
+            f"страница {DEEP_PAGE} через OFFSET": _measure(
+                legacy, "SELECT id, title, contest_date, file_name, file_path FROM contests "
+                        "WHERE department_id = ? ORDER BY contest_date DESC LIMIT ? OFFSET ?",
+                lambda: (dept, PAGE, DEEP_PAGE * PAGE)),
+            "число конкурсов отдела": _measure(
+                legacy, "SELECT COUNT(*) FROM contests WHERE department_id = ?", random_dept),
+        }
+        legacy.close()
+
+        print("Было:")
+        for name, result in old.items():
+            _report(name, result)
+        print("\nСтало:")
+        database.DB_PATH = path
+        for name, result in new.items():
+            _report(name, result)
+    finally:
+        database.close_db()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# bench_shards.py
+"""
+Нагрузочный тест режима sharded на одной машине.
+Апдейты от множества чатов раздаются через ShardPool из shard.py (те же
+очереди и распределение по чатам, что у бота) 1, 2, 4... процессам. Хендлер-заглушка
+тратит CPU_MS процессорного времени, ждёт IO_MS "сети" и хранит номер последнего
+сообщения чата в FSM (SQLiteStorage в общей базе). После прогона по базе
+проверяется, что каждый чат получил все сообщения и строго по порядку.
+Пропускная способность растёт с числом процессов, пока хватает ядер.
+Запуск: python bench_shards.py [кол-во апдейтов] [процессы через запятую]
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("ADMIN_ID", "0")
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+
+from aiogram import Bot, Dispatcher, types
+from aiogram.fsm.context import FSMContext
+
+import database
+from fsm_storage import SQLiteStorage
+from shard import ShardPool
+
+UPDATES = 4000
+CHATS = 200
+WORKERS = (1, 2, 4)
+CPU_MS = 2.0    # процессорное время хендлера (разбор, клавиатуры, шаблоны)
+IO_MS = 10.0    # ожидание ответа Telegram / DeepSeek
+
+
+def _burn(ms: float):
+    end = time.process_time() + ms / 1000
+    while time.process_time() < end:
+        pass
+
+
+async def on_message(message: types.Message, state: FSMContext):
+    seq = int(message.text.split()[1])
+    data = await state.get_data()
+    errors = data.get("errors", 0) + (data.get("seq", -1) != seq - 1)
+    _burn(CPU_MS)
+    await asyncio.sleep(IO_MS / 1000)
+    await state.update_data(seq=seq, errors=errors)
+
+
+def build_bench():
+    """Бот для обработчиков ShardPool: к Telegram не обращается"""
+    database.DB_PATH = os.environ["BENCH_DB"]
+    bot = Bot(token="123:bench")
+    dp = Dispatcher(storage=SQLiteStorage())
+    dp.message.register(on_message)
+    return bot, dp
+
+
+def make_updates(count: int, chats: int) -> list:
+    updates = []
+    for i in range(count):
+        chat = 1000 + i % chats
+        updates.append({
+            "update_id": i + 1,
+            "message": {"message_id": i + 1, "date": 0, "text": f"/seq {i // chats}",
+                        "chat": {"id": chat, "type": "private"},
+                        "from": {"id": chat, "is_bot": False, "first_name": "Bench"}},
+        })
+    return updates
+
+
+async def run(workers: int, updates: list):
+    pool = ShardPool(build_bench, workers)
+    await pool.start()
+    started = time.perf_counter()
+    for update in updates:
+        await pool.put(update)
+    done = await pool.stop()
+    return time.perf_counter() - started, done
+
+
+def check_order(count: int, chats: int):
+    """(чатов с полным и упорядоченным потоком, всего нарушений порядка)"""
+    conn = database.get_connection()
+    ok, errors = 0, 0
+    for (data,) in conn.execute("SELECT data FROM fsm_states"):
+        data = json.loads(data)
+        errors += data["errors"]
+        ok += data["errors"] == 0 and data["seq"] == (count - 1) // chats
+    conn.execute("DELETE FROM fsm_states")
+    conn.commit()
+    return ok, errors
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else UPDATES
+    counts = [int(n) for n in sys.argv[2].split(",")] if len(sys.argv) > 2 else WORKERS
+    tmp = tempfile.mkdtemp()
+    os.environ["BENCH_DB"] = database.DB_PATH = os.path.join(tmp, "bench.db")
+    try:
+        database.init_db()
+        updates = make_updates(count, CHATS)
+        print(f"Апдейтов: {count} от {CHATS} чатов, хендлер: {CPU_MS} мс CPU + {IO_MS} мс ожидания, "
+              f"ядер: {os.cpu_count()}\n")
+        base = None
+        for workers in counts:
+            elapsed, done = asyncio.run(run(workers, updates))
+            ok, errors = check_order(count, CHATS)
+            rate = count / elapsed
+            base = base or rate
+            print(f"  процессов: {workers}  {rate:8.0f} апд/с  x{rate / base:4.2f}  "
+                  f"обработано {sum(done.values())}, чатов по порядку {ok}/{CHATS}, нарушений {errors}")
+    finally:
+        database.close_db()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
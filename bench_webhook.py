@@ -0,0 +1,107 @@
+# bench_webhook.py
+"""
+Нагрузочный тест webhook-режима.
+Поднимает webhook-сервер локально и воспроизводит апдейты Telegram
+(JSON, по одному на строку) с заданной параллельностью. Хендлер-заглушка
+имитирует работу, поэтому реальные запросы в Telegram не уходят.
+Запуск: python bench_webhook.py [updates.jsonl] [кол-во апдейтов] [параллельность]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("ADMIN_ID", "0")
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+
+import aiohttp
+from aiohttp import web
+from aiogram import Bot, Dispatcher, types
+
+from webhook import build_app
+
+HOST, PORT = "127.0.0.1", 8767
+SECRET = "bench-secret"
+HANDLER_WORK = 0.01  # имитация работы хендлера (сек)
+
+
+def load_updates(path, count):
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            recorded = [json.loads(line) for line in f if line.strip()]
+    else:
+        recorded = [{
+            "update_id": 1,
+            "message": {"message_id": 1, "date": 0, "text": "📂 Положения конкурсов",
+                        "chat": {"id": 100, "type": "private"},
+                        "from": {"id": 100, "is_bot": False, "first_name": "Bench"}},
+        }]
+    updates = []
+    for i in range(count):
+        update = json.loads(json.dumps(recorded[i % len(recorded)]))
+        update["update_id"] = i + 1
+        updates.append(update)
+    return updates
+
+
+async def main():
+    path = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].isdigit() else None
+    numbers = [int(a) for a in sys.argv[1:] if a.isdigit()]
+    count = numbers[0] if numbers else 5000
+    concurrency = numbers[1] if len(numbers) > 1 else 50
+
+    handled = 0
+    all_done = asyncio.Event()
+
+    async def stub_handler(message: types.Message):
+        nonlocal handled
+        await asyncio.sleep(HANDLER_WORK)
+        handled += 1
+        if handled == count:
+            all_done.set()
+
+    dp = Dispatcher()
+    dp.message.register(stub_handler)
+    bot = Bot(token="123456:bench")
+    runner = web.AppRunner(build_app(dp, bot, secret_token=SECRET, path="/webhook"))
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+
+    updates = load_updates(path, count)
+    statuses = {}
+    url = f"http://{HOST}:{PORT}/webhook"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    queue = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+
+    async def sender(session):
+        while not queue.empty():
+            update = queue.get_nowait()
+            async with session.post(url, json=update, headers=headers) as resp:
+                statuses[resp.status] = statuses.get(resp.status, 0) + 1
+                if resp.status == 503:
+                    queue.put_nowait(update)  # как Telegram: повторяем позже
+                    await asyncio.sleep(0.01)
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json=updates[0], headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as resp:
+                print(f"Запрос с неверным секретом: HTTP {resp.status}")
+            started = time.perf_counter()
+            await asyncio.gather(*(sender(session) for _ in range(concurrency)))
+            accepted = time.perf_counter() - started
+            await asyncio.wait_for(all_done.wait(), timeout=120)
+            total = time.perf_counter() - started
+        print(f"Апдейтов: {count}, параллельных отправителей: {concurrency}")
+        print(f"Ответы сервера: {statuses}")
+        print(f"Приём:      {count / accepted:8.0f} апд/с ({accepted:.2f} с)")
+        print(f"Обработка:  {count / total:8.0f} апд/с ({total:.2f} с)")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
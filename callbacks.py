@@ -0,0 +1,111 @@
+# callbacks.py
+"""
+Типизированные callback_data и табличный роутер для инлайн-кнопок.
+Кнопка кодируется как "<prefix>:<action>:<id>" (aiogram CallbackData),
+при нажатии строка разбирается один раз, а хендлер выбирается по словарю
+action -> функция, без цепочки startswith и без зависимости от порядка проверок.
+"""
+
+import logging
+from enum import Enum
+from functools import lru_cache
+
+from aiogram import types
+from aiogram.filters.callback_data import CallbackData
+
+logger = logging.getLogger("callbacks")
+
+# Разных кнопок мало (отделы x конкурсы), поэтому разобранные callback_data кэшируются:
+# unpack через pydantic стоит несколько микросекунд, повторное нажатие - поиск в словаре
+PARSE_CACHE_SIZE = 4096
+
+
+class ContestAction(str, Enum):
+    SHOW_DEPT = "show_dept"      # отдел для просмотра конкурсов
+    UPLOAD_DEPT = "upload_dept"  # отдел для загрузки положения
+    DELETE_DEPT = "delete_dept"  # отдел для удаления
+    DOWNLOAD = "download"        # скачать положение
+    DELETE = "delete"            # удалить конкурс
+    BACK = "back"                # назад к отделам
+    CANCEL = "cancel"            # отмена действия
+
+
+class AIAction(str, Enum):
+    DEPT = "dept"                # отдел
+    SELECT = "select"            # конкурс для вопросов
+    BACK = "back"                # назад к отделам
+    END = "end"                  # закончить диалог
+
+
+class ContestListMenu(str, Enum):
+    DOWNLOAD = "dl"              # скачивание положений
+    DELETE = "del"               # удаление (админ)
+    AI = "ai"                    # выбор конкурса для вопросов ИИ
+
+
+class ContestsCallback(CallbackData, prefix="contests"):
+    action: ContestAction
+    id: int = 0  # id отдела или конкурса, для кнопок без объекта - 0
+
+
+class AICallback(CallbackData, prefix="ai"):
+    action: AIAction
+    id: int = 0
+
+
+class PageCallback(CallbackData, prefix="page"):
+    """Листание списка конкурсов отдела: курсор - (day, id) крайнего конкурса текущей страницы"""
+    menu: ContestListMenu
+    dept: int
+    day: int = 0                 # дата как число YYYYMMDD, 0 - без даты
+    id: int = 0
+    back: bool = False           # True - к более новым конкурсам
+
+
+class SearchCallback(CallbackData, prefix="search"):
+    q: str                       # ключ запроса (сам текст в callback_data не помещается)
+    page: int = 0
+
+
+class CallbackRouter:
+    """Словарь action -> хендлер для одной фабрики CallbackData.
+
+    Хендлер вызывается как handler(callback, state, cb), где cb - уже
+    разобранный объект фабрики с типизированными полями (не изменять: он из кэша).
+    """
+
+    def __init__(self, factory: type, cache_size: int = PARSE_CACHE_SIZE):
+        self.factory = factory
+        self.routes = {}
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+
+    def route(self, action: Enum):
+        def decorator(handler):
+            self.routes[action] = handler
+            return handler
+        return decorator
+
+    def _parse(self, data: str):
+        """Разобрать callback_data; None для чужих и устаревших кнопок"""
+        try:
+            return self.factory.unpack(data)
+        except (TypeError, ValueError):
+            return None
+
+    def resolve(self, data: str):
+        """(хендлер, cb) или (None, None)"""
+        cb = self.parse(data)
+        if cb is None:
+            return None, None
+        return self.routes.get(cb.action), cb
+
+    async def dispatch(self, callback: types.CallbackQuery, state) -> bool:
+        """Вызвать хендлер кнопки; False, если кнопка не распознана"""
+        handler, cb = self.resolve(callback.data or "")
+        if handler is None:
+            # кнопки из старых сообщений (до перехода на CallbackData) сюда тоже попадают
+            logger.debug(f"Неизвестная кнопка {callback.data!r} от {callback.from_user.id}")
+            await callback.answer("Кнопка устарела, откройте меню заново", show_alert=True)
+            return False
+        await handler(callback, state, cb)
+        return True
@@ -0,0 +1,113 @@
+# catalog.py
+"""
+Каталог отделов и конкурсов в памяти.
+Отделы загружаются при старте и перечитываются только когда меняется
+database.data_version (add_contest / delete_contest / add_department),
+поэтому отрисовка меню не делает запросов к БД. Готовые
+InlineKeyboardMarkup кэшируются по ключу до следующего изменения данных.
+Списки конкурсов отдела читаются постранично (keyset по индексу
+(department_id, contest_day, id)), каждая страница - один запрос и тоже кэшируется.
+Отдельные конкурсы читаются по id при первом обращении. Конкурсы, страницы и клавиатуры
+хранятся в LRU-кэшах (CONTEST_CACHE_SIZE, PAGE_CACHE_SIZE, KEYBOARD_CACHE_SIZE), так что
+листание по всё новым курсорам не раздувает память; file_id отправленного PDF правится в кэше на месте, без сброса каталога.
+"""
+
+import asyncio
+from collections import OrderedDict
+
+import database
+
+CONTEST_CACHE_SIZE = 1024  # сколько конкурсов держим в памяти
+PAGE_CACHE_SIZE = 1024     # сколько страниц списков конкурсов
+KEYBOARD_CACHE_SIZE = 1024  # сколько готовых клавиатур
+
+TG_FILE_ID = 7  # позиция tg_file_id в строке get_contest_by_id
+
+
+def _remember(cache: OrderedDict, key, value, limit: int):
+    """Положить в LRU-кэш, выкинув самые давние записи сверх limit"""
+    cache[key] = value
+    while len(cache) > limit:
+        cache.popitem(last=False)
+
+
+class Catalog:
+    def __init__(self):
+        self.version = None
+        self.departments = []            # [(id, name)] по алфавиту
+        self.department_names = {}       # id -> name
+        self.contests = OrderedDict()    # id -> строка как у get_contest_by_id (последние использованные)
+        self._pages = OrderedDict()      # (отдел, курсор, назад) -> результат get_contests_page
+        self._keyboards = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    async def refresh(self):
+        """Перечитать каталог, если данные в БД менялись"""
+        if self.version == database.data_version:
+            return
+        async with self._lock:
+            version = database.data_version
+            if self.version == version:
+                return
+            departments = await database.get_all_departments_async()
+            self.departments = departments
+            self.department_names = dict(departments)
+            self.contests = OrderedDict()
+            self._pages = OrderedDict()
+            self._keyboards = OrderedDict()
+            self.version = version
+
+    async def get_departments(self) -> list:
+        await self.refresh()
+        return self.departments
+
+    async def get_department_name(self, department_id: int, default: str = None):
+        await self.refresh()
+        return self.department_names.get(department_id, default)
+
+    async def get_contests_page(self, department_id: int, cursor: tuple = None, backward: bool = False):
+        """(конкурсы, есть ли предыдущая, есть ли следующая) - см. database.get_contests_page"""
+        await self.refresh()
+        key = (department_id, cursor, backward)
+        page = self._pages.get(key)
+        if page is not None:
+            self._pages.move_to_end(key)
+            return page
+        version = database.data_version
+        page = await database.get_contests_page_async(department_id, cursor, backward)
+        if version == database.data_version:  # данные не менялись, пока шёл запрос
+            _remember(self._pages, key, page, PAGE_CACHE_SIZE)
+        return page
+
+    async def get_contest(self, contest_id: int):
+        await self.refresh()
+        contest = self.contests.get(contest_id)
+        if contest is not None:
+            self.contests.move_to_end(contest_id)
+            return contest
+        version = database.data_version
+        contest = await database.get_contest_by_id_async(contest_id)
+        if contest is not None and version == database.data_version:
+            _remember(self.contests, contest_id, contest, CONTEST_CACHE_SIZE)
+        return contest
+
+    async def set_contest_file_id(self, contest_id: int, tg_file_id):
+        """Запомнить file_id PDF в БД и в кэше; страницы и клавиатуры от него не зависят"""
+        await database.set_contest_file_id_async(contest_id, tg_file_id)
+        contest = self.contests.get(contest_id)
+        if contest is not None:
+            self.contests[contest_id] = contest[:TG_FILE_ID] + (tg_file_id,) + contest[TG_FILE_ID + 1:]
+
+    async def keyboard(self, key, build):
+        """Готовая клавиатура по ключу; build() вызывается только после изменения данных"""
+        await self.refresh()
+        markup = self._keyboards.get(key)
+        if markup is not None:
+            self._keyboards.move_to_end(key)
+            return markup
+        markup = build()
+        _remember(self._keyboards, key, markup, KEYBOARD_CACHE_SIZE)
+        return markup
+
+
+catalog = Catalog()
@@ -11,6 +11,98 @@ ADMIN_ID = int(os.getenv("ADMIN_ID"))
 
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 
+# Клиент DeepSeek: адрес, размер пула соединений, таймауты (сек) и число повторов
+DEEPSEEK_URL = os.getenv("DEEPSEEK_URL", "https://api.deepseek.com/v1")
+DEEPSEEK_POOL_SIZE = int(os.getenv("DEEPSEEK_POOL_SIZE", "20"))
+DEEPSEEK_CONNECT_TIMEOUT = float(os.getenv("DEEPSEEK_CONNECT_TIMEOUT", "10"))
+DEEPSEEK_READ_TIMEOUT = float(os.getenv("DEEPSEEK_READ_TIMEOUT", "60"))
+DEEPSEEK_TOTAL_TIMEOUT = float(os.getenv("DEEPSEEK_TOTAL_TIMEOUT", "90"))
+DEEPSEEK_RETRIES = int(os.getenv("DEEPSEEK_RETRIES", "3"))
+
+# Минимальный интервал (сек) между правками сообщения при стриминге ответа ИИ.
+# Telegram допускает примерно одну правку в секунду на чат.
+AI_EDIT_INTERVAL = float(os.getenv("AI_EDIT_INTERVAL", "1.0"))
+
+# Кэш ответов ИИ на повторяющиеся вопросы: время жизни (сек) и максимум записей
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600)))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "5000"))
+
+# Сколько запросов к DeepSeek может выполняться одновременно (остальные ждут в очереди)
+AI_MAX_IN_FLIGHT = int(os.getenv("AI_MAX_IN_FLIGHT", "5"))
+
+# Хранилище FSM: как часто сбрасывать изменения в БД (сек) и через сколько удалять неактивные состояния
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "1.0"))
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", str(24 * 3600)))
+
+# Как часто сбрасывать накопленную активность пользователей в БД (сек)
+USERS_FLUSH_INTERVAL = float(os.getenv("USERS_FLUSH_INTERVAL", "5.0"))
+
+# Резервные копии базы (/backup): папка и сколько последних копий хранить
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+
+# Режим работы: "polling" (по умолчанию), "webhook" или "sharded" (несколько процессов, shard.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")           # публичный адрес, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_MAX_CONCURRENT = int(os.getenv("WEBHOOK_MAX_CONCURRENT", "100"))
+
+# Сколько процессов обрабатывают PDF (PyMuPDF нагружает CPU)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_QUEUE_SIZE = int(os.getenv("PDF_QUEUE_SIZE", "20"))         # сколько задач может ждать свободный процесс
+PDF_JOB_TIMEOUT = float(os.getenv("PDF_JOB_TIMEOUT", "120"))   # максимум секунд на одну задачу
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "500"))         # документы длиннее не принимаются
+PDF_MAX_SIZE = int(os.getenv("PDF_MAX_SIZE_MB", "20")) * 1024 * 1024  # больше Telegram боту всё равно не отдаёт
+
+# Режим sharded: сколько процессов обрабатывают апдейты, очередь каждого и сколько апдейтов
+# разных чатов процесс обрабатывает одновременно. Апдейты одного чата всегда идут в один процесс.
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "4"))
+SHARD_QUEUE_SIZE = int(os.getenv("SHARD_QUEUE_SIZE", "1000"))
+SHARD_MAX_CONCURRENT = int(os.getenv("SHARD_MAX_CONCURRENT", "50"))
+# Как часто процесс сверяет с базой общее состояние: чёрный список, настройки, каталог (сек)
+SHARED_STATE_POLL = float(os.getenv("SHARED_STATE_POLL", "1.0"))
+# Номер процесса-обработчика и их число (задаёт shard.py); у каждого свои логи и порт метрик
+WORKER_ID = os.getenv("BOT_WORKER_ID", "")
+WORKER_COUNT = int(os.getenv("BOT_WORKER_COUNT", "1"))
+if WORKER_ID:
+    # Лимиты заданы на весь бот: каждый процесс получает свою долю, иначе их было бы в N раз больше.
+    # Очередь ИИ, кэш ответов (счётчики) и метрики у каждого процесса свои
+    AI_MAX_IN_FLIGHT = max(1, AI_MAX_IN_FLIGHT // WORKER_COUNT)
+    PDF_WORKERS = max(1, PDF_WORKERS // WORKER_COUNT)
+
+# Метрики Prometheus: локальный адрес для /metrics. По умолчанию сервер не запускается (порт 0);
+# 9100 занят node_exporter, поэтому порт выбирайте явно, например 9200
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+if WORKER_ID and METRICS_PORT:
+    METRICS_PORT += int(WORKER_ID)
+
+# Логирование: уровень (DEBUG включает отладочный вывод хендлеров), папка и ротация файлов
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+if WORKER_ID:
+    LOG_DIR = os.path.join(LOG_DIR, f"worker-{WORKER_ID}")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_MB", "10")) * 1024 * 1024
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+
+# Трассировка: порог медленного хендлера (мс), сколько следующих вызовов хендлера профилировать
+# после медленного, доля случайных апдейтов под cProfile (0 - только после медленных) и куда сохранять профили
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "1000"))
+TRACE_PROFILE_NEXT = int(os.getenv("TRACE_PROFILE_NEXT", "5"))
+TRACE_PROFILE_RATE = float(os.getenv("TRACE_PROFILE_RATE", "0"))
+TRACE_PROFILE_DIR = os.getenv("TRACE_PROFILE_DIR", os.path.join(LOG_DIR, "profiles"))
+
+# Антифлуд: ёмкость корзины (сколько подряд) и пополнение в минуту для каждого пользователя
+THROTTLE_AI_BURST = int(os.getenv("THROTTLE_AI_BURST", "3"))                 # вопросы ИИ
+THROTTLE_AI_PER_MIN = float(os.getenv("THROTTLE_AI_PER_MIN", "6"))
+THROTTLE_DOWNLOAD_BURST = int(os.getenv("THROTTLE_DOWNLOAD_BURST", "5"))     # скачивание положений
+THROTTLE_DOWNLOAD_PER_MIN = float(os.getenv("THROTTLE_DOWNLOAD_PER_MIN", "10"))
+THROTTLE_GENERIC_BURST = int(os.getenv("THROTTLE_GENERIC_BURST", "10"))      # остальные сообщения и кнопки
+THROTTLE_GENERIC_PER_MIN = float(os.getenv("THROTTLE_GENERIC_PER_MIN", "40"))
+
 # Проверка
 if not DEEPSEEK_API_KEY:
-    raise ValueError("API ключ DeepSeek не найден! Установи переменную окружения DEEPSEEK_API_KEY")
\ No newline at end of file
+    raise ValueError("API ключ DeepSeek не найден! Установи переменную окружения DEEPSEEK_API_KEY")
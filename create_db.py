@@ -1,7 +1,16 @@
 # create_db.py
-from database import init_db
+import database
+from migrations import MIGRATIONS, current_version
 
 if __name__ == "__main__":
-    init_db()
-    print("База данных создана! Структура таблицы 'contests':")
-    print("| id | title | contest_date | file_name | created_date |")
\ No newline at end of file
+    # Схему создают и обновляют миграции (migrations.py) - то же делает init_db при старте бота
+    database.init_db()
+    conn = database.get_connection()
+    print(f"База данных {database.DB_PATH} создана: версия схемы {current_version(conn)} "
+          f"(последняя: {MIGRATIONS[-1][0]})")
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                 "AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE '%VIRTUAL%' "
+                                 "AND name NOT LIKE '%search_%' AND name NOT LIKE '%chunks_%' ORDER BY name"):
+        columns = [col[1] for col in conn.execute(f"PRAGMA table_info({table})")]
+        print(f"  {table}: {', '.join(columns)}")
+    database.close_db()
@@ -1,67 +1,193 @@
 # database.py
+"""
+Единое хранилище бота (data/contests.db): отделы, конкурсы, индексы PDF,
+кэш ответов ИИ, FSM, пользователи и их вопросы, общее состояние процессов
+(чёрный список, настройки). Схема - migrations.py.
+Соединения открываются лениво (по одному на поток пула run_db);
+init_db вызывается при старте main.py, close_db - после остановки диспетчера.
+"""
+
 import sqlite3
 import os
+import re
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from metrics import db_query_seconds
+
+logger = logging.getLogger("database")
+
+DB_PATH = 'data/contests.db'
+
+# Сколько долгоживущих соединений держим (по одному на поток пула)
+POOL_SIZE = 4
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_executor = None
+
+# Сколько конкурсов на одной странице клавиатуры (листание по курсору)
+CONTESTS_PAGE_SIZE = 10
+
+# Растёт при каждом изменении отделов/конкурсов; по нему catalog.py понимает, что пора перечитать данные
+data_version = 0
+
+# Последняя версия общего состояния (таблица shared_state), которую видел этот процесс;
+# изменения других процессов подхватывает shared_state.py
+state_version = 0
+
+
+# ---------------- СОЕДИНЕНИЯ ----------------
+def _connect():
+    """Открыть соединение с настройками для конкурентной работы"""
+    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False, cached_statements=256)
+    # WAL: читатели не блокируют писателя и наоборот
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # Внешние ключи SQLite проверяет, только если включить их на каждом соединении
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def get_connection():
+    """Долгоживущее соединение текущего потока.
+
+    Соединение открывается один раз на поток и переиспользуется, поэтому
+    схема не перечитывается на каждый запрос, а подготовленные выражения
+    остаются в кэше sqlite3 (cached_statements).
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _connect()
+        _local.conn = conn
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+
+def _bump_version():
+    global data_version
+    data_version += 1
+    _bump_state_version()
+
+
+def _bump_state_version():
+    """Сообщить остальным процессам, что общие данные изменились"""
+    global state_version
+    conn = get_connection()
+    with conn:
+        version = conn.execute("UPDATE shared_state SET version = version + 1 WHERE id = 1 RETURNING version").fetchone()[0]
+    if version == state_version + 1:
+        state_version = version  # других изменений не было - перечитывать нечего
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="db")
+    return _executor
 
 
+async def run_db(func, *args):
+    """Выполнить синхронную функцию БД в пуле потоков, не блокируя event loop"""
+    loop = asyncio.get_running_loop()
+    with db_query_seconds.time(getattr(func, "__name__", "query")):
+        return await loop.run_in_executor(_get_executor(), func, *args)
+
+
+def close_db():
+    """Остановить пул и закрыть все соединения (вызывается при остановке бота)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    with _connections_lock:
+        for conn in _connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        _connections.clear()
+    _local.__dict__.pop("conn", None)
+
+
+# ---------------- СХЕМА ----------------
 def init_db():
-    """Инициализация базы данных и создание таблиц"""
-    os.makedirs("data", exist_ok=True)
+    """Инициализация базы данных: миграции схемы (migrations.py, там же стандартные отделы)"""
+    from migrations import migrate  # migrations использует функции этого модуля
 
-    conn = sqlite3.connect('data/contests.db')
-    c = conn.cursor()
+    os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
 
-    # Создаем таблицу для отделов
-    c.execute('''CREATE TABLE IF NOT EXISTS departments
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  name TEXT UNIQUE NOT NULL)''')
-
-    # Создаем таблицу для конкурсов
-    c.execute('''CREATE TABLE IF NOT EXISTS contests
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  title TEXT NOT NULL,
-                  contest_date TEXT NOT NULL,
-                  file_name TEXT,
-                  file_path TEXT,
-                  department_id INTEGER,
-                  created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  FOREIGN KEY (department_id) REFERENCES departments(id))''')
-
-    # Добавляем стандартные отделы если их нет
-    default_departments = [
-        "Пожарная безопасность",
-        "Судомодельные",
-        "Шашки",
-        "БПЛА",
-        "Автомодельные соревнования",
-        "Робототехника"
-    ]
-    
-    for dept in default_departments:
-        c.execute("INSERT OR IGNORE INTO departments (name) VALUES (?)", (dept,))
-
-    conn.commit()
-    conn.close()
-    print("✅ База данных успешно создана/обновлена!")
+    conn = get_connection()
+    migrate(conn)
+    logger.info("✅ База данных успешно создана/обновлена!")
 
 
+# ---------------- ДАТЫ ----------------
+_MONTHS = {"янв": 1, "фев": 2, "мар": 3, "апр": 4, "мая": 5, "май": 5, "июн": 6,
+           "июл": 7, "авг": 8, "сен": 9, "окт": 10, "ноя": 11, "дек": 12}
+
+
+def parse_contest_day(text):
+    """Дата конкурса из свободного текста в ISO (YYYY-MM-DD); '' если не распознана.
+
+    "15.12.2024", "15.12.24", "2024-12-15", "15 декабря 2024", "Декабрь 2024" (-> 1-е число), "2024".
+    """
+    text = (text or "").strip().lower()
+    m = re.search(r"(\d{4})-(\d{1,2})-(\d{1,2})", text)
+    if m:
+        year, month, day = (int(x) for x in m.groups())
+    else:
+        m = re.search(r"(\d{1,2})[./](\d{1,2})[./](\d{4}|\d{2})\b", text)
+        if m:
+            day, month, year = (int(x) for x in m.groups())
+            year += 2000 if year < 100 else 0
+        else:
+            m = re.search(r"\b(\d{4})\b", text)
+            if not m:
+                return ""
+            year, month, day = int(m.group(1)), 1, 1
+            for word in re.findall(r"[а-яё]+", text):
+                if word[:3] in _MONTHS:
+                    month = _MONTHS[word[:3]]
+                    m = re.search(r"\b(\d{1,2})\s+" + word, text)
+                    day = int(m.group(1)) if m else 1
+                    break
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return ""
+
+
+def _day_key(day):
+    """ISO-дата -> число для callback_data (2024-12-15 -> 20241215, без даты -> 0)"""
+    return int(day.replace("-", "")) if day else 0
+
+
+def _day_from_key(key):
+    return f"{key // 10000:04d}-{key // 100 % 100:02d}-{key % 100:02d}" if key else ""
+
+
+# ---------------- ЗАПРОСЫ ----------------
 def get_all_departments():
     """Получить все отделы из БД"""
-    conn = sqlite3.connect('data/contests.db')
-    c = conn.cursor()
+    c = get_connection().cursor()
     c.execute("SELECT id, name FROM departments ORDER BY name")
-    departments = c.fetchall()
-    conn.close()
-    return departments
+    return c.fetchall()
 
 
 def add_department(name):
     """Добавить новый отдел"""
+    conn = get_connection()
     try:
-        conn = sqlite3.connect('data/contests.db')
-        c = conn.cursor()
-        c.execute("INSERT INTO departments (name) VALUES (?)", (name,))
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute("INSERT INTO departments (name) VALUES (?)", (name,))
+        _bump_version()
         return True
     except sqlite3.IntegrityError:
         return False  # Отдел уже существует
@@ -69,79 +195,523 @@ def add_department(name):
 
 def get_contests_by_department(department_id):
     """Получить конкурсы по ID отдела"""
-    conn = sqlite3.connect('data/contests.db')
-    c = conn.cursor()
+    c = get_connection().cursor()
     c.execute('''
         SELECT id, title, contest_date, file_name, file_path 
         FROM contests 
         WHERE department_id = ?
-        ORDER BY contest_date DESC
+        ORDER BY contest_day DESC, id DESC
     ''', (department_id,))
-    contests = c.fetchall()
-    conn.close()
-    return contests
+    return c.fetchall()
 
 
-def add_contest(title, contest_date, file_name, file_path, department_id=1):
-    """Добавление нового конкурса в базу"""
-    conn = sqlite3.connect('data/contests.db')
-    c = conn.cursor()
-    c.execute("INSERT INTO contests (title, contest_date, file_name, file_path, department_id) VALUES (?, ?, ?, ?, ?)",
-              (title, contest_date, file_name, file_path, department_id))
-    conn.commit()
-    conn.close()
-    return True
+def get_contests_page(department_id, cursor=None, backward=False, limit=CONTESTS_PAGE_SIZE):
+    """Страница конкурсов отдела по курсору (keyset), свежие первыми.
+
+    cursor - (day_key, id) крайнего конкурса соседней страницы: вперёд - последнего
+    (берём более старые), назад - первого (берём более новые). Без курсора - первая страница.
+    Возвращает (строки, есть_ли_предыдущая, есть_ли_следующая); строки как у
+    get_contests_by_department плюс day_key для курсоров кнопок листания.
+    """
+    c = get_connection().cursor()
+    sql = "SELECT id, title, contest_date, file_name, file_path, contest_day FROM contests WHERE department_id = ?"
+    args = [department_id]
+    if cursor is not None:
+        sql += " AND (contest_day, id) > (?, ?)" if backward else " AND (contest_day, id) < (?, ?)"
+        args += [_day_from_key(cursor[0]), cursor[1]]
+    sql += " ORDER BY contest_day ASC, id ASC LIMIT ?" if backward else " ORDER BY contest_day DESC, id DESC LIMIT ?"
+    c.execute(sql, args + [limit + 1])
+    rows = c.fetchall()
+    more = len(rows) > limit
+    rows = [row[:5] + (_day_key(row[5]),) for row in rows[:limit]]
+    if backward:
+        rows.reverse()
+        return rows, more, True
+    return rows, cursor is not None, more
+
+
+def add_contest(title, contest_date, file_name, file_path, department_id=1, status="ready", tg_file_id=None,
+                contest_day=None, file_hash=None, file_size=None):
+    """Добавление нового конкурса в базу (contest_day - ISO-дата, по умолчанию разбирается из contest_date)"""
+    if contest_day is None:
+        contest_day = parse_contest_day(contest_date)
+    conn = get_connection()
+    with conn:
+        cur = conn.execute('''
+            INSERT INTO contests (title, contest_date, contest_day, file_name, file_path, department_id,
+                                  status, tg_file_id, file_hash, file_size)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (title, contest_date, contest_day, file_name, file_path, department_id,
+              status, tg_file_id, file_hash, file_size))
+        _index_contest(conn, cur.lastrowid)
+    _bump_version()
+    return cur.lastrowid
 
 
 def get_all_contests():
     """Получение всех конкурсов"""
-    conn = sqlite3.connect('data/contests.db')
-    c = conn.cursor()
+    c = get_connection().cursor()
     c.execute('''
         SELECT c.id, c.title, c.contest_date, c.file_name, c.file_path, d.name as department_name
         FROM contests c
         LEFT JOIN departments d ON c.department_id = d.id
         ORDER BY c.created_date DESC
     ''')
-    contests = c.fetchall()
-    conn.close()
-    return contests
+    return c.fetchall()
 
 
 def get_contest_by_id(contest_id):
     """Получение конкурса по ID"""
-    conn = sqlite3.connect('data/contests.db')
-    c = conn.cursor()
+    c = get_connection().cursor()
     c.execute('''
         SELECT c.id, c.title, c.contest_date, c.file_name, c.file_path, 
-               c.department_id, d.name as department_name
+               c.department_id, d.name as department_name, c.tg_file_id
         FROM contests c
         LEFT JOIN departments d ON c.department_id = d.id
         WHERE c.id = ?
     ''', (contest_id,))
-    contest = c.fetchone()
-    conn.close()
-    return contest
+    return c.fetchone()
+
+
+def get_department_by_id(department_id):
+    """Получить отдел по ID"""
+    c = get_connection().cursor()
+    c.execute("SELECT id, name FROM departments WHERE id = ?", (department_id,))
+    return c.fetchone()
+
+
+def count_contests_by_file(file_path, exclude_id=None):
+    """Сколько конкурсов ссылаются на файл (одинаковые PDF хранятся один раз)"""
+    c = get_connection().cursor()
+    c.execute("SELECT COUNT(*) FROM contests WHERE (file_path = ? OR preview_path = ?) AND id != ?",
+              (file_path, file_path, exclude_id if exclude_id is not None else -1))
+    return c.fetchone()[0]
 
 
 def delete_contest(contest_id):
     """Удаление конкурса из базы данных"""
-    conn = sqlite3.connect('data/contests.db')
+    conn = get_connection()
     c = conn.cursor()
-    # Сначала получаем путь к файлу
-    c.execute("SELECT file_path FROM contests WHERE id = ?", (contest_id,))
+    # Сначала получаем пути к файлу и превью
+    c.execute("SELECT file_path, preview_path FROM contests WHERE id = ?", (contest_id,))
     result = c.fetchone()
 
-    if result and result[0]:
-        # Удаляем файл с диска
+    # Удаляем запись из базы данных; кэш текста и ответов ИИ удаляется каскадом (внешние ключи),
+    # FTS-индексы - вручную
+    with conn:
+        conn.execute("DELETE FROM contests WHERE id = ?", (contest_id,))
+        conn.execute("DELETE FROM contest_chunks WHERE contest_id = ?", (contest_id,))
+        conn.execute("DELETE FROM contest_search WHERE rowid = ?", (contest_id,))
+    _bump_version()
+
+    # Удаляем файлы с диска, только если их больше никто не использует
+    for path in result or ():
+        if not path or count_contests_by_file(path):
+            continue
         try:
-            if os.path.exists(result[0]):
-                os.remove(result[0])
+            if os.path.exists(path):
+                os.remove(path)
         except Exception as e:
-            print(f"Ошибка при удалении файла: {e}")
+            logger.error(f"Ошибка при удалении файла: {e}")
+    return True
+
+
+def set_contest_processed(contest_id, status, file_hash=None, page_count=None, preview_path=None, error=None):
+    """Записать результат фоновой обработки PDF"""
+    conn = get_connection()
+    with conn:
+        conn.execute('''
+            UPDATE contests
+            SET status = ?, file_hash = COALESCE(?, file_hash), page_count = COALESCE(?, page_count),
+                preview_path = COALESCE(?, preview_path), status_error = ?
+            WHERE id = ?
+        ''', (status, file_hash, page_count, preview_path, error, contest_id))
+
+
+def set_contest_file_id(contest_id, tg_file_id):
+    """Запомнить file_id PDF в Telegram (None - забыть, если Telegram его не принял)"""
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE contests SET tg_file_id = ? WHERE id = ?", (tg_file_id, contest_id))
+    # версию не меняем: каталог правит строку в кэше сам (catalog.set_contest_file_id)
+
+
+def save_contest_text(contest_id, file_hash, content):
+    """Сохранить извлечённый текст положения"""
+    conn = get_connection()
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO contest_texts (contest_id, file_hash, content) VALUES (?, ?, ?)",
+                     (contest_id, file_hash, content))
+        _index_contest(conn, contest_id)
+
+
+def get_contest_text(contest_id):
+    """Кэшированный текст положения: (file_hash, content) или None"""
+    c = get_connection().cursor()
+    c.execute("SELECT file_hash, content FROM contest_texts WHERE contest_id = ?", (contest_id,))
+    return c.fetchone()
+
+
+def get_contest_index_state(contest_id):
+    """Кэш текста одним запросом: (хэш текста, текст, хэш файла конкурса, есть ли фрагменты) или None"""
+    c = get_connection().cursor()
+    c.execute('''
+        SELECT t.file_hash, t.content, c.file_hash,
+               EXISTS (SELECT 1 FROM contest_chunks WHERE contest_id = t.contest_id)
+        FROM contest_texts t
+        LEFT JOIN contests c ON c.id = t.contest_id
+        WHERE t.contest_id = ?
+    ''', (contest_id,))
+    return c.fetchone()
+
+
+def get_contest_file_hash(contest_id):
+    """Хэш файла положения (если текст уже извлечён)"""
+    c = get_connection().cursor()
+    c.execute("SELECT file_hash FROM contest_texts WHERE contest_id = ?", (contest_id,))
+    row = c.fetchone()
+    return row[0] if row else None
+
+
+def get_processed_by_hash(file_hash, exclude_id):
+    """Уже обработанный конкурс с тем же файлом: (id, page_count, preview_path) или None"""
+    c = get_connection().cursor()
+    c.execute('''
+        SELECT id, page_count, preview_path FROM contests
+        WHERE file_hash = ? AND status = 'ready' AND id != ?
+        LIMIT 1
+    ''', (file_hash, exclude_id))
+    return c.fetchone()
+
+
+def get_text_by_hash(file_hash):
+    """Уже разобранный файл с таким же содержимым: (contest_id, content) или None"""
+    c = get_connection().cursor()
+    c.execute("SELECT contest_id, content FROM contest_texts WHERE file_hash = ? LIMIT 1", (file_hash,))
+    return c.fetchone()
+
+
+def save_contest_chunks(contest_id, chunks):
+    """Заменить фрагменты положения; chunks - список (page, content)"""
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM contest_chunks WHERE contest_id = ?", (contest_id,))
+        conn.executemany("INSERT INTO contest_chunks (content, contest_id, page) VALUES (?, ?, ?)",
+                         [(content, contest_id, page) for page, content in chunks])
+
+
+def copy_contest_chunks(from_contest_id, to_contest_id):
+    """Скопировать фрагменты уже проиндексированного файла"""
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM contest_chunks WHERE contest_id = ?", (to_contest_id,))
+        conn.execute("INSERT INTO contest_chunks (content, contest_id, page) "
+                     "SELECT content, ?, page FROM contest_chunks WHERE contest_id = ?",
+                     (to_contest_id, from_contest_id))
+
+
+def search_contest_chunks(contest_id, match_query, limit=4):
+    """Самые релевантные фрагменты по BM25: список (page, content)"""
+    c = get_connection().cursor()
+    c.execute('''
+        SELECT page, content FROM contest_chunks
+        WHERE contest_chunks MATCH ? AND contest_id = ?
+        ORDER BY bm25(contest_chunks)
+        LIMIT ?
+    ''', (match_query, contest_id, limit))
+    return c.fetchall()
+
+
+def get_first_chunks(contest_id, limit=4):
+    """Начало положения - запасной контекст, если по вопросу ничего не нашлось"""
+    c = get_connection().cursor()
+    c.execute("SELECT page, content FROM contest_chunks WHERE contest_id = ? ORDER BY rowid LIMIT ?",
+              (contest_id, limit))
+    return c.fetchall()
+
+
+# ---------------- ПОИСК ПО КОНКУРСАМ ----------------
+_SEARCH_ROW = '''
+    SELECT c.id, c.title, c.contest_date, COALESCE(d.name, ''), COALESCE(t.content, '')
+    FROM contests c
+    LEFT JOIN departments d ON c.department_id = d.id
+    LEFT JOIN contest_texts t ON t.contest_id = c.id
+'''
+
+
+def _index_contest(conn, contest_id):
+    """Обновить строку конкурса в поисковом индексе (внутри транзакции вызывающего)"""
+    conn.execute("DELETE FROM contest_search WHERE rowid = ?", (contest_id,))
+    conn.execute("INSERT INTO contest_search (rowid, title, contest_date, department, content) "
+                 + _SEARCH_ROW + " WHERE c.id = ?", (contest_id,))
+
+
+def fill_contest_search(c):
+    """Заполнить поисковый индекс заново (внутри транзакции вызывающего)"""
+    c.execute("DELETE FROM contest_search")
+    c.execute("INSERT INTO contest_search (rowid, title, contest_date, department, content) " + _SEARCH_ROW)
+
+
+def rebuild_contest_search():
+    """Перестроить поисковый индекс по всем конкурсам (ручной ремонт)"""
+    conn = get_connection()
+    with conn:
+        fill_contest_search(conn)
+    logger.info("🔎 Поисковый индекс конкурсов перестроен")
+
+
+def search_contests(match_query, limit=10, offset=0):
+    """Конкурсы по FTS5-запросу, лучшие первыми (BM25: название весит больше текста).
+
+    Возвращает до limit строк (id, title, contest_date, department, tg_file_id, snippet);
+    чтобы узнать, есть ли следующая страница, запрашивайте limit + 1.
+    """
+    c = get_connection().cursor()
+    c.execute('''
+        SELECT s.rowid, c.title, c.contest_date, s.department, c.tg_file_id,
+               snippet(contest_search, -1, '', '', '…', 12)
+        FROM contest_search s
+        JOIN contests c ON c.id = s.rowid
+        WHERE contest_search MATCH ?
+        ORDER BY bm25(contest_search, 10.0, 3.0, 5.0, 1.0)
+        LIMIT ? OFFSET ?
+    ''', (match_query, limit, offset))
+    return c.fetchall()
+
+
+def get_cached_answer(contest_id, file_hash, question, ttl):
+    """Ответ из кэша, если он не старше ttl секунд; отмечает использование для LRU"""
+    now = time.time()
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute('''
+        SELECT answer FROM ai_answer_cache
+        WHERE contest_id = ? AND file_hash = ? AND question = ? AND created_at >= ?
+    ''', (contest_id, file_hash, question, now - ttl))
+    row = c.fetchone()
+    if row is None:
+        return None
+    with conn:
+        conn.execute("UPDATE ai_answer_cache SET last_used = ? WHERE contest_id = ? AND file_hash = ? AND question = ?",
+                     (now, contest_id, file_hash, question))
+    return row[0]
+
+
+def save_cached_answer(contest_id, file_hash, question, answer, ttl, max_entries):
+    """Сохранить ответ, удалить просроченные и вытеснить давно не использованные"""
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO ai_answer_cache VALUES (?, ?, ?, ?, ?, ?)",
+                     (contest_id, file_hash, question, answer, now, now))
+        conn.execute("DELETE FROM ai_answer_cache WHERE created_at < ?", (now - ttl,))
+        conn.execute('''
+            DELETE FROM ai_answer_cache WHERE rowid IN
+                (SELECT rowid FROM ai_answer_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)
+        ''', (max_entries,))
+
+
+def count_cached_answers():
+    c = get_connection().cursor()
+    c.execute("SELECT COUNT(*) FROM ai_answer_cache")
+    return c.fetchone()[0]
+
+
+def load_fsm_record(key):
+    """(state, data, updated_at) для ключа FSM или None"""
+    c = get_connection().cursor()
+    c.execute("SELECT state, data, updated_at FROM fsm_states WHERE key = ?", (key,))
+    return c.fetchone()
+
+
+def save_fsm_records(rows):
+    """Пакетная запись FSM; rows - (key, state, data, updated_at, empty). Пустые записи удаляются"""
+    conn = get_connection()
+    with conn:
+        conn.executemany("DELETE FROM fsm_states WHERE key = ?",
+                         [(key,) for key, _, _, _, empty in rows if empty])
+        conn.executemany("INSERT OR REPLACE INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?)",
+                         [(key, state, data, updated_at) for key, state, data, updated_at, empty in rows if not empty])
+
+
+def expire_fsm_records(before):
+    """Удалить состояния, не менявшиеся с момента before; вернуть число удалённых"""
+    conn = get_connection()
+    with conn:
+        cur = conn.execute("DELETE FROM fsm_states WHERE updated_at < ?", (before,))
+    return cur.rowcount
+
+
+def count_fsm_records():
+    c = get_connection().cursor()
+    c.execute("SELECT COUNT(*) FROM fsm_states")
+    return c.fetchone()[0]
+
+
+# ---------------- ПОЛЬЗОВАТЕЛИ ----------------
+def save_user_activity(rows):
+    """Сбросить накопленную активность: rows - (user_id, username, last_seen unix, новых сообщений)"""
+    conn = get_connection()
+    with conn:
+        conn.executemany('''
+            INSERT INTO users (user_id, username, last_seen, message_count)
+            VALUES (?, ?, datetime(?, 'unixepoch'), ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                username = COALESCE(excluded.username, username),
+                last_seen = excluded.last_seen,
+                message_count = message_count + excluded.message_count
+        ''', rows)
+
+
+def count_users():
+    c = get_connection().cursor()
+    c.execute("SELECT COUNT(*) FROM users")
+    return c.fetchone()[0]
+
+
+def record_ai_question(user_id, contest_id, source):
+    """Запомнить, что пользователь спросил ИИ о конкурсе (source: deepseek / cache)"""
+    conn = get_connection()
+    with conn:
+        conn.execute("INSERT INTO ai_questions (user_id, contest_id, source, asked_at) VALUES (?, ?, ?, ?)",
+                     (user_id, contest_id, source, time.time()))
+
+
+def get_top_asked_contests(limit=5):
+    """Конкурсы, о которых чаще спрашивают ИИ: (id, title, вопросов, пользователей)"""
+    c = get_connection().cursor()
+    c.execute('''
+        SELECT q.contest_id, c.title, COUNT(*), COUNT(DISTINCT q.user_id)
+        FROM ai_questions q
+        JOIN contests c ON c.id = q.contest_id
+        GROUP BY q.contest_id
+        ORDER BY COUNT(*) DESC
+        LIMIT ?
+    ''', (limit,))
+    return c.fetchall()
+
+
+def get_contest_askers(contest_id, limit=20):
+    """Кто спрашивал ИИ о конкурсе: (user_id, username, вопросов, последний вопрос unix)"""
+    c = get_connection().cursor()
+    c.execute('''
+        SELECT q.user_id, u.username, COUNT(*), MAX(q.asked_at)
+        FROM ai_questions q
+        LEFT JOIN users u ON u.user_id = q.user_id
+        WHERE q.contest_id = ?
+        GROUP BY q.user_id
+        ORDER BY MAX(q.asked_at) DESC
+        LIMIT ?
+    ''', (contest_id, limit))
+    return c.fetchall()
+
+
+# ---------------- ОБЩЕЕ СОСТОЯНИЕ ПРОЦЕССОВ ----------------
+def get_state_version():
+    c = get_connection().cursor()
+    c.execute("SELECT version FROM shared_state WHERE id = 1")
+    return c.fetchone()[0]
+
+
+def load_blocked_users():
+    """Чёрный список: id (int) и @username в нижнем регистре"""
+    c = get_connection().cursor()
+    c.execute("SELECT entry FROM blocked_users")
+    return {entry if entry.startswith("@") else int(entry) for entry, in c.fetchall()}
+
+
+def add_blocked_user(entry):
+    conn = get_connection()
+    with conn:
+        conn.execute("INSERT OR IGNORE INTO blocked_users (entry, added_at) VALUES (?, ?)", (str(entry), time.time()))
+    _bump_state_version()
+
+
+def load_settings():
+    c = get_connection().cursor()
+    c.execute("SELECT key, value FROM bot_settings")
+    return dict(c.fetchall())
+
+
+def set_setting(key, value):
+    conn = get_connection()
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO bot_settings (key, value) VALUES (?, ?)", (key, value))
+    _bump_state_version()
+
+
+# ---------------- РЕЗЕРВНЫЕ КОПИИ ----------------
+def backup_db(backup_dir, keep=7):
+    """Онлайн-копия базы через SQLite backup API.
+
+    Копирование идёт одним шагом внутри читающей транзакции: в WAL она не
+    блокирует запись, бот продолжает работать. Копия пишется во временный
+    файл и проверяется quick_check; хранятся последние keep копий.
+    Возвращает (путь, размер в байтах, копия цела).
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(DB_PATH))[0]
+    path = os.path.join(backup_dir, f"{name}-{datetime.now():%Y%m%d-%H%M%S-%f}.db")
+    tmp_path = path + ".tmp"
+    target = sqlite3.connect(tmp_path)
+    try:
+        get_connection().backup(target)
+        ok = target.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+    finally:
+        target.close()
+    os.replace(tmp_path, path)
+
+    backups = sorted(f for f in os.listdir(backup_dir) if f.startswith(f"{name}-") and f.endswith(".db"))
+    for old in backups[:-keep] if keep > 0 else []:
+        try:
+            os.remove(os.path.join(backup_dir, old))
+        except OSError as e:
+            logger.error(f"Не удалось удалить старую копию {old}: {e}")
+    return path, os.path.getsize(path), ok
+
+
+# ---------------- ASYNC API ДЛЯ ХЕНДЛЕРОВ ----------------
+async def get_all_departments_async():
+    return await run_db(get_all_departments)
+
+
+async def add_department_async(name):
+    return await run_db(add_department, name)
+
+
+async def get_contests_by_department_async(department_id):
+    return await run_db(get_contests_by_department, department_id)
+
+
+async def get_contests_page_async(department_id, cursor=None, backward=False, limit=CONTESTS_PAGE_SIZE):
+    return await run_db(get_contests_page, department_id, cursor, backward, limit)
+
+
+async def add_contest_async(title, contest_date, file_name, file_path, department_id=1, status="ready", tg_file_id=None,
+                            contest_day=None, file_hash=None, file_size=None):
+    return await run_db(add_contest, title, contest_date, file_name, file_path, department_id, status, tg_file_id,
+                        contest_day, file_hash, file_size)
+
+
+async def get_all_contests_async():
+    return await run_db(get_all_contests)
+
+
+async def get_contest_by_id_async(contest_id):
+    return await run_db(get_contest_by_id, contest_id)
+
+
+async def get_department_by_id_async(department_id):
+    return await run_db(get_department_by_id, department_id)
+
+
+async def delete_contest_async(contest_id):
+    return await run_db(delete_contest, contest_id)
+
+
+async def search_contests_async(match_query, limit=10, offset=0):
+    return await run_db(search_contests, match_query, limit, offset)
+
 
-    # Удаляем запись из базы данных
-    c.execute("DELETE FROM contests WHERE id = ?", (contest_id,))
-    conn.commit()
-    conn.close()
-    return True
\ No newline at end of file
+async def set_contest_file_id_async(contest_id, tg_file_id):
+    return await run_db(set_contest_file_id, contest_id, tg_file_id)
@@ -0,0 +1,174 @@
+# deepseek.py
+"""
+Долгоживущий клиент DeepSeek API.
+Одна aiohttp-сессия на всё время работы бота: соединения к api.deepseek.com
+переиспользуются (keep-alive), пул ограничен, таймауты заданы по фазам,
+а на 429/5xx делаются повторы с экспоненциальной задержкой и джиттером.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+
+import aiohttp
+
+from config import (DEEPSEEK_URL, DEEPSEEK_POOL_SIZE, DEEPSEEK_CONNECT_TIMEOUT,
+                    DEEPSEEK_READ_TIMEOUT, DEEPSEEK_TOTAL_TIMEOUT, DEEPSEEK_RETRIES)
+from metrics import deepseek_seconds, deepseek_tokens_total, deepseek_errors_total
+
+logger = logging.getLogger("deepseek")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class DeepSeekError(Exception):
+    """Ошибка ответа DeepSeek (после всех повторов)"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"DeepSeek вернул статус {status}: {message[:200]}")
+        self.status = status
+        self.message = message
+
+
+def _count_tokens(usage: dict):
+    if usage:
+        deepseek_tokens_total.inc("prompt", value=usage.get("prompt_tokens", 0))
+        deepseek_tokens_total.inc("completion", value=usage.get("completion_tokens", 0))
+
+
+class DeepSeekClient:
+    def __init__(self, api_key: str, base_url: str = DEEPSEEK_URL, pool_size: int = DEEPSEEK_POOL_SIZE,
+                 retries: int = DEEPSEEK_RETRIES, backoff: float = 0.5):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = aiohttp.ClientTimeout(
+            total=DEEPSEEK_TOTAL_TIMEOUT,
+            connect=DEEPSEEK_CONNECT_TIMEOUT,
+            sock_read=DEEPSEEK_READ_TIMEOUT,
+        )
+        self._session = None
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+            )
+        return self
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _delay(self, attempt: int, retry_after: str = None) -> float:
+        """Задержка перед повтором: Retry-After сервера или full jitter"""
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    async def _send(self, method: str, path: str, payload: dict = None) -> aiohttp.ClientResponse:
+        """Отправить запрос с повторами; возвращает ответ со статусом 200 (закрывает вызывающий)"""
+        if self._session is None:
+            await self.start()
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                resp = await self._session.request(method, url, json=payload)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if last:
+                    deepseek_errors_total.inc("connection")
+                    raise
+                delay = self._delay(attempt)
+                logger.warning(f"DeepSeek недоступен ({e!r}), повтор через {delay:.2f} с")
+            else:
+                if resp.status == 200:
+                    return resp
+                async with resp:
+                    text = await resp.text()
+                if resp.status not in RETRY_STATUSES or last:
+                    deepseek_errors_total.inc(str(resp.status))
+                    raise DeepSeekError(resp.status, text)
+                delay = self._delay(attempt, resp.headers.get("Retry-After"))
+                logger.warning(f"DeepSeek {resp.status}, повтор через {delay:.2f} с")
+            await asyncio.sleep(delay)
+
+    async def _request(self, method: str, path: str, payload: dict = None) -> dict:
+        with deepseek_seconds.time(path):
+            resp = await self._send(method, path, payload)
+            async with resp:
+                data = await resp.json()
+        _count_tokens(data.get("usage"))
+        return data
+
+    async def chat(self, messages: list, max_tokens: int = 150, model: str = "deepseek-chat") -> dict:
+        """Запрос /chat/completions без стриминга"""
+        payload = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "stream": False
+        }
+        return await self._request("POST", "/chat/completions", payload)
+
+    async def stream_chat(self, messages: list, max_tokens: int = 150, model: str = "deepseek-chat",
+                          usage: dict = None):
+        """Запрос /chat/completions со стримингом (SSE): отдаёт куски текста по мере генерации.
+
+        Повторы возможны только до начала ответа; оборванный посреди поток
+        поднимает исключение. Если передан словарь usage, в него записывается
+        расход токенов из последнего чанка.
+        """
+        payload = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "stream": True,
+            "stream_options": {"include_usage": True}
+        }
+        started = time.perf_counter()
+        if usage is None:
+            usage = {}
+        resp = await self._send("POST", "/chat/completions", payload)
+        try:
+            async with resp:
+                async for raw in resp.content:
+                    line = raw.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue  # пустые строки-разделители и keep-alive комментарии
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        return
+                    chunk = json.loads(data)
+                    if chunk.get("usage"):
+                        usage.update(chunk["usage"])
+                    choices = chunk.get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            deepseek_errors_total.inc("stream")
+            raise
+        finally:
+            deepseek_seconds.observe("/chat/completions:stream", value=time.perf_counter() - started)
+            _count_tokens(usage)
+
+    async def list_models(self) -> dict:
+        return await self._request("GET", "/models")
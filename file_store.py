@@ -0,0 +1,94 @@
+# file_store.py
+"""
+Хранилище PDF положений с адресацией по содержимому.
+Файл из Telegram скачивается потоком во временный файл с жёстким лимитом размера,
+SHA-256 считается по ходу скачивания, а сохраняется файл как
+contests_files/<sha256>.pdf. Одинаковые положения лежат на диске один раз;
+файл удаляется, только когда на него не ссылается ни один конкурс. Загрузки,
+ещё ждущие подтверждения (в FSM), не учитываются - их файл при подтверждении
+проверяется и при необходимости скачивается заново (handlers/contests.py).
+"""
+
+import hashlib
+import logging
+import os
+import uuid
+
+import aiofiles
+from aiogram import Bot
+
+from config import PDF_MAX_SIZE
+from database import run_db, count_contests_by_file
+
+logger = logging.getLogger("file_store")
+
+STORE_DIR = "contests_files"
+TMP_DIR = os.path.join(STORE_DIR, "tmp")
+CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = 60
+
+
+class FileTooLarge(ValueError):
+    pass
+
+
+class StoredFile:
+    def __init__(self, path: str, file_hash: str, size: int, is_new: bool):
+        self.path = path
+        self.file_hash = file_hash
+        self.size = size
+        self.is_new = is_new  # False - такой файл уже был в хранилище
+
+
+def blob_path(file_hash: str) -> str:
+    return os.path.join(STORE_DIR, f"{file_hash}.pdf")
+
+
+def _too_large(size: int, max_size: int) -> FileTooLarge:
+    return FileTooLarge(f"файл больше {max_size // (1024 * 1024)} МБ ({size / (1024 * 1024):.1f} МБ)")
+
+
+async def save_telegram_file(bot: Bot, file_id: str, max_size: int = PDF_MAX_SIZE) -> StoredFile:
+    """Скачать файл из Telegram в хранилище; FileTooLarge, если он больше max_size"""
+    tg_file = await bot.get_file(file_id)
+    if tg_file.file_size and tg_file.file_size > max_size:
+        raise _too_large(tg_file.file_size, max_size)
+
+    os.makedirs(TMP_DIR, exist_ok=True)
+    tmp_path = os.path.join(TMP_DIR, f"{uuid.uuid4().hex}.part")
+    h = hashlib.sha256()
+    size = 0
+    try:
+        url = bot.session.api.file_url(bot.token, tg_file.file_path)
+        stream = bot.session.stream_content(url=url, timeout=DOWNLOAD_TIMEOUT,
+                                            chunk_size=CHUNK_SIZE, raise_for_status=True)
+        async with aiofiles.open(tmp_path, "wb") as f:
+            async for chunk in stream:
+                size += len(chunk)
+                if size > max_size:
+                    # размер из getFile мог не прийти или не совпасть - обрываем скачивание
+                    await stream.aclose()
+                    raise _too_large(size, max_size)
+                h.update(chunk)
+                await f.write(chunk)
+
+        file_hash = h.hexdigest()
+        path = blob_path(file_hash)
+        is_new = not os.path.exists(path)
+        if is_new:
+            os.replace(tmp_path, path)
+        return StoredFile(path, file_hash, size, is_new)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+async def discard_if_unused(file_path: str):
+    """Удалить файл, если ни один конкурс на него не ссылается (отменённая загрузка)"""
+    if not file_path or await run_db(count_contests_by_file, file_path):
+        return
+    try:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    except OSError as e:
+        logger.error(f"Не удалось удалить файл {file_path}: {e}")
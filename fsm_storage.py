@@ -0,0 +1,152 @@
+# fsm_storage.py
+"""
+Хранилище FSM в SQLite вместо MemoryStorage.
+Незавершённые загрузки и диалоги с ИИ переживают рестарт. Чтения идут из
+памяти, изменения копятся и сбрасываются в БД одной транзакцией раз в
+flush_interval секунд. Состояния, не менявшиеся дольше ttl, удаляются,
+а давно не используемые записи выгружаются из памяти (остаются в БД).
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from config import FSM_FLUSH_INTERVAL, FSM_STATE_TTL
+from database import run_db, load_fsm_record, save_fsm_records, expire_fsm_records, count_fsm_records
+
+logger = logging.getLogger("fsm")
+
+MEMORY_IDLE = 600       # через сколько секунд без обращений запись выгружается из памяти
+EXPIRE_INTERVAL = 600   # как часто чистить просроченные состояния в БД
+
+
+class _Record:
+    __slots__ = ("state", "data", "updated_at", "used_at")
+
+    def __init__(self, state=None, data=None, updated_at=0.0):
+        self.state = state
+        self.data = data or {}
+        self.updated_at = updated_at
+        self.used_at = time.monotonic()
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(self, flush_interval: float = FSM_FLUSH_INTERVAL, ttl: float = FSM_STATE_TTL):
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+        self._records = {}      # строковый ключ -> _Record
+        self._dirty = set()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._last_expire = 0.0
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+    @staticmethod
+    def _dumps(data: dict) -> str:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+    async def _get(self, key: StorageKey) -> _Record:
+        skey = self._key(key)
+        record = self._records.get(skey)
+        if record is None:
+            row = await run_db(load_fsm_record, skey)
+            # Пока ждали БД, запись могла появиться из другого апдейта
+            record = self._records.get(skey)
+            if record is None:
+                record = _Record()
+                if row is not None and time.time() - row[2] < self.ttl:
+                    record = _Record(row[0], json.loads(row[1]) if row[1] else {}, row[2])
+                self._records[skey] = record
+        record.used_at = time.monotonic()
+        return record
+
+    def _touch(self, key: StorageKey, record: _Record):
+        record.updated_at = time.time()
+        self._dirty.add(self._key(key))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    # ---------------- BaseStorage ----------------
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._get(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._touch(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._get(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._get(key)
+        record.data = copy.deepcopy(data)
+        self._touch(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return copy.deepcopy((await self._get(key)).data)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            # Не прерываем запись на середине: отменённая запись дописалась бы в потоке
+            # уже после финальной и затёрла бы более новые данные
+            async with self._lock:
+                self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    # ---------------- Сброс на диск ----------------
+    async def flush(self):
+        """Записать все изменённые состояния одной транзакцией"""
+        async with self._lock:
+            if not self._dirty:
+                return
+            rows = []
+            for skey in self._dirty:
+                record = self._records.get(skey)
+                if record is None:
+                    continue
+                empty = record.state is None and not record.data
+                rows.append((skey, record.state, None if empty else self._dumps(record.data),
+                             record.updated_at, empty))
+            self._dirty.clear()
+            try:
+                await run_db(save_fsm_records, rows)
+            except Exception:
+                # Вернём ключи в очередь на запись: иначе _evict_idle сочтёт записи чистыми и выгрузит
+                self._dirty.update(row[0] for row in rows)
+                raise
+
+    def _evict_idle(self):
+        """Выгрузить из памяти записи, к которым давно не обращались"""
+        border = time.monotonic() - MEMORY_IDLE
+        for skey in [k for k, r in self._records.items() if r.used_at < border and k not in self._dirty]:
+            del self._records[skey]
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                self._evict_idle()
+                if time.monotonic() - self._last_expire > EXPIRE_INTERVAL:
+                    self._last_expire = time.monotonic()
+                    removed = await run_db(expire_fsm_records, time.time() - self.ttl)
+                    if removed:
+                        logger.info(f"Удалено просроченных FSM-состояний: {removed}")
+            except Exception as e:
+                logger.error(f"Ошибка сохранения FSM: {e}")
+
+    async def size(self) -> dict:
+        """Сколько состояний в памяти, ждут записи и всего в БД"""
+        return {
+            "in_memory": len(self._records),
+            "dirty": len(self._dirty),
+            "stored": await run_db(count_fsm_records),
+        }
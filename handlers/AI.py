@@ -1,25 +1,26 @@
 import os
 import re
-import aiohttp
-import asyncio
 import logging
-import fitz  # PyMuPDF
-from datetime import datetime
+import time
 from aiogram import types, Dispatcher, F
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, FSInputFile, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
-from config import DEEPSEEK_API_KEY, ADMIN_ID
-from handlers.contests import main_keyboard
-from database import get_all_departments, get_contests_by_department, get_contest_by_id
+from config import ADMIN_ID
+from handlers.contests import main_keyboard, send_contest_document, page_buttons
+from database import run_db, add_department_async, record_ai_question
+from catalog import catalog
+from pdf_tools import select_context_async
+from deepseek import DeepSeekClient
+from tg_stream import StreamingMessage
+from answer_cache import lookup_answer, store_answer
+from ai_scheduler import AIScheduler, QuestionReplaced
+from log_setup import TRANSCRIPT_LOGGER
+from callbacks import CallbackRouter, AICallback, AIAction, ContestListMenu, PageCallback
 
 # ---------------- INIT ----------------
-DEEP_URL = "https://api.deepseek.com/v1"
-
 logger = logging.getLogger("ai")
-logger.setLevel(logging.INFO)
-fh = logging.FileHandler("logs/ai_deepseek.log", encoding='utf-8')
-logger.addHandler(fh)
+transcript_logger = logging.getLogger(TRANSCRIPT_LOGGER)
 
 # ---------------- FSM ----------------
 class AIStates(StatesGroup):
@@ -40,34 +41,55 @@ def is_spam(text: str) -> bool:
     text = text.lower()
     return any(re.search(p, text) for p in SPAM_PATTERNS)
 
+# Поток без текста (ответ отфильтрован или пришла только статистика): пустое сообщение Telegram не примет
+EMPTY_ANSWER = "🤷 ИИ не вернул ответ. Попробуйте переформулировать вопрос."
+
 def is_too_long(text: str, limit: int = 1000) -> bool:
     return len(text) > limit
 
-def extract_pdf_text(file_path: str, max_chars: int = 5000) -> str:
-    text = ""
+async def get_pdf_context(contest_id: int, file_path: str, question: str) -> str:
+    """Фрагменты положения, относящиеся к вопросу (из локального индекса)"""
     try:
-        with fitz.open(file_path) as doc:
-            for page in doc:
-                text += page.get_text()
+        chunks = await select_context_async(contest_id, file_path, question)
     except Exception as e:
         logger.error(f"Ошибка чтения PDF: {e}")
-    return text[:max_chars]
+        return ""
+    return "\n\n".join(f"[стр. {page}] {content}" for page, content in chunks)
+
+def build_system_message(pdf_context: str) -> dict:
+    # ОБНОВЛЕННЫЙ ПРОМПТ ДЛЯ КРАТКИХ ОТВЕТОВ
+    system_message = f"""Ты помощник, который отвечает на вопросы о конкурсе. 
+        Вот фрагменты положения о конкурсе, относящиеся к вопросу: {pdf_context}
+        
+        Отвечай на вопросы пользователя на основе этой информации.
+        БУДЬ КРАТКИМ! Отвечай одним предложением, максимум два.
+        Отвечай только по существу вопроса."""
+    return {"role": "system", "content": system_message}
 
-def _log_ai(user_id: int, username: str, user_text: str, ai_response: str = "", reason: str = ""):
+async def _log_ai(message: types.Message, contest_id: int, question: str, answer: str,
+                  source: str = "deepseek", started: float = None, usage: dict = None):
+    """Вопрос и ответ ИИ -> logs/ai_transcripts.jsonl (пишет фоновый поток логирования),
+    факт вопроса о конкурсе -> таблица ai_questions"""
+    usage = usage or {}
+    transcript_logger.info("ai_answer", extra={
+        "user_id": message.from_user.id,
+        "username": message.from_user.username,
+        "contest_id": contest_id,
+        "question": question,
+        "answer": answer,
+        "source": source,
+        "latency_ms": round((time.monotonic() - started) * 1000) if started else None,
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+    })
     try:
-        with open("logs/ai_logs.txt", "a", encoding="utf-8") as f:
-            f.write(f"[{datetime.now().isoformat()}] UID:{user_id} @{username}\n")
-            f.write(f"User: {user_text}\n")
-            if reason:
-                f.write(f"Reason: {reason}\n")
-            f.write(f"AI: {ai_response}\n" + "-"*30 + "\n")
-    except Exception:
-        pass
+        await run_db(record_ai_question, message.from_user.id, contest_id, source)
+    except Exception as e:  # конкурс могли удалить, пока шёл ответ
+        logger.warning(f"Не удалось записать вопрос к конкурсу {contest_id}: {e}")
 
-def get_departments_keyboard(is_admin=False):
-    """Клавиатура с отделами"""
-    departments = get_all_departments()
-    keyboard = []
+async def get_departments_keyboard(is_admin=False):
+    """Клавиатура с отделами (собирается один раз до изменения каталога)"""
+    departments = await catalog.get_departments()
     
     # Если отделов нет, создаем стандартные
     if not departments:
@@ -79,17 +101,20 @@ def get_departments_keyboard(is_admin=False):
             (5, "🏎️ Автомодельные соревнования"),
             (6, "🤖 Робототехника")
         ]
-        from database import add_department
         for dept_id, dept_name in standard_departments:
-            add_department(dept_name)
-        departments = standard_departments
+            await add_department_async(dept_name)
+    
+    return await catalog.keyboard(("ai_depts",), lambda: _build_departments_keyboard(catalog.departments))
+
+def _build_departments_keyboard(departments: list) -> InlineKeyboardMarkup:
+    keyboard = []
     
     # Группируем по 2 кнопки в ряд
     row = []
     for dept_id, dept_name in departments:
         row.append(InlineKeyboardButton(
             text=dept_name, 
-            callback_data=f"ai_dept_{dept_id}"
+            callback_data=AICallback(action=AIAction.DEPT, id=dept_id).pack()
         ))
         if len(row) == 2:
             keyboard.append(row)
@@ -102,11 +127,11 @@ def get_departments_keyboard(is_admin=False):
 
 def get_cancel_keyboard():
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="❌ Закончить диалог", callback_data="ai_end_dialog")]
+        [InlineKeyboardButton(text="❌ Закончить диалог", callback_data=AICallback(action=AIAction.END).pack())]
     ])
     return keyboard
 
-def _choose_contest_inline(contests: list):
+def _choose_contest_inline(contests: list, dept_id: int = 0, has_prev: bool = False, has_next: bool = False):
     buttons = []
     for contest in contests:
         cid, title, date, *_ = contest
@@ -114,23 +139,33 @@ def _choose_contest_inline(contests: list):
         display_title = title[:30] + "..." if len(title) > 30 else title
         buttons.append([InlineKeyboardButton(
             text=f"📄 {display_title} ({date})", 
-            callback_data=f"ai_select_{cid}"
+            callback_data=AICallback(action=AIAction.SELECT, id=cid).pack()
         )])
-    buttons.append([InlineKeyboardButton(text="❌ Назад к отделам", callback_data="ai_back_to_depts")])
+    buttons.extend(page_buttons(ContestListMenu.AI, dept_id, contests, has_prev, has_next))
+    buttons.append([InlineKeyboardButton(text="❌ Назад к отделам", callback_data=AICallback(action=AIAction.BACK).pack())])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+async def get_contests_keyboard(dept_id: int, cursor: tuple = None, backward: bool = False) -> InlineKeyboardMarkup:
+    """Закэшированная клавиатура одной страницы конкурсов отдела"""
+    contests, has_prev, has_next = await catalog.get_contests_page(dept_id, cursor, backward)
+    return await catalog.keyboard(
+        ("ai_contests", dept_id, cursor, backward),
+        lambda: _choose_contest_inline(contests, dept_id, has_prev, has_next)
+    )
+
 # ---------------- HANDLERS ----------------
 async def start_question(message: types.Message, state: FSMContext):
     """Начало диалога с ИИ - выбор отдела"""
-    print(f"[AI DEBUG] start_question от {message.from_user.id}")
+    logger.debug(f"[AI DEBUG] start_question от {message.from_user.id}")
     is_admin = message.from_user.id == ADMIN_ID
-    kb = get_departments_keyboard(is_admin)
+    kb = await get_departments_keyboard(is_admin)
     await message.answer("Выберите отдел:", reply_markup=kb)
     await state.set_state(AIStates.choosing_department)
 
-async def handle_ai_question(message: types.Message, state: FSMContext):
+async def handle_ai_question(message: types.Message, state: FSMContext, deepseek: DeepSeekClient,
+                             ai_scheduler: AIScheduler):
     """Обработка вопросов к ИИ"""
-    print(f"[AI DEBUG] handle_ai_question от {message.from_user.id}: '{message.text}'")
+    logger.debug(f"[AI DEBUG] handle_ai_question от {message.from_user.id}: '{message.text}'")
     
     # Проверка команды отмены
     if message.text.strip().lower() in ["отмена", "закончить", "стоп", "/cancel"]:
@@ -138,6 +173,7 @@ async def handle_ai_question(message: types.Message, state: FSMContext):
         await message.answer("Диалог с ИИ завершен.", reply_markup=main_keyboard(message.from_user.id))
         return
 
+    started = time.monotonic()
     data = await state.get_data()
     selected = data.get("selected_contest")
     
@@ -160,191 +196,207 @@ async def handle_ai_question(message: types.Message, state: FSMContext):
         await state.clear()
         return
 
-    thinking_msg = await message.answer("ИИ думает... ⏳")
+    # Получаем историю диалога: в FSM хранятся только реплики, а контекст
+    # положения собирается из кэша по selected_contest["id"] на каждый вопрос
+    dialog_history = [m for m in data.get("dialog_history", []) if m["role"] != "system"]
+    first_turn = not dialog_history
+    
+    # Частые первые вопросы отвечаем из кэша, без запроса к DeepSeek
+    if first_turn:
+        cached = await lookup_answer(selected["id"], text)
+        if cached is not None:
+            dialog_history.append({"role": "user", "content": text})
+            dialog_history.append({"role": "assistant", "content": cached})
+            await state.update_data(dialog_history=dialog_history)
+            await message.answer(cached, reply_markup=get_cancel_keyboard())
+            await _log_ai(message, selected["id"], text, cached, source="cache", started=started)
+            return
 
-    # Получаем историю диалога
-    dialog_history = data.get("dialog_history", [])
+    thinking_msg = await message.answer("ИИ думает... ⏳")
     
-    # Первый вопрос - добавляем контекст PDF
-    if len(dialog_history) == 0:
-        pdf_text = extract_pdf_text(pdf_path)
-        # ОБНОВЛЕННЫЙ ПРОМПТ ДЛЯ КРАТКИХ ОТВЕТОВ
-        system_message = f"""Ты помощник, который отвечает на вопросы о конкурсе. 
-        Вот информация о конкурсе: {pdf_text}
-        
-        Отвечай на вопросы пользователя на основе этой информации.
-        БУДЬ КРАТКИМ! Отвечай одним предложением, максимум два.
-        Отвечай только по существу вопроса."""
-        dialog_history.append({"role": "system", "content": system_message})
+    # Контекст PDF подбираем под каждый вопрос: только релевантные фрагменты
+    pdf_context = await get_pdf_context(selected["id"], pdf_path, text)
     
     # Добавляем вопрос пользователя
     dialog_history.append({"role": "user", "content": text})
     
-    # Ограничиваем историю (оставляем system message и последние 6 сообщений)
-    max_history = 7  # system + 3 пары вопрос/ответ
+    # Ограничиваем историю (последние 6 сообщений, system message добавляется при запросе)
+    max_history = 6  # 3 пары вопрос/ответ
     if len(dialog_history) > max_history:
-        dialog_history = [dialog_history[0]] + dialog_history[-max_history+1:]
+        dialog_history = dialog_history[-max_history:]
+    messages = [build_system_message(pdf_context)] + dialog_history
     
-    payload = {
-        "model": "deepseek-chat",
-        "messages": dialog_history,
-        "max_tokens": 150,  # Уменьшили для краткости
-        "stream": False
-    }
-    headers = {"Authorization": f"Bearer {DEEPSEEK_API_KEY}", "Content-Type": "application/json"}
-
+    async def show_position(pos: int):
+        try:
+            await thinking_msg.edit_text(f"ИИ думает... ⏳\nВаш вопрос в очереди: {pos}")
+        except Exception:
+            pass
+    
+    # Ответ выводится по мере генерации; правки сообщения ограничены по частоте
+    streamer = StreamingMessage(thinking_msg)
     answer = ""
+    usage = {}
     try:
-        async with aiohttp.ClientSession() as sess:
-            async with sess.post(f"{DEEP_URL}/chat/completions", headers=headers, json=payload, timeout=60) as resp:
-                result = await resp.json()
-        answer = result["choices"][0]["message"]["content"]
+        # Ждём свободного слота: одновременных запросов к DeepSeek не больше AI_MAX_IN_FLIGHT
+        async with ai_scheduler.slot(message.from_user.id, on_position=show_position):
+            # Общий клиент из main.py: соединение с DeepSeek уже открыто
+            async for delta in deepseek.stream_chat(messages, max_tokens=150, usage=usage):  # Уменьшили для краткости
+                answer += delta
+                await streamer.push(delta)
+        
+        empty = not answer.strip()
+        if empty:
+            logger.warning(f"DeepSeek вернул пустой ответ (usage: {usage})")
+            answer = EMPTY_ANSWER
         
         # Добавляем ответ ассистента в историю
         dialog_history.append({"role": "assistant", "content": answer})
         await state.update_data(dialog_history=dialog_history)
+        if first_turn and not empty:
+            await store_answer(selected["id"], text, answer)
         
+    except QuestionReplaced:
+        # Пользователь задал новый вопрос, пока этот ждал в очереди
+        try:
+            await thinking_msg.edit_text("🔄 Вопрос заменён более новым")
+        except Exception:
+            pass
+        return
     except Exception as e:
         answer = f"Ошибка: {e}"
         logger.error(f"DeepSeek error: {e}")
-
-    # Плавный вывод ответа
-    display_text = ""
-    for i, char in enumerate(answer, 1):
-        display_text += char
-        if i % 20 == 0:
-            try:
-                await thinking_msg.edit_text(display_text + "⏳")
-            except Exception:
-                pass
-            await asyncio.sleep(0.05)
     
     # Отправляем окончательный ответ с кнопкой отмены
-    try:
-        await thinking_msg.edit_text(display_text, reply_markup=get_cancel_keyboard())
-    except Exception:
+    if not await streamer.finish(answer, reply_markup=get_cancel_keyboard()):
         await message.answer(answer, reply_markup=get_cancel_keyboard())
 
-    _log_ai(message.from_user.id, message.from_user.username, text, answer)
+    await _log_ai(message, selected["id"], text, answer, started=started, usage=usage)
     
     # Оставляем состояние waiting_question для следующего вопроса
 
 # ---------------- INLINE CALLBACKS ----------------
-async def ai_inline_callback_handler(callback: types.CallbackQuery, state: FSMContext):
-    """Обработчик callback-ов только для AI модуля"""
-    data = callback.data or ""
+ai_router = CallbackRouter(AICallback)
+
+@ai_router.route(AIAction.DEPT)
+async def _choose_department(callback: types.CallbackQuery, state: FSMContext, cb: AICallback):
+    """Выбор отдела"""
+    dept_id = cb.id
+    await state.update_data(selected_department_id=dept_id)
     
-    print(f"[AI DEBUG] callback: {data} от {callback.from_user.id}")
+    # Получаем конкурсы этого отдела
+    contests, _, _ = await catalog.get_contests_page(dept_id)
     
+    if not contests:
+        await callback.message.edit_text(
+            "📭 В этом отделе пока нет конкурсов.",
+            reply_markup=await get_departments_keyboard(callback.from_user.id == ADMIN_ID)
+        )
+        await callback.answer()
+        return
+    
+    # УДАЛЯЕМ сообщение с выбором отдела
     try:
-        # Выбор отдела
-        if data.startswith("ai_dept_"):
-            dept_id = int(data.split("_")[2])
-            await state.update_data(selected_department_id=dept_id)
-            
-            # Получаем конкурсы этого отдела
-            contests = get_contests_by_department(dept_id)
-            
-            if not contests:
-                await callback.message.edit_text(
-                    "📭 В этом отделе пока нет конкурсов.",
-                    reply_markup=get_departments_keyboard(callback.from_user.id == ADMIN_ID)
-                )
-                await callback.answer()
-                return
-            
-            # УДАЛЯЕМ сообщение с выбором отдела
-            try:
-                await callback.message.delete()
-            except:
-                pass
-            
-            # Показываем конкурсы отдела
-            kb = _choose_contest_inline(contests)
-            await callback.message.answer(
-                "Выберите конкурс для вопросов к ИИ:",
-                reply_markup=kb
-            )
-            await state.set_state(AIStates.choosing_contest)
-            await callback.answer()
-            return
-        
-        # Выбор конкурса для AI
-        if data.startswith("ai_select_"):
-            cid = int(data.split("_")[2])
-            contest = get_contest_by_id(cid)
-            
-            if not contest or len(contest) < 5:
-                await callback.answer("Конкурс не найден", show_alert=True)
-                return
-
-            # УДАЛЯЕМ сообщение с выбором конкурса
-            try:
-                await callback.message.delete()
-            except:
-                pass
-
-            # Сохраняем выбранный конкурс и очищаем историю диалога
-            await state.update_data(
-                selected_contest={
-                    "id": contest[0],
-                    "title": contest[1],
-                    "date": contest[2],
-                    "file_name": contest[3],
-                    "file_path": contest[4]
-                },
-                dialog_history=[]
-            )
-            
-            # 1. Сначала отправляем PDF файл положения конкурса
-            if contest[4] and os.path.exists(contest[4]):
-                await callback.message.answer(
-                    f"📄 Положение конкурса:\n"
-                    f"📌 {contest[1]}\n"
-                    f"📅 {contest[2] if contest[2] else 'Без даты'}\n\n"
-                    "⬇️ Файл отправлен ниже:"
-                )
-                
-                await callback.message.answer_document(
-                    FSInputFile(contest[4], filename=contest[3]),
-                    caption=f"📄 {contest[1]}"
-                )
-            
-            # 2. Затем предлагаем задать вопрос
-            await callback.message.answer(
-                f"🤖 Теперь вы можете задать вопросы ИИ по этому конкурсу\n\n"
-                f"Конкурс: {contest[1]}\n\n"
-                "Напишите свой вопрос для ИИ.\n"
-                "Диалог будет продолжаться до отмены.\n"
-                "Напишите 'отмена' или нажмите кнопку 'Закончить диалог' для завершения.",
-                reply_markup=get_cancel_keyboard()
-            )
-            
-            await state.set_state(AIStates.waiting_question)
-            await callback.answer()
-            return
+        await callback.message.delete()
+    except:
+        pass
+    
+    # Показываем конкурсы отдела
+    kb = await get_contests_keyboard(dept_id)
+    await callback.message.answer(
+        "Выберите конкурс для вопросов к ИИ:",
+        reply_markup=kb
+    )
+    await state.set_state(AIStates.choosing_contest)
+    await callback.answer()
+
+@ai_router.route(AIAction.SELECT)
+async def _select_contest(callback: types.CallbackQuery, state: FSMContext, cb: AICallback):
+    """Выбор конкурса для AI"""
+    contest = await catalog.get_contest(cb.id)
+    
+    if not contest or len(contest) < 5:
+        await callback.answer("Конкурс не найден", show_alert=True)
+        return
+
+    # УДАЛЯЕМ сообщение с выбором конкурса
+    try:
+        await callback.message.delete()
+    except:
+        pass
+
+    # Сохраняем выбранный конкурс и очищаем историю диалога
+    await state.update_data(
+        selected_contest={
+            "id": contest[0],
+            "title": contest[1],
+            "date": contest[2],
+            "file_name": contest[3],
+            "file_path": contest[4]
+        },
+        dialog_history=[]
+    )
+    
+    # 1. Сначала отправляем PDF файл положения конкурса
+    if contest[7] or (contest[4] and os.path.exists(contest[4])):
+        await callback.message.answer(
+            f"📄 Положение конкурса:\n"
+            f"📌 {contest[1]}\n"
+            f"📅 {contest[2] if contest[2] else 'Без даты'}\n\n"
+            "⬇️ Файл отправлен ниже:"
+        )
         
-        # Назад к отделам
-        if data == "ai_back_to_depts":
-            try:
-                await callback.message.delete()
-            except:
-                pass
-                
-            is_admin = callback.from_user.id == ADMIN_ID
-            kb = get_departments_keyboard(is_admin)
-            await callback.message.answer("Выберите отдел:", reply_markup=kb)
-            await state.set_state(AIStates.choosing_department)
-            await callback.answer()
-            return
+        await send_contest_document(callback.message, contest, caption=f"📄 {contest[1]}")
+    
+    # 2. Затем предлагаем задать вопрос
+    await callback.message.answer(
+        f"🤖 Теперь вы можете задать вопросы ИИ по этому конкурсу\n\n"
+        f"Конкурс: {contest[1]}\n\n"
+        "Напишите свой вопрос для ИИ.\n"
+        "Диалог будет продолжаться до отмены.\n"
+        "Напишите 'отмена' или нажмите кнопку 'Закончить диалог' для завершения.",
+        reply_markup=get_cancel_keyboard()
+    )
+    
+    await state.set_state(AIStates.waiting_question)
+    await callback.answer()
+
+@ai_router.route(AIAction.BACK)
+async def _back_to_departments(callback: types.CallbackQuery, state: FSMContext, cb: AICallback):
+    """Назад к отделам"""
+    try:
+        await callback.message.delete()
+    except:
+        pass
         
-        # Завершение диалога с ИИ
-        if data == "ai_end_dialog":
-            await state.clear()
-            await callback.message.answer("Диалог с ИИ завершен.", reply_markup=main_keyboard(callback.from_user.id))
-            await callback.answer()
-            return
+    is_admin = callback.from_user.id == ADMIN_ID
+    kb = await get_departments_keyboard(is_admin)
+    await callback.message.answer("Выберите отдел:", reply_markup=kb)
+    await state.set_state(AIStates.choosing_department)
+    await callback.answer()
+
+@ai_router.route(AIAction.END)
+async def _end_dialog(callback: types.CallbackQuery, state: FSMContext, cb: AICallback):
+    """Завершение диалога с ИИ"""
+    await state.clear()
+    await callback.message.answer("Диалог с ИИ завершен.", reply_markup=main_keyboard(callback.from_user.id))
+    await callback.answer()
 
+async def ai_page_handler(callback: types.CallbackQuery, callback_data: PageCallback):
+    """Листание конкурсов при выборе для ИИ"""
+    kb = await get_contests_keyboard(callback_data.dept, (callback_data.day, callback_data.id), callback_data.back)
+    try:
+        await callback.message.edit_reply_markup(reply_markup=kb)
+    except Exception as e:
+        logger.debug(f"[AI] не удалось перелистнуть: {e}")
+    await callback.answer()
+
+async def ai_inline_callback_handler(callback: types.CallbackQuery, state: FSMContext):
+    """Обработчик callback-ов только для AI модуля"""
+    logger.debug(f"[AI DEBUG] callback: {callback.data} от {callback.from_user.id}")
+    
+    try:
+        # Хендлер выбирается по action из словаря, id уже разобран
+        await ai_router.dispatch(callback, state)
     except Exception as e:
         await callback.answer(f"Ошибка: {e}", show_alert=True)
         logger.error(f"AI inline handler error: {e}")
@@ -353,6 +405,8 @@ async def ai_inline_callback_handler(callback: types.CallbackQuery, state: FSMCo
 def register_ai_handlers(dp: Dispatcher):
     dp.message.register(start_question, F.text == "❓ Задать вопрос")
     dp.message.register(handle_ai_question, AIStates.waiting_question)
-    dp.callback_query.register(ai_inline_callback_handler, F.data.startswith("ai_"))
+    # "ai_" - кнопки старого формата из уже отправленных сообщений
+    dp.callback_query.register(ai_inline_callback_handler, F.data.startswith("ai:") | F.data.startswith("ai_"))
+    dp.callback_query.register(ai_page_handler, PageCallback.filter(F.menu == ContestListMenu.AI))
     
-    print("[AI] ✅ Хендлеры зарегистрированы")
\ No newline at end of file
+    logger.info("[AI] ✅ Хендлеры зарегистрированы")
\ No newline at end of file
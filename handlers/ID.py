@@ -1,39 +1,84 @@
-import sqlite3
+import asyncio
+import logging
+import time
 from aiogram import types, Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.filters import Command
 from aiogram import Dispatcher
+from config import USERS_FLUSH_INTERVAL
+from database import run_db, save_user_activity
+
+logger = logging.getLogger("users")
 
 # Создаем роутер
 id_router = Router()
 
-conn = sqlite3.connect("bot.db")
-cur = conn.cursor()
 
-cur.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    user_id INTEGER PRIMARY KEY,
-    username TEXT,
-    first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)
-""")
-conn.commit()
+class UserTracker:
+    """Учёт пользователей без записи в БД на каждое сообщение.
 
-def register_user(message):
-    user_id = message.from_user.id
-    username = message.from_user.username
+    Изменения (новые пользователи, время последнего сообщения, счётчик
+    сообщений) копим в буфере и сбрасываем в общую базу (таблица users)
+    одной транзакцией из фоновой задачи; новый пользователь или уже известный -
+    решает upsert при записи.
+    """
+
+    def __init__(self, flush_interval: float = USERS_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending = {}  # user_id -> [username, last_seen, messages]
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def track(self, user: types.User):
+        """Отметить сообщение пользователя (O(1), без обращения к БД)"""
+        entry = self._pending.get(user.id)
+        if entry is None:
+            self._pending[user.id] = [user.username, time.time(), 1]
+        else:
+            entry[0] = user.username or entry[0]
+            entry[1] = time.time()
+            entry[2] += 1
 
-    cur.execute("""
-        INSERT OR IGNORE INTO users (user_id, username)
-        VALUES (?, ?)
-    """, (user_id, username))
-    conn.commit()
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            rows = [(uid, username, last_seen, count) for uid, (username, last_seen, count) in pending.items()]
+            try:
+                await run_db(save_user_activity, rows)
+            except Exception as e:
+                logger.error(f"Ошибка записи пользователей: {e}")
+                # Вернём в буфер, чтобы не потерять при следующем сбросе
+                for uid, username, last_seen, count in rows:
+                    entry = self._pending.setdefault(uid, [username, last_seen, 0])
+                    entry[2] += count
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+tracker = UserTracker()
+
+def register_user(message):
+    tracker.track(message.from_user)
 
 FRIEND_ID = 182491249  
 
 @id_router.message(F.from_user.id == FRIEND_ID)
 async def block_friend(message: types.Message):
-    print(f"[BLOCK] Блокируем FRIEND_ID {FRIEND_ID}")
+    logger.debug(f"[BLOCK] Блокируем FRIEND_ID {FRIEND_ID}")
     register_user(message)
     await message.answer("саша пошел нахуй, нехер мне бота ломать")
 
@@ -45,13 +90,17 @@ async def log_all_users(message: types.Message, state: FSMContext):
         return
     
     if message.text and message.text.strip():
-        print(f"[LOG] {message.from_user.id}: '{message.text[:30]}'")
+        logger.debug(f"[LOG] {message.from_user.id}: '{message.text[:30]}'")
         register_user(message)
 
 def register_userlog_handler(dp: Dispatcher):
+    # Фоновая запись пользователей живёт вместе с диспетчером
+    dp.startup.register(tracker.start)
+    dp.shutdown.register(tracker.stop)
+    
     @dp.message(F.from_user.id == FRIEND_ID)
     async def block_friend(message: types.Message):
-        print(f"[BLOCK] Блокируем FRIEND_ID {FRIEND_ID}")
+        logger.debug(f"[BLOCK] Блокируем FRIEND_ID {FRIEND_ID}")
         register_user(message)
         await message.answer("саша пошел нахуй, нехер мне бота ломать")
         return  # Важно: прерываем обработку
@@ -59,7 +108,7 @@ def register_userlog_handler(dp: Dispatcher):
     @dp.message()
     async def log_all_users(message: types.Message, state: FSMContext):
         if message.text and message.text.strip():
-            print(f"[LOG] {message.from_user.id}: '{message.text[:30]}'")
+            logger.debug(f"[LOG] {message.from_user.id}: '{message.text[:30]}'")
             register_user(message)
         
-    print("[ID.py] ✅ Хендлеры зарегистрированы (прозрачное логирование)")
\ No newline at end of file
+    logger.info("[ID.py] ✅ Хендлеры зарегистрированы (прозрачное логирование)")
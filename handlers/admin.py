@@ -1,12 +1,70 @@
 import os
+import logging
 from datetime import datetime
 from aiogram import types, Dispatcher
-from aiogram.filters import Command
-from config import ADMIN_ID
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile
+from config import ADMIN_ID, BACKUP_DIR, BACKUP_KEEP, WORKER_ID, WORKER_COUNT
+from database import run_db, count_users, get_top_asked_contests, get_contest_askers, backup_db
+from answer_cache import get_stats as get_answer_cache_stats
+from ai_scheduler import AIScheduler
+from pdf_pipeline import jobs as upload_jobs
+from pdf_worker import pdf_worker
+import metrics
+from throttling import blocked_users, block_user, throttled_total
+import shared_state
 
-# Глобальные переменные (только для этого модуля)
-secret_mode = False
-blocked_users = set()
+logger = logging.getLogger("admin")
+
+# Хендлеры, время которых показываем в /stats
+STATS_HANDLERS = ("handle_ai_question", "contests_inline_callback_handler", "receive_file")
+
+def _metrics_summary() -> str:
+    """Краткая сводка метрик для /stats (полные данные - на /metrics)"""
+    lines = [f"📈 Апдейтов обработано: {metrics.updates_total.total():.0f}, "
+             f"ошибок в хендлерах: {metrics.handler_errors_total.total():.0f}"]
+    for name in STATS_HANDLERS:
+        h = metrics.handler_seconds.summary(name)
+        if h["count"]:
+            lines.append(f"   {name}: {h['count']} шт., p50 {h['p50']:.2f} с, p95 {h['p95']:.2f} с")
+    
+    ds = metrics.deepseek_seconds.summary("/chat/completions:stream")
+    lines.append(f"🧠 DeepSeek: {ds['count']} ответов, p50 {ds['p50']:.2f} с, p95 {ds['p95']:.2f} с, "
+                 f"ошибок {metrics.deepseek_errors_total.total():.0f}")
+    lines.append(f"   токены: вопрос {metrics.deepseek_tokens_total.get('prompt'):.0f}, "
+                 f"ответ {metrics.deepseek_tokens_total.get('completion'):.0f}")
+    
+    queries = [(func, metrics.db_query_seconds.summary(*func)) for func in metrics.db_query_seconds.label_sets()]
+    total = sum(q["count"] for _, q in queries)
+    if total:
+        avg = sum(q["avg"] * q["count"] for _, q in queries) / total
+        slowest_func, slowest = max(queries, key=lambda item: item[1]["avg"])
+        lines.append(f"🗄 БД: {total} запросов, ср. {avg * 1000:.1f} мс, "
+                     f"самый медленный {slowest_func[0]} ({slowest['avg'] * 1000:.1f} мс)")
+    
+    fsm = dict((where[0], value) for where, value in metrics.fsm_states.items())
+    if fsm:
+        lines.append(f"🗂 FSM: в памяти {fsm.get('in_memory', 0):.0f}, ждут записи {fsm.get('dirty', 0):.0f}, "
+                     f"в БД {fsm.get('stored', 0):.0f}")
+    return "\n".join(lines)
+
+# Больше бот отправить документом не может (лимит Bot API на загрузку)
+BACKUP_SEND_LIMIT = 50 * 1024 * 1024
+
+async def _top_contests_summary() -> str:
+    top = await run_db(get_top_asked_contests, 3)
+    if not top:
+        return ""
+    lines = ["🔥 Чаще всего спрашивают ИИ о конкурсах:"]
+    for contest_id, title, questions, users in top:
+        lines.append(f"   #{contest_id} {title[:30]}: {questions} вопр. от {users} польз.")
+    return "\n".join(lines) + "\n"
+
+def _worker_note() -> str:
+    """В режиме sharded очередь ИИ, кэш и метрики выше - только процесса, обработавшего /stats"""
+    if not WORKER_ID:
+        return ""
+    return f"⚙️ Процесс {WORKER_ID} из {WORKER_COUNT}: очередь ИИ, кэш и метрики - только этого процесса\n\n"
 
 def register_admin_ai_myid_handler(dp: Dispatcher):
     """Регистрация админских команд (старый подход через dp)"""
@@ -14,7 +72,7 @@ def register_admin_ai_myid_handler(dp: Dispatcher):
     # /myid - для всех пользователей
     @dp.message(Command("myid"))
     async def myid(message: types.Message):
-        print(f"[ADMIN] /myid от {message.from_user.id}")
+        logger.debug(f"[ADMIN] /myid от {message.from_user.id}")
         user_id = message.from_user.id
         
         if user_id == ADMIN_ID:
@@ -24,6 +82,7 @@ def register_admin_ai_myid_handler(dp: Dispatcher):
                 "/admin_mode - грубый режим ИИ\n"
                 "/troll @user - заблокировать\n"
                 "/stats - статистика\n"
+                "/jobs - обработка PDF\n"
                 "/author - автор бота"
             )
         else:
@@ -32,21 +91,22 @@ def register_admin_ai_myid_handler(dp: Dispatcher):
     # /admin_mode - только для админа
     @dp.message(Command("admin_mode"))
     async def toggle_secret_mode(message: types.Message):
-        print(f"[ADMIN] /admin_mode от {message.from_user.id}")
+        logger.debug(f"[ADMIN] /admin_mode от {message.from_user.id}")
         
         if message.from_user.id != ADMIN_ID:
             await message.answer("❌ У вас нет прав админа")
             return
         
-        global secret_mode
-        secret_mode = not secret_mode
+        # Настройка общая для всех процессов бота (хранится в базе)
+        secret_mode = not shared_state.get_flag(shared_state.SECRET_MODE)
+        await shared_state.set_flag(shared_state.SECRET_MODE, secret_mode)
         status = "включён 🔥" if secret_mode else "выключен ✅"
         await message.answer(f"Грубый режим ИИ {status}")
     
     # /troll - только для админа
     @dp.message(Command("troll"))
     async def add_blocked_user(message: types.Message):
-        print(f"[ADMIN] /troll от {message.from_user.id}")
+        logger.debug(f"[ADMIN] /troll от {message.from_user.id}")
         
         if message.from_user.id != ADMIN_ID:
             await message.answer("❌ У вас нет прав админа")
@@ -59,15 +119,13 @@ def register_admin_ai_myid_handler(dp: Dispatcher):
         
         user = parts[1]
         try:
+            # Юзернеймы храним строкой "@name", ID - числом; проверяет ThrottlingMiddleware
+            await block_user(user)
             if user.startswith("@"):
-                # Для юзернеймов сохраняем как строку
-                blocked_users.add(user)
                 await message.answer(f"✅ Пользователь {user} добавлен в черный список 😏")
             else:
-                # Для ID сохраняем как число
-                user_id = int(user)
-                blocked_users.add(user_id)
                 await message.answer(f"✅ Пользователь ID:{user} добавлен в черный список 😏")
+            logger.info(f"[ADMIN] {user} заблокирован")
         except ValueError:
             await message.answer("❌ Неверный формат. Используйте: /troll @username или /troll 123456789")
         except Exception as e:
@@ -75,30 +133,41 @@ def register_admin_ai_myid_handler(dp: Dispatcher):
     
     # /stats - только для админа
     @dp.message(Command("stats"))
-    async def show_stats(message: types.Message):
-        print(f"[ADMIN] /stats от {message.from_user.id}")
+    async def show_stats(message: types.Message, ai_scheduler: AIScheduler):
+        logger.debug(f"[ADMIN] /stats от {message.from_user.id}")
         
         if message.from_user.id != ADMIN_ID:
             await message.answer("❌ У вас нет прав админа")
             return
         
-        # Получаем количество пользователей из базы (если есть)
         try:
-            import sqlite3
-            conn = sqlite3.connect("bot.db")
-            cur = conn.cursor()
-            cur.execute("SELECT COUNT(*) FROM users")
-            user_count = cur.fetchone()[0]
-            conn.close()
-        except:
-            user_count = 0
+            user_count = await run_db(count_users)
+            top_contests = await _top_contests_summary()
+        except Exception as e:
+            logger.error(f"[ADMIN] /stats: {e}")
+            user_count, top_contests = 0, ""
+        
+        cache = await get_answer_cache_stats()
+        queue = ai_scheduler.stats()
+        await metrics.collect()
         
         stats_text = (
             "📊 Статистика бота:\n\n"
             f"👑 Админ ID: {ADMIN_ID}\n"
             f"👥 Всего пользователей: {user_count}\n"
             f"🚫 Заблокированных: {len(blocked_users)}\n"
-            f"🤖 Грубый режим ИИ: {'ВКЛ' if secret_mode else 'ВЫКЛ'}\n\n"
+            f"🛑 Антифлуд отбросил: вопросы ИИ {throttled_total.get('ai'):.0f}, скачивания {throttled_total.get('download'):.0f}, "
+            f"прочее {throttled_total.get('generic'):.0f}, от заблокированных {throttled_total.get('blocked'):.0f}\n"
+            f"🤖 Грубый режим ИИ: {'ВКЛ' if shared_state.get_flag(shared_state.SECRET_MODE) else 'ВЫКЛ'}\n"
+            f"💾 Кэш ответов ИИ: {cache['entries']} записей, "
+            f"попаданий {cache['hits']}, промахов {cache['misses']} ({cache['hit_rate']:.0%})\n"
+            f"⏳ Очередь ИИ: выполняется {queue['in_flight']}, ждут {queue['queued']}, "
+            f"заменено {queue['replaced']}\n"
+            f"   ожидание в очереди: ср. {queue['wait_avg']:.2f} с, макс. {queue['wait_max']:.2f} с\n"
+            f"   запрос к DeepSeek: ср. {queue['upstream_avg']:.2f} с, макс. {queue['upstream_max']:.2f} с\n"
+            f"{top_contests}"
+            f"{_metrics_summary()}\n\n"
+            f"{_worker_note()}"
             "Доступные команды:\n"
             "/myid - узнать свой ID\n"
             "/admin_mode - грубый режим\n"
@@ -108,10 +177,90 @@ def register_admin_ai_myid_handler(dp: Dispatcher):
         
         await message.answer(stats_text)
     
+    # /jobs - статус фоновой обработки PDF, только для админа
+    @dp.message(Command("jobs"))
+    async def show_jobs(message: types.Message):
+        logger.debug(f"[ADMIN] /jobs от {message.from_user.id}")
+        
+        if message.from_user.id != ADMIN_ID:
+            await message.answer("❌ У вас нет прав админа")
+            return
+        
+        if not upload_jobs:
+            await message.answer("📭 Задач обработки PDF пока не было")
+            return
+        
+        icons = {"queued": "🕓", "running": "⏳", "done": "✅", "error": "❌"}
+        pool = pdf_worker.stats()
+        lines = [
+            f"⚙️ Процессов: {pool['workers']}, выполняется: {pool['running']}, в очереди: {pool['queued']}\n"
+            f"Отклонено: {pool['rejected']}, таймаутов: {pool['timeouts']}\n",
+            "🗂 Обработка PDF (последние задачи):\n",
+        ]
+        for job in reversed(list(upload_jobs.values())[-10:]):
+            line = f"{icons.get(job.status, '•')} #{job.id} {job.title[:30]} - {job.status}, {job.duration:.1f} с"
+            if job.page_count:
+                line += f", {job.page_count} стр."
+            if job.error:
+                line += f"\n   {job.error[:100]}"
+            lines.append(line)
+        await message.answer("\n".join(lines))
+    
+    # /askers <id конкурса> - кто спрашивал ИИ о конкурсе, только для админа
+    @dp.message(Command("askers"))
+    async def show_askers(message: types.Message, command: CommandObject):
+        logger.debug(f"[ADMIN] /askers от {message.from_user.id}")
+        
+        if message.from_user.id != ADMIN_ID:
+            await message.answer("❌ У вас нет прав админа")
+            return
+        
+        if not command.args or not command.args.strip().isdigit():
+            await message.answer("❌ Укажи ID конкурса: /askers 12")
+            return
+        
+        contest_id = int(command.args.strip())
+        askers = await run_db(get_contest_askers, contest_id)
+        if not askers:
+            await message.answer(f"📭 О конкурсе #{contest_id} ИИ ещё не спрашивали")
+            return
+        
+        lines = [f"🙋 Кто спрашивал ИИ о конкурсе #{contest_id}:\n"]
+        for user_id, username, questions, last_asked in askers:
+            who = f"@{username}" if username else f"ID:{user_id}"
+            lines.append(f"{who} - {questions} вопр., последний {datetime.fromtimestamp(last_asked):%d.%m %H:%M}")
+        await message.answer("\n".join(lines))
+    
+    # /backup - резервная копия базы без остановки бота, только для админа
+    @dp.message(Command("backup"))
+    async def make_backup(message: types.Message):
+        logger.debug(f"[ADMIN] /backup от {message.from_user.id}")
+        
+        if message.from_user.id != ADMIN_ID:
+            await message.answer("❌ У вас нет прав админа")
+            return
+        
+        await message.answer("⏳ Создаю резервную копию базы...")
+        try:
+            path, size, ok = await run_db(backup_db, BACKUP_DIR, BACKUP_KEEP)
+        except Exception as e:
+            logger.error(f"[ADMIN] Ошибка резервного копирования: {e}")
+            await message.answer(f"❌ Ошибка резервного копирования: {str(e)[:100]}")
+            return
+        
+        logger.info(f"[ADMIN] Резервная копия {path}, {size} байт, проверка {'ok' if ok else 'FAILED'}")
+        text = (f"{'✅' if ok else '⚠️'} Копия: {path}\n"
+                f"💾 {size / 1024 / 1024:.1f} МБ, проверка целостности: {'ok' if ok else 'ОШИБКА'}\n"
+                f"🗂 Хранится последних копий: {BACKUP_KEEP}")
+        if size <= BACKUP_SEND_LIMIT:
+            await message.answer_document(FSInputFile(path), caption=text)
+        else:
+            await message.answer(text + "\n(файл больше 50 МБ, остался на сервере)")
+    
     # /author - для всех пользователей
     @dp.message(Command("author"))
     async def show_author(message: types.Message):
-        print(f"[ADMIN] /author от {message.from_user.id}")
+        logger.debug(f"[ADMIN] /author от {message.from_user.id}")
         author_name = "Ковалик Иван"
         await message.answer(f"👨‍💻 Автор бота: {author_name}")
         
@@ -125,10 +274,12 @@ def register_admin_ai_myid_handler(dp: Dispatcher):
             "/menu - главное меню\n"
             "/myid - узнать свой ID\n"
             "/author - автор бота\n"
+            "/search запрос - поиск положений\n"
             "/help - эта справка\n\n"
             "Кнопки меню:\n"
             "❓ Задать вопрос - AI-помощник\n"
-            "📂 Положения конкурсов - скачать PDF"
+            "📂 Положения конкурсов - скачать PDF\n\n"
+            "Поиск из любого чата: @имя_бота запрос"
         )
         
         if message.from_user.id == ADMIN_ID:
@@ -136,7 +287,10 @@ def register_admin_ai_myid_handler(dp: Dispatcher):
                 "\n\n👑 Админские команды:\n"
                 "/admin_mode - грубый режим ИИ\n"
                 "/troll @user - заблокировать\n"
-                "/stats - статистика\n\n"
+                "/stats - статистика\n"
+                "/jobs - обработка PDF\n"
+                "/askers id - кто спрашивал ИИ о конкурсе\n"
+                "/backup - резервная копия базы\n\n"
                 "Админские кнопки:\n"
                 "📄 Загрузить положение\n"
                 "🗑 Удалить положение\n"
@@ -145,4 +299,4 @@ def register_admin_ai_myid_handler(dp: Dispatcher):
         
         await message.answer(help_text)
     
-    print("[ADMIN] ✅ Админские хендлеры зарегистрированы (старый подход)")
+    logger.info("[ADMIN] ✅ Админские хендлеры зарегистрированы (старый подход)")
@@ -1,25 +1,25 @@
 import os
-import uuid
-import fitz  # PyMuPDF
 import logging
-from datetime import datetime
 from aiogram import types, Dispatcher, F
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
-from config import ADMIN_ID
-from database import init_db, add_contest, get_all_contests, get_contest_by_id, delete_contest, get_all_departments, get_contests_by_department, add_department
+from aiogram.exceptions import TelegramBadRequest
+from config import ADMIN_ID, PDF_MAX_SIZE
+from database import parse_contest_day, add_contest_async, delete_contest_async, add_department_async
+from catalog import catalog
+from pdf_pipeline import submit_upload, shutdown as shutdown_pipeline
+from file_store import save_telegram_file, discard_if_unused, FileTooLarge
+from log_setup import ACTIONS_LOGGER
+from callbacks import CallbackRouter, ContestsCallback, ContestAction, ContestListMenu, PageCallback
 
 # ---------------- INIT ----------------
-init_db()
 os.makedirs("contests_files", exist_ok=True)
 os.makedirs("logs", exist_ok=True)
 os.makedirs("pdf_previews", exist_ok=True)
 
 logger = logging.getLogger("contests")
-logger.setLevel(logging.INFO)
-fh = logging.FileHandler("logs/contests.log", encoding='utf-8')
-logger.addHandler(fh)
+action_logger = logging.getLogger(ACTIONS_LOGGER)
 
 # ---------------- FSM ----------------
 class ContestStates(StatesGroup):
@@ -32,20 +32,6 @@ class ContestStates(StatesGroup):
     confirmation = State()
     waiting_new_department = State()  # НОВОЕ: для добавления отдела
 
-# ---------------- UTILS ----------------
-def generate_pdf_preview(file_path: str, pages: int = 1) -> list:
-    previews = []
-    try:
-        with fitz.open(file_path) as doc:
-            for i in range(min(pages, len(doc))):
-                pix = doc[i].get_pixmap()
-                path = os.path.join("pdf_previews", f"{uuid.uuid4().hex}.png")
-                pix.save(path)
-                previews.append(path)
-    except Exception as e:
-        logger.error(f"Ошибка генерации превью PDF: {e}")
-    return previews
-
 # ---------------- KEYBOARDS ----------------
 def main_keyboard(user_id: int) -> ReplyKeyboardMarkup:
     kb = []
@@ -59,10 +45,9 @@ def main_keyboard(user_id: int) -> ReplyKeyboardMarkup:
     
     return ReplyKeyboardMarkup(keyboard=kb, resize_keyboard=True)
 
-def get_departments_keyboard(action: str = "show") -> InlineKeyboardMarkup:
-    """Клавиатура с отделами для разных действий"""
-    departments = get_all_departments()
-    keyboard = []
+async def get_departments_keyboard(action: str = "show") -> InlineKeyboardMarkup:
+    """Клавиатура с отделами для разных действий (собирается один раз до изменения каталога)"""
+    departments = await catalog.get_departments()
     
     if not departments:
         standard_departments = [
@@ -74,14 +59,24 @@ def get_departments_keyboard(action: str = "show") -> InlineKeyboardMarkup:
             (6, "🤖 Робототехника")
         ]
         for dept_id, dept_name in standard_departments:
-            add_department(dept_name)
-        departments = standard_departments
+            await add_department_async(dept_name)
     
+    return await catalog.keyboard(("contests_depts", action), lambda: _build_departments_keyboard(catalog.departments, action))
+
+# Режим клавиатуры отделов -> action кнопки
+DEPARTMENT_ACTIONS = {
+    "show": ContestAction.SHOW_DEPT,
+    "upload": ContestAction.UPLOAD_DEPT,
+    "delete": ContestAction.DELETE_DEPT,
+}
+
+def _build_departments_keyboard(departments: list, action: str) -> InlineKeyboardMarkup:
+    keyboard = []
     row = []
     for dept_id, dept_name in departments:
         row.append(InlineKeyboardButton(
             text=dept_name, 
-            callback_data=f"contests_{action}_dept_{dept_id}"
+            callback_data=ContestsCallback(action=DEPARTMENT_ACTIONS[action], id=dept_id).pack()
         ))
         if len(row) == 2:
             keyboard.append(row)
@@ -90,12 +85,26 @@ def get_departments_keyboard(action: str = "show") -> InlineKeyboardMarkup:
     if row:
         keyboard.append(row)
     
-    keyboard.append([InlineKeyboardButton(text="❌ Отмена", callback_data=f"contests_cancel_{action}")])
+    keyboard.append([InlineKeyboardButton(text="❌ Отмена", callback_data=ContestsCallback(action=ContestAction.CANCEL).pack())])
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def _choose_contest_inline(contests: list, action: str = "download") -> InlineKeyboardMarkup:
-    """Инлайн-клавиатура для выбора конкурса"""
+def page_buttons(menu: ContestListMenu, dept_id: int, contests: list, has_prev: bool, has_next: bool) -> list:
+    """Ряд кнопок листания; курсор - крайний конкурс страницы (строки из get_contests_page)"""
+    row = []
+    if has_prev:
+        first = contests[0]
+        row.append(InlineKeyboardButton(text="◀️ Новее", callback_data=PageCallback(
+            menu=menu, dept=dept_id, day=first[5], id=first[0], back=True).pack()))
+    if has_next:
+        last = contests[-1]
+        row.append(InlineKeyboardButton(text="Старее ▶️", callback_data=PageCallback(
+            menu=menu, dept=dept_id, day=last[5], id=last[0]).pack()))
+    return [row] if row else []
+
+def _choose_contest_inline(contests: list, action: str = "download", dept_id: int = 0,
+                           has_prev: bool = False, has_next: bool = False) -> InlineKeyboardMarkup:
+    """Инлайн-клавиатура для выбора конкурса (одна страница)"""
     buttons = []
     
     for contest in contests:
@@ -108,42 +117,88 @@ def _choose_contest_inline(contests: list, action: str = "download") -> InlineKe
             
             if action == "download":
                 button_text = f"📄 {display_title}"
-                callback_data = f"contests_download_{cid}"
+                callback_data = ContestsCallback(action=ContestAction.DOWNLOAD, id=cid).pack()
             else:
                 button_text = f"🗑 {display_title}"
-                callback_data = f"contests_delete_{cid}"
+                callback_data = ContestsCallback(action=ContestAction.DELETE, id=cid).pack()
             
             buttons.append([InlineKeyboardButton(
                 text=f"{button_text} ({date[:10]})", 
                 callback_data=callback_data
             )])
     
-    buttons.append([InlineKeyboardButton(text="⬅️ Назад к отделам", callback_data="contests_back_to_depts")])
+    menu = ContestListMenu.DOWNLOAD if action == "download" else ContestListMenu.DELETE
+    buttons.extend(page_buttons(menu, dept_id, contests, has_prev, has_next))
+    buttons.append([InlineKeyboardButton(text="⬅️ Назад к отделам", callback_data=ContestsCallback(action=ContestAction.BACK).pack())])
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+async def get_contests_keyboard(dept_id: int, action: str = "download",
+                                cursor: tuple = None, backward: bool = False) -> InlineKeyboardMarkup:
+    """Закэшированная клавиатура одной страницы конкурсов отдела"""
+    contests, has_prev, has_next = await catalog.get_contests_page(dept_id, cursor, backward)
+    return await catalog.keyboard(
+        ("contests_list", dept_id, action, cursor, backward),
+        lambda: _choose_contest_inline(contests, action, dept_id, has_prev, has_next)
+    )
+
 def confirmation_keyboard() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[[KeyboardButton(text="✅ Да все верно"), KeyboardButton(text="❌ Нет, изменить")]],
         resize_keyboard=True, one_time_keyboard=True
     )
 
-def _log_action(line: str):
-    try:
-        with open("logs/actions.log", "a", encoding="utf-8") as f:
-            f.write(f"[{datetime.now().isoformat()}] {line}\n")
-    except Exception:
-        pass
+def _upload_notifier(message: types.Message):
+    """Уведомление админа о завершении фоновой обработки PDF"""
+    async def notify(job):
+        if job.status == "done":
+            text = (f"✅ PDF обработан (задача #{job.id})\n"
+                    f"📌 {job.title}\n"
+                    f"📄 Страниц: {job.page_count}\n"
+                    f"⏱ {job.duration:.1f} с")
+            if job.previews:
+                await message.answer_photo(FSInputFile(job.previews[0]), caption=text)
+            else:
+                await message.answer(text)
+        else:
+            await message.answer(f"❌ Ошибка обработки PDF (задача #{job.id}, {job.title}):\n{job.error[:200]}")
+    return notify
+
+async def send_contest_document(message: types.Message, contest, caption: str):
+    """Отправить PDF положения.
+
+    Если Telegram уже видел файл, отправляем по file_id без повторной загрузки;
+    с диска - только когда file_id ещё нет или Telegram его не принял.
+    Возвращает отправленное сообщение или None, если файла нет.
+    """
+    file_id = contest[7] if len(contest) > 7 else None
+    if file_id:
+        try:
+            return await message.answer_document(file_id, caption=caption)
+        except TelegramBadRequest as e:
+            logger.warning(f"[CONTESTS] file_id конкурса {contest[0]} не принят: {e}")
+            await catalog.set_contest_file_id(contest[0], None)
+    
+    if not contest[4] or not os.path.exists(contest[4]):
+        return None
+    sent = await message.answer_document(FSInputFile(contest[4], filename=contest[3]), caption=caption)
+    if sent.document:
+        await catalog.set_contest_file_id(contest[0], sent.document.file_id)
+    return sent
+
+def _log_action(action: str, user_id: int, **fields):
+    """Действие админа -> logs/actions.jsonl (пишет фоновый поток логирования)"""
+    action_logger.info(action, extra={"action": action, "user_id": user_id, **fields})
 
 # ---------------- ОСНОВНЫЕ ХЕНДЛЕРЫ ----------------
 async def show_my_contests(message: types.Message, state: FSMContext):
     """Показать конкурсы - сначала выбор отдела"""
-    print(f"[CONTESTS] show_my_contests от {message.from_user.id}")
+    logger.debug(f"[CONTESTS] show_my_contests от {message.from_user.id}")
     
     await state.clear()
     await state.set_state(ContestStates.choosing_department_for_show)
     
-    kb = get_departments_keyboard(action="show")
+    kb = await get_departments_keyboard(action="show")
     await message.answer(
         "📊 Выберите отдел:\nПоказать конкурсы из какого отдела?",
         reply_markup=kb
@@ -151,7 +206,7 @@ async def show_my_contests(message: types.Message, state: FSMContext):
 
 async def start_upload(message: types.Message, state: FSMContext):
     """Начать загрузку - сначала выбор отдела"""
-    print(f"[CONTESTS] start_upload от {message.from_user.id}")
+    logger.debug(f"[CONTESTS] start_upload от {message.from_user.id}")
     
     if message.from_user.id != ADMIN_ID:
         await message.answer("❌ У вас нет прав", reply_markup=main_keyboard(message.from_user.id))
@@ -160,7 +215,7 @@ async def start_upload(message: types.Message, state: FSMContext):
     await state.clear()
     await state.set_state(ContestStates.choosing_department_for_upload)
     
-    kb = get_departments_keyboard(action="upload")
+    kb = await get_departments_keyboard(action="upload")
     await message.answer(
         "📊 Выберите отдел:\nВ какой отдел загрузить конкурс?",
         reply_markup=kb
@@ -168,7 +223,7 @@ async def start_upload(message: types.Message, state: FSMContext):
 
 async def delete_start(message: types.Message, state: FSMContext):
     """Начать удаление - сначала выбор отдела"""
-    print(f"[CONTESTS] delete_start от {message.from_user.id}")
+    logger.debug(f"[CONTESTS] delete_start от {message.from_user.id}")
     
     if message.from_user.id != ADMIN_ID:
         await message.answer("❌ У вас нет прав", reply_markup=main_keyboard(message.from_user.id))
@@ -177,7 +232,7 @@ async def delete_start(message: types.Message, state: FSMContext):
     await state.clear()
     await state.set_state(ContestStates.choosing_department_for_delete)
     
-    kb = get_departments_keyboard(action="delete")
+    kb = await get_departments_keyboard(action="delete")
     await message.answer(
         "📊 Выберите отдел:\nИз какого отдела удалить конкурс?",
         reply_markup=kb
@@ -185,7 +240,7 @@ async def delete_start(message: types.Message, state: FSMContext):
 
 async def add_department_start(message: types.Message, state: FSMContext):
     """Начать добавление нового отдела"""
-    print(f"[CONTESTS] add_department_start от {message.from_user.id}")
+    logger.debug(f"[CONTESTS] add_department_start от {message.from_user.id}")
     
     if message.from_user.id != ADMIN_ID:
         await message.answer("❌ У вас нет прав", reply_markup=main_keyboard(message.from_user.id))
@@ -218,7 +273,7 @@ async def fsm_text_handler(message: types.Message, state: FSMContext):
     
     # ========== ДОБАВЛЕНИЕ НОВОГО ОТДЕЛА ==========
     if current == ContestStates.waiting_new_department.state:
-        print(f"[CONTESTS FSM] Добавление отдела: '{txt}'")
+        logger.debug(f"[CONTESTS FSM] Добавление отдела: '{txt}'")
         
         if len(txt) < 2:
             await message.answer("❌ Слишком короткое название. Введите еще раз:")
@@ -230,15 +285,15 @@ async def fsm_text_handler(message: types.Message, state: FSMContext):
         
         try:
             # Проверяем, нет ли уже такого отдела
-            departments = get_all_departments()
+            departments = await catalog.get_departments()
             for dept_id, dept_name in departments:
                 if dept_name.lower() == txt.lower():
                     await message.answer(f"❌ Отдел с названием '{txt}' уже существует. Введите другое название:")
                     return
             
             # Добавляем отдел в базу
-            add_department(txt)
-            _log_action(f"Department added: '{txt}' by {message.from_user.id}")
+            await add_department_async(txt)
+            _log_action("department_added", message.from_user.id, department=txt)
             
             await message.answer(
                 f"✅ Отдел успешно добавлен!\n\n"
@@ -260,7 +315,7 @@ async def fsm_text_handler(message: types.Message, state: FSMContext):
     
     # Обработка состояния waiting_title
     if current == ContestStates.waiting_title.state:
-        print(f"[CONTESTS FSM] Обработка waiting_title: '{txt}'")
+        logger.debug(f"[CONTESTS FSM] Обработка waiting_title: '{txt}'")
         await state.update_data(title=txt)
         await state.set_state(ContestStates.waiting_date)
         await message.answer("📅 Введите дату конкурса:\n(Например: 15.12.2024 или Декабрь 2024)")
@@ -268,20 +323,22 @@ async def fsm_text_handler(message: types.Message, state: FSMContext):
     
     # Обработка состояния waiting_date
     elif current == ContestStates.waiting_date.state:
-        print(f"[CONTESTS FSM] Обработка waiting_date: '{txt}'")
+        logger.debug(f"[CONTESTS FSM] Обработка waiting_date: '{txt}'")
         
-        if len(txt) < 3:
-            await message.answer("❌ Неверная дата. Введите корректную дату:")
+        # Текст даты показываем как ввели, для сортировки храним ISO-дату
+        day = parse_contest_day(txt)
+        if not day:
+            await message.answer("❌ Не удалось распознать дату. Например: 15.12.2024, 15 декабря 2024 или Декабрь 2024")
             return
         
-        await state.update_data(date=txt)
+        await state.update_data(date=txt, day=day)
         await state.set_state(ContestStates.waiting_file)
         await message.answer("✅ Дата сохранена!\n📎 Теперь отправьте PDF файл с положением конкурса.")
         return
     
     # Обработка состояния confirmation
     elif current == ContestStates.confirmation.state:
-        print(f"[CONTESTS FSM] Обработка confirmation: '{txt}'")
+        logger.debug(f"[CONTESTS FSM] Обработка confirmation: '{txt}'")
         
         if txt == "✅ Да все верно":
             file_path = data.get("file_path")
@@ -289,66 +346,102 @@ async def fsm_text_handler(message: types.Message, state: FSMContext):
             title = data.get("title", "Без названия")
             date = data.get("date", "Без даты")
             
+            if file_path and not os.path.exists(file_path) and data.get("tg_file_id"):
+                file_path = await _restore_upload(message, data)
+            
             if not file_path or not os.path.exists(file_path):
                 await message.answer("❌ Файл не найден на сервере.", reply_markup=main_keyboard(message.from_user.id))
                 await state.clear()
                 return
             
             try:
-                add_contest(title, date, data.get("file_name", ""), file_path, department_id=department_id)
-                _log_action(f"Contest added: {title} to dept {department_id} by {message.from_user.id}")
+                contest_id = await add_contest_async(title, date, data.get("file_name", ""), file_path,
+                                                     department_id=department_id, status="processing",
+                                                     tg_file_id=data.get("tg_file_id"), contest_day=data.get("day"),
+                                                     file_hash=data.get("file_hash"), file_size=data.get("file_size"))
+                _log_action("contest_added", message.from_user.id, contest_id=contest_id,
+                            title=title, department_id=department_id, file_hash=data.get("file_hash"))
+                
+                # Текст, превью и хэш считаются в фоне, в отдельном процессе
+                job = submit_upload(contest_id, title, file_path, notify=_upload_notifier(message),
+                                    file_hash=data.get("file_hash"))
                 
                 await message.answer(
                     f"✅ Конкурс успешно добавлен!\n\n"
                     f"📌 Название: {title}\n"
                     f"📅 Дата: {date}\n"
-                    f"📎 Файл: {data.get('file_name', 'Неизвестно')}",
+                    f"📎 Файл: {data.get('file_name', 'Неизвестно')}\n\n"
+                    f"⏳ PDF обрабатывается (задача #{job.id}), статус: /jobs",
                     reply_markup=main_keyboard(message.from_user.id)
                 )
             except Exception as e:
+                await discard_if_unused(file_path)
                 await message.answer(f"❌ Ошибка: {str(e)[:100]}", reply_markup=main_keyboard(message.from_user.id))
             
             await state.clear()
             
         elif txt == "❌ Нет, изменить":
-            file_path = data.get("file_path")
-            if file_path and os.path.exists(file_path):
-                os.remove(file_path)
+            await discard_if_unused(data.get("file_path"))
             await state.clear()
             await message.answer("🔄 Начинаем заново.", reply_markup=main_keyboard(message.from_user.id))
         return
     
     # Если состояние не распознано
-    print(f"[CONTESTS FSM] НЕРАСПОЗНАННОЕ СОСТОЯНИЕ: {current}")
+    logger.warning(f"[CONTESTS FSM] НЕРАСПОЗНАННОЕ СОСТОЯНИЕ: {current}")
+
+async def _restore_upload(message: types.Message, data: dict):
+    """Скачать файл неподтверждённой загрузки заново.
+
+    Пока админ подтверждал загрузку, файл с тем же содержимым мог быть удалён
+    вместе с другим конкурсом (discard_if_unused / delete_contest считают только
+    конкурсы в БД, а не загрузки в FSM). Возвращает путь или None.
+    """
+    try:
+        stored = await save_telegram_file(message.bot, data["tg_file_id"])
+    except Exception as e:
+        logger.error(f"[CONTESTS] Не удалось заново скачать файл загрузки: {e}")
+        return None
+    if stored.file_hash != data.get("file_hash"):
+        logger.error(f"[CONTESTS] Файл загрузки изменился: {stored.file_hash} вместо {data.get('file_hash')}")
+        await discard_if_unused(stored.path)
+        return None
+    logger.info(f"[CONTESTS] Файл {os.path.basename(stored.path)} был удалён до подтверждения, скачан заново")
+    return stored.path
 
 async def receive_file(message: types.Message, state: FSMContext):
     """Получение PDF файла"""
     current = await state.get_state()
-    print(f"[CONTESTS] receive_file: состояние = {current}")
+    logger.debug(f"[CONTESTS] receive_file: состояние = {current}")
     
     if current != ContestStates.waiting_file.state:
-        print(f"[CONTESTS] receive_file: не то состояние, ожидалось waiting_file")
+        logger.debug(f"[CONTESTS] receive_file: не то состояние, ожидалось waiting_file")
         return
     
-    print(f"[CONTESTS] receive_file: получен документ")
+    logger.debug(f"[CONTESTS] receive_file: получен документ")
     
     if not message.document or not message.document.file_name.lower().endswith(".pdf"):
         await message.answer("❌ Нужен PDF файл.")
         return
     
-    unique = f"{uuid.uuid4().hex}.pdf"
-    save_path = os.path.join("contests_files", unique)
+    if message.document.file_size and message.document.file_size > PDF_MAX_SIZE:
+        await message.answer(f"❌ Файл слишком большой. Максимум {PDF_MAX_SIZE // (1024 * 1024)} МБ.")
+        return
     
     try:
-        tg_file = await message.bot.get_file(message.document.file_id)
-        await message.bot.download_file(file_path=tg_file.file_path, destination=save_path)
+        # Скачиваем потоком с лимитом размера; одинаковые файлы хранятся один раз
+        stored = await save_telegram_file(message.bot, message.document.file_id)
+    except FileTooLarge as e:
+        await message.answer(f"❌ Не удалось сохранить: {e}")
+        return
     except Exception as e:
         await message.answer(f"❌ Ошибка при сохранении файла: {e}")
         await state.clear()
         return
     
     file_name = message.document.file_name
-    await state.update_data(file_name=file_name, file_path=save_path)
+    # file_id исходного документа: по нему потом отдаём PDF без повторной загрузки
+    await state.update_data(file_name=file_name, file_path=stored.path, file_hash=stored.file_hash,
+                            file_size=stored.size, tg_file_id=message.document.file_id)
     
     # Получаем название из имени файла
     title = os.path.splitext(file_name)[0]
@@ -359,216 +452,221 @@ async def receive_file(message: types.Message, state: FSMContext):
          f"📌 Название: {title}\n"
          f"📅 Дата: {data['date']}\n"
          f"📎 Файл: {file_name}\n"
-         f"💾 Сохранён как: {unique}")
+         f"💾 Сохранён как: {os.path.basename(stored.path)}")
+    if not stored.is_new:
+        s += "\n♻️ Такой файл уже загружен, повторно он не хранится и не разбирается"
     
     await message.answer(s)
     await message.answer("Всё верно?", reply_markup=confirmation_keyboard())
     await state.set_state(ContestStates.confirmation)
 
 # ---------------- CALLBACK ОБРАБОТЧИКИ ----------------
-async def contests_inline_callback_handler(callback: types.CallbackQuery, state: FSMContext):
-    data = callback.data or ""
-    uid = callback.from_user.id
+contests_router = CallbackRouter(ContestsCallback)
+
+@contests_router.route(ContestAction.SHOW_DEPT)
+async def _show_department(callback: types.CallbackQuery, state: FSMContext, cb: ContestsCallback):
+    """Выбор отдела для ПОКАЗА конкурсов"""
+    dept_id = cb.id
+    logger.debug(f"[CONTESTS CALLBACK] Выбран отдел для показа: {dept_id}")
+    
+    contests, _, _ = await catalog.get_contests_page(dept_id)
+    
+    if not contests:
+        await callback.message.edit_text(
+            "📭 В этом отделе пока нет конкурсов.\nВыберите другой отдел:",
+            reply_markup=await get_departments_keyboard(action="show")
+        )
+        await callback.answer("В отделе нет конкурсов")
+        return
     
-    print(f"[CONTESTS CALLBACK] {data} от {uid}")
-    print(f"[CONTESTS CALLBACK] Текущее состояние до обработки: {await state.get_state()}")
+    try:
+        await callback.message.delete()
+    except:
+        pass
+    
+    # Получаем название отдела
+    dept_name = await catalog.get_department_name(dept_id, "Неизвестный отдел")
+    
+    kb = await get_contests_keyboard(dept_id, action="download")
+    await callback.message.answer(
+        f"📂 {dept_name}\nВыберите конкурс для скачивания:",
+        reply_markup=kb
+    )
+    await callback.answer()
 
+@contests_router.route(ContestAction.UPLOAD_DEPT)
+async def _upload_department(callback: types.CallbackQuery, state: FSMContext, cb: ContestsCallback):
+    """Выбор отдела для ЗАГРУЗКИ"""
+    dept_id = cb.id
+    logger.debug(f"[CONTESTS CALLBACK] Выбран отдел для загрузки: {dept_id}")
+    logger.debug(f"[CONTESTS CALLBACK] Устанавливаем состояние waiting_title")
+    
+    await state.update_data(department_id=dept_id)
+    
     try:
-        # Выбор отдела для ПОКАЗА конкурсов
-        if data.startswith("contests_show_dept_"):
-            dept_id = int(data.split("_")[3])
-            print(f"[CONTESTS CALLBACK] Выбран отдел для показа: {dept_id}")
-            
-            contests = get_contests_by_department(dept_id)
-            
-            if not contests:
-                await callback.message.edit_text(
-                    "📭 В этом отделе пока нет конкурсов.\nВыберите другой отдел:",
-                    reply_markup=get_departments_keyboard(action="show")
-                )
-                await callback.answer("В отделе нет конкурсов")
-                return
-            
-            try:
-                await callback.message.delete()
-            except:
-                pass
-            
-            # Получаем название отдела
-            departments = get_all_departments()
-            dept_name = "Неизвестный отдел"
-            for d_id, d_name in departments:
-                if d_id == dept_id:
-                    dept_name = d_name
-                    break
-            
-            kb = _choose_contest_inline(contests, action="download")
-            await callback.message.answer(
-                f"📂 {dept_name}\nВыберите конкурс для скачивания:",
-                reply_markup=kb
-            )
-            await callback.answer()
-            return
-        
-        # Выбор отдела для ЗАГРУЗКИ
-        if data.startswith("contests_upload_dept_"):
-            dept_id = int(data.split("_")[3])
-            print(f"[CONTESTS CALLBACK] Выбран отдел для загрузки: {dept_id}")
-            print(f"[CONTESTS CALLBACK] Устанавливаем состояние waiting_title")
-            
-            await state.update_data(department_id=dept_id)
-            
-            try:
-                await callback.message.delete()
-            except:
-                pass
-            
-            # ВАЖНО: Устанавливаем состояние ДО отправки сообщения
-            await state.set_state(ContestStates.waiting_title)
-            print(f"[CONTESTS CALLBACK] Состояние установлено: {await state.get_state()}")
-            
-            await callback.message.answer(
-                "📝 Введите название конкурса:",
-                reply_markup=types.ReplyKeyboardRemove()
-            )
-            await callback.answer()
-            return
-        
-        # Выбор отдела для УДАЛЕНИЯ
-        if data.startswith("contests_delete_dept_"):
-            dept_id = int(data.split("_")[3])
-            await state.update_data(selected_department_id=dept_id)
-            
-            contests = get_contests_by_department(dept_id)
-            
-            if not contests:
-                await callback.message.edit_text(
-                    "📭 В этом отделе пока нет конкурсов.\nВыберите другой отдел:",
-                    reply_markup=get_departments_keyboard(action="delete")
-                )
-                await callback.answer("В отделе нет конкурсов")
-                return
-            
-            try:
-                await callback.message.delete()
-            except:
-                pass
-            
-            departments = get_all_departments()
-            dept_name = "Неизвестный отдел"
-            for d_id, d_name in departments:
-                if d_id == dept_id:
-                    dept_name = d_name
-                    break
-            
-            kb = _choose_contest_inline(contests, action="delete")
-            await callback.message.answer(
-                f"🗑 {dept_name}\n⚠️ Удаление нельзя отменить!\nВыберите конкурс для удаления:",
-                reply_markup=kb
-            )
-            await callback.answer()
-            return
-        
-        # Скачать конкурс
-        if data.startswith("contests_download_"):
-            cid = int(data.split("_")[2])
-            contest = get_contest_by_id(cid)
-            
-            if contest and contest[4] and os.path.exists(contest[4]):
-                try:
-                    await callback.message.delete()
-                except:
-                    pass
-                
-                await callback.message.answer(f"📄 Скачивание файла: {contest[1]}")
-                await callback.message.answer_document(
-                    FSInputFile(contest[4], filename=contest[3]),
-                    caption=f"📌 {contest[1]}\n📅 {contest[2] if contest[2] else 'Без даты'}"
-                )
-                await callback.message.answer(
-                    "✅ Файл отправлен!",
-                    reply_markup=main_keyboard(uid)
-                )
-            else:
-                await callback.message.answer("❌ Файл не найден")
-            
-            await callback.answer()
-            return
+        await callback.message.delete()
+    except:
+        pass
+    
+    # ВАЖНО: Устанавливаем состояние ДО отправки сообщения
+    await state.set_state(ContestStates.waiting_title)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"[CONTESTS CALLBACK] Состояние установлено: {await state.get_state()}")
+    
+    await callback.message.answer(
+        "📝 Введите название конкурса:",
+        reply_markup=types.ReplyKeyboardRemove()
+    )
+    await callback.answer()
+
+@contests_router.route(ContestAction.DELETE_DEPT)
+async def _delete_department(callback: types.CallbackQuery, state: FSMContext, cb: ContestsCallback):
+    """Выбор отдела для УДАЛЕНИЯ"""
+    dept_id = cb.id
+    await state.update_data(selected_department_id=dept_id)
+    
+    contests, _, _ = await catalog.get_contests_page(dept_id)
+    
+    if not contests:
+        await callback.message.edit_text(
+            "📭 В этом отделе пока нет конкурсов.\nВыберите другой отдел:",
+            reply_markup=await get_departments_keyboard(action="delete")
+        )
+        await callback.answer("В отделе нет конкурсов")
+        return
+    
+    try:
+        await callback.message.delete()
+    except:
+        pass
+    
+    dept_name = await catalog.get_department_name(dept_id, "Неизвестный отдел")
+    
+    kb = await get_contests_keyboard(dept_id, action="delete")
+    await callback.message.answer(
+        f"🗑 {dept_name}\n⚠️ Удаление нельзя отменить!\nВыберите конкурс для удаления:",
+        reply_markup=kb
+    )
+    await callback.answer()
+
+async def contests_page_handler(callback: types.CallbackQuery, callback_data: PageCallback):
+    """Листание списка конкурсов: меняем только клавиатуру сообщения"""
+    if callback_data.menu == ContestListMenu.DELETE and callback.from_user.id != ADMIN_ID:
+        await callback.answer("❌ Нет прав", show_alert=True)
+        return
+    action = "download" if callback_data.menu == ContestListMenu.DOWNLOAD else "delete"
+    kb = await get_contests_keyboard(callback_data.dept, action,
+                                     (callback_data.day, callback_data.id), callback_data.back)
+    try:
+        await callback.message.edit_reply_markup(reply_markup=kb)
+    except TelegramBadRequest as e:
+        logger.debug(f"[CONTESTS] не удалось перелистнуть: {e}")
+    await callback.answer()
+
+@contests_router.route(ContestAction.DOWNLOAD)
+async def _download_contest(callback: types.CallbackQuery, state: FSMContext, cb: ContestsCallback):
+    """Скачать конкурс"""
+    uid = callback.from_user.id
+    contest = await catalog.get_contest(cb.id)
+    
+    if contest and (contest[7] or (contest[4] and os.path.exists(contest[4]))):
+        try:
+            await callback.message.delete()
+        except:
+            pass
         
-        # Удалить конкурс
-        if data.startswith("contests_delete_"):
-            if uid != ADMIN_ID:
-                await callback.answer("❌ У вас нет прав", show_alert=True)
-                return
-            
-            cid = int(data.split("_")[2])
-            contest = get_contest_by_id(cid)
-            
-            if contest:
-                try:
-                    await callback.message.delete()
-                except:
-                    pass
-                
-                if contest[4] and os.path.exists(contest[4]):
-                    try:
-                        os.remove(contest[4])
-                    except:
-                        pass
-                
-                delete_contest(cid)
-                
-                await callback.message.answer(
-                    f"✅ Конкурс удален!\n\n"
-                    f"🗑 Название: {contest[1]}\n"
-                    f"📅 Дата: {contest[2] if contest[2] else 'Без даты'}",
-                    reply_markup=main_keyboard(uid)
-                )
-                _log_action(f"Contest deleted: {contest[1]} by {uid}")
-            
-            await callback.answer()
-            return
+        await callback.message.answer(f"📄 Скачивание файла: {contest[1]}")
+        sent = await send_contest_document(
+            callback.message, contest,
+            caption=f"📌 {contest[1]}\n📅 {contest[2] if contest[2] else 'Без даты'}"
+        )
+        await callback.message.answer(
+            "✅ Файл отправлен!" if sent else "❌ Файл не найден",
+            reply_markup=main_keyboard(uid)
+        )
+    else:
+        await callback.message.answer("❌ Файл не найден")
+    
+    await callback.answer()
+
+@contests_router.route(ContestAction.DELETE)
+async def _delete_contest(callback: types.CallbackQuery, state: FSMContext, cb: ContestsCallback):
+    """Удалить конкурс"""
+    uid = callback.from_user.id
+    if uid != ADMIN_ID:
+        await callback.answer("❌ У вас нет прав", show_alert=True)
+        return
+    
+    cid = cb.id
+    contest = await catalog.get_contest(cid)
+    
+    if contest:
+        try:
+            await callback.message.delete()
+        except:
+            pass
         
-        # Назад к отделам
-        if data == "contests_back_to_depts":
-            try:
-                await callback.message.delete()
-            except:
-                pass
-            
-            await state.set_state(ContestStates.choosing_department_for_show)
-            kb = get_departments_keyboard(action="show")
-            await callback.message.answer(
-                "📊 Выберите отдел:\nПоказать конкурсы из какого отдела?",
-                reply_markup=kb
-            )
-            await callback.answer()
-            return
+        # Файл удаляется в delete_contest, если он больше ни у кого не используется
+        await delete_contest_async(cid)
         
-        # Отмена действий
-        if data.startswith("contests_cancel_"):
-            action = data.split("_")[2]
-            
-            try:
-                await callback.message.delete()
-            except:
-                pass
-            
-            await state.clear()
-            await callback.message.answer(
-                "✅ Действие отменено",
-                reply_markup=main_keyboard(uid)
-            )
-            await callback.answer("Отменено")
-            return
+        await callback.message.answer(
+            f"✅ Конкурс удален!\n\n"
+            f"🗑 Название: {contest[1]}\n"
+            f"📅 Дата: {contest[2] if contest[2] else 'Без даты'}",
+            reply_markup=main_keyboard(uid)
+        )
+        _log_action("contest_deleted", uid, contest_id=cid, title=contest[1])
+    
+    await callback.answer()
 
+@contests_router.route(ContestAction.BACK)
+async def _back_to_departments(callback: types.CallbackQuery, state: FSMContext, cb: ContestsCallback):
+    """Назад к отделам"""
+    try:
+        await callback.message.delete()
+    except:
+        pass
+    
+    await state.set_state(ContestStates.choosing_department_for_show)
+    kb = await get_departments_keyboard(action="show")
+    await callback.message.answer(
+        "📊 Выберите отдел:\nПоказать конкурсы из какого отдела?",
+        reply_markup=kb
+    )
+    await callback.answer()
+
+@contests_router.route(ContestAction.CANCEL)
+async def _cancel(callback: types.CallbackQuery, state: FSMContext, cb: ContestsCallback):
+    """Отмена действий"""
+    try:
+        await callback.message.delete()
+    except:
+        pass
+    
+    await state.clear()
+    await callback.message.answer(
+        "✅ Действие отменено",
+        reply_markup=main_keyboard(callback.from_user.id)
+    )
+    await callback.answer("Отменено")
+
+async def contests_inline_callback_handler(callback: types.CallbackQuery, state: FSMContext):
+    logger.debug(f"[CONTESTS CALLBACK] {callback.data} от {callback.from_user.id}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"[CONTESTS CALLBACK] Текущее состояние до обработки: {await state.get_state()}")
+
+    try:
+        # Хендлер выбирается по action из словаря, id уже разобран
+        await contests_router.dispatch(callback, state)
     except Exception as e:
-        print(f"[CONTESTS CALLBACK] Ошибка: {e}")
-        await callback.answer(f"❌ Ошибка: {str(e)[:50]}", show_alert=True)
         logger.error(f"Contests callback error: {e}")
+        await callback.answer(f"❌ Ошибка: {str(e)[:50]}", show_alert=True)
 
 # ---------------- REGISTER ----------------
 def register_contest_handlers(dp: Dispatcher):
+    # Каталог отделов/конкурсов загружаем в память при старте
+    dp.startup.register(catalog.refresh)
+    dp.shutdown.register(shutdown_pipeline)
 
     dp.message.register(add_department_start, F.text == "➕ Добавить отдел")
     dp.message.register(show_my_contests, F.text == "📂 Положения конкурсов")
@@ -584,6 +682,8 @@ def register_contest_handlers(dp: Dispatcher):
     dp.message.register(receive_file, ContestStates.waiting_file)
     
     # Callback обработчики
-    dp.callback_query.register(contests_inline_callback_handler, F.data.startswith("contests_"))
+    # "contests_" - кнопки старого формата из уже отправленных сообщений
+    dp.callback_query.register(contests_inline_callback_handler, F.data.startswith("contests"))
+    dp.callback_query.register(contests_page_handler, PageCallback.filter(F.menu != ContestListMenu.AI))
     
-    print("[CONTESTS] ✅ Хендлеры зарегистрированы")
\ No newline at end of file
+    logger.info("[CONTESTS] ✅ Хендлеры зарегистрированы")
\ No newline at end of file
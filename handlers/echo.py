@@ -1,11 +1,10 @@
 from aiogram import Dispatcher, F
+from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 import re
+import logging
 
-last_messages = {}
-
-def check_duplicate(user_id: int, message: str) -> bool:
-    return last_messages.get(user_id) == message
+logger = logging.getLogger("echo")
 
 def count_words(text: str) -> int:
     return len(text.strip().split())
@@ -13,10 +12,10 @@ def count_words(text: str) -> int:
 def count_letters(text: str) -> int:
     return len(re.sub(r"[^A-Za-zА-Яа-яЁё]", "", text))
 
-async def echo_handler(message: Message):
+async def echo_handler(message: Message, state: FSMContext):
     text = message.text.strip()
     user_id = message.from_user.id
-    print(f"[DEBUG] echo от {user_id}: '{text}'")
+    logger.debug(f"[DEBUG] echo от {user_id}: '{text}'")
 
     if not text:
         await message.answer("Пустое сообщение не анализирую.")
@@ -25,8 +24,9 @@ async def echo_handler(message: Message):
     words = count_words(text)
     letters = count_letters(text)
 
-    is_duplicate = check_duplicate(user_id, text)
-    last_messages[user_id] = text
+    # Прошлое сообщение храним в данных FSM: они в общей базе и переживают перезапуск
+    is_duplicate = (await state.get_data()).get("echo_last") == text
+    await state.update_data(echo_last=text)
 
     reply = f"В вашем сообщении: {words} слов, {letters} букв."
     if is_duplicate:
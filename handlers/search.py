@@ -0,0 +1,135 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from aiogram import types, Dispatcher
+from aiogram.filters import Command, CommandObject
+from aiogram.types import (InlineKeyboardMarkup, InlineKeyboardButton, InlineQueryResultArticle,
+                           InlineQueryResultCachedDocument, InputTextMessageContent)
+from database import search_contests_async
+from pdf_tools import build_search_query
+from callbacks import ContestsCallback, ContestAction, AICallback, AIAction, SearchCallback
+
+logger = logging.getLogger("search")
+
+PAGE_SIZE = 5          # результатов на странице в чате
+INLINE_PAGE_SIZE = 20  # результатов за один ответ inline-режима
+QUERY_CACHE_SIZE = 1024
+
+# ключ -> текст запроса для кнопок листания (в callback_data 64 байта, сам запрос не влезает)
+_queries = OrderedDict()
+
+
+def _remember_query(text: str) -> str:
+    key = hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+    _queries[key] = text
+    _queries.move_to_end(key)
+    while len(_queries) > QUERY_CACHE_SIZE:
+        _queries.popitem(last=False)
+    return key
+
+
+async def search_page(text: str, page: int, page_size: int = PAGE_SIZE):
+    """Страница результатов одним запросом к индексу: (строки, есть ли следующая)"""
+    match_query = build_search_query(text)
+    if not match_query:
+        return [], False
+    rows = await search_contests_async(match_query, page_size + 1, page * page_size)
+    return rows[:page_size], len(rows) > page_size
+
+
+def _results_text(text: str, rows: list, page: int) -> str:
+    if not rows:
+        return f"🔎 По запросу «{text}» ничего не найдено" if page == 0 else "🔎 Больше результатов нет"
+    lines = [f"🔎 Результаты по запросу «{text}» (стр. {page + 1}):", ""]
+    for n, (_, title, date, department, _, snippet) in enumerate(rows, page * PAGE_SIZE + 1):
+        lines.append(f"{n}. 📌 {title}\n   📅 {date or 'Без даты'} · {department or 'Без отдела'}")
+        if snippet and snippet != title:
+            lines.append(f"   {snippet}")
+    return "\n".join(lines)
+
+
+def _results_keyboard(key: str, rows: list, page: int, has_next: bool) -> InlineKeyboardMarkup:
+    keyboard = []
+    for n, (contest_id, title, *_rest) in enumerate(rows, page * PAGE_SIZE + 1):
+        keyboard.append([
+            InlineKeyboardButton(text=f"📄 {n}. {title[:40]}",
+                                 callback_data=ContestsCallback(action=ContestAction.DOWNLOAD, id=contest_id).pack()),
+            InlineKeyboardButton(text="🤖 Спросить ИИ",
+                                 callback_data=AICallback(action=AIAction.SELECT, id=contest_id).pack()),
+        ])
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="◀️ Назад", callback_data=SearchCallback(q=key, page=page - 1).pack()))
+    if has_next:
+        nav.append(InlineKeyboardButton(text="Далее ▶️", callback_data=SearchCallback(q=key, page=page + 1).pack()))
+    if nav:
+        keyboard.append(nav)
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+# ---------------- ХЕНДЛЕРЫ ----------------
+async def search_command(message: types.Message, command: CommandObject):
+    """/search <запрос> - поиск по названиям, датам, отделам и тексту положений"""
+    text = (command.args or "").strip()
+    logger.debug(f"[SEARCH] /search от {message.from_user.id}: {text!r}")
+    if not text:
+        await message.answer("🔎 Укажите запрос: /search робототехника 2025")
+        return
+
+    rows, has_next = await search_page(text, 0)
+    await message.answer(
+        _results_text(text, rows, 0),
+        reply_markup=_results_keyboard(_remember_query(text), rows, 0, has_next) if rows else None
+    )
+
+
+async def search_page_callback(callback: types.CallbackQuery, callback_data: SearchCallback):
+    """Листание результатов: сообщение редактируется на месте"""
+    text = _queries.get(callback_data.q)
+    if text is None:
+        await callback.answer("Поиск устарел, повторите /search", show_alert=True)
+        return
+
+    page = max(0, callback_data.page)
+    rows, has_next = await search_page(text, page)
+    try:
+        await callback.message.edit_text(
+            _results_text(text, rows, page),
+            reply_markup=_results_keyboard(callback_data.q, rows, page, has_next) if rows else None
+        )
+    except Exception as e:
+        logger.debug(f"[SEARCH] не удалось обновить результаты: {e}")
+    await callback.answer()
+
+
+async def inline_search(inline_query: types.InlineQuery):
+    """Inline-режим: @бот запрос в любом чате; уже загруженные в Telegram PDF отправляются сразу"""
+    text = inline_query.query.strip()
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    page = offset // INLINE_PAGE_SIZE
+    rows, has_next = await search_page(text, page, INLINE_PAGE_SIZE) if text else ([], False)
+
+    results = []
+    for contest_id, title, date, department, tg_file_id, snippet in rows:
+        description = f"📅 {date or 'Без даты'} · {department or 'Без отдела'}"
+        if tg_file_id:
+            results.append(InlineQueryResultCachedDocument(
+                id=str(contest_id), title=title, document_file_id=tg_file_id,
+                description=description, caption=f"📌 {title}\n{description}"
+            ))
+        else:
+            results.append(InlineQueryResultArticle(
+                id=str(contest_id), title=title, description=f"{description}\n{snippet}",
+                input_message_content=InputTextMessageContent(message_text=f"📌 {title}\n{description}")
+            ))
+
+    await inline_query.answer(results, cache_time=60, is_personal=False,
+                              next_offset=str(offset + INLINE_PAGE_SIZE) if has_next else "")
+
+
+def register_search_handlers(dp: Dispatcher):
+    dp.message.register(search_command, Command("search"))
+    dp.callback_query.register(search_page_callback, SearchCallback.filter())
+    dp.inline_query.register(inline_search)
+
+    logger.info("[SEARCH] ✅ Хендлеры зарегистрированы")
@@ -0,0 +1,104 @@
+# log_setup.py
+"""
+Логирование бота.
+Хендлеры только кладут запись в очередь (QueueHandler), а в файлы и консоль
+её пишет фоновый поток QueueListener, поэтому event loop не ждёт диска.
+Файлы - JSON lines с ротацией по размеру:
+  logs/bot.jsonl            - всё, кроме переписки с ИИ
+  logs/actions.jsonl        - действия админа (логгер "actions")
+  logs/ai_transcripts.jsonl - вопросы и ответы ИИ (логгер "ai.transcript")
+Отладочный вывод хендлеров идёт через logger.debug и виден только при LOG_LEVEL=DEBUG.
+"""
+
+import json
+import logging
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from config import LOG_LEVEL, LOG_DIR, LOG_MAX_BYTES, LOG_BACKUP_COUNT
+
+ACTIONS_LOGGER = "actions"
+TRANSCRIPT_LOGGER = "ai.transcript"
+
+# Стандартные поля LogRecord; всё остальное пришло через extra= и попадает в JSON
+_RECORD_FIELDS = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON: время, уровень, логгер, сообщение и поля из extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _ExcludeFilter(logging.Filter):
+    """Пропускает всё, кроме записей указанного логгера и его потомков"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not super().filter(record)
+
+
+def _file_handler(name: str, only: str = None, exclude: str = None) -> RotatingFileHandler:
+    handler = RotatingFileHandler(os.path.join(LOG_DIR, name), maxBytes=LOG_MAX_BYTES,
+                                  backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True)
+    handler.setFormatter(JsonFormatter())
+    if only:
+        handler.addFilter(logging.Filter(only))
+    if exclude:
+        handler.addFilter(_ExcludeFilter(exclude))
+    return handler
+
+
+def setup_logging():
+    """Настроить корневой логгер и запустить фоновую запись (вызывается один раз в main)"""
+    global _listener
+    if _listener is not None:
+        return
+    os.makedirs(LOG_DIR, exist_ok=True)
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    console.addFilter(_ExcludeFilter(TRANSCRIPT_LOGGER))
+
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(
+        log_queue,
+        console,
+        _file_handler("bot.jsonl", exclude=TRANSCRIPT_LOGGER),
+        _file_handler("actions.jsonl", only=ACTIONS_LOGGER),
+        _file_handler("ai_transcripts.jsonl", only=TRANSCRIPT_LOGGER),
+        respect_handler_level=True,
+    )
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL)
+    # библиотечный debug-шум не нужен даже при LOG_LEVEL=DEBUG
+    for name in ("aiogram.event", "aiohttp.access", "asyncio"):
+        logging.getLogger(name).setLevel(max(logging.INFO, root.level))
+    _listener.start()
+
+
+def stop_logging():
+    """Дописать оставшиеся записи и остановить фоновый поток"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -3,9 +3,22 @@ import logging
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.filters import Command
-from config import TOKEN
-from aiogram.fsm.storage.memory import MemoryStorage
+from config import TOKEN, DEEPSEEK_API_KEY, BOT_MODE, METRICS_HOST, METRICS_PORT
+from database import init_db, close_db
+from deepseek import DeepSeekClient
+from ai_scheduler import AIScheduler
+from webhook import run_webhook
+from fsm_storage import SQLiteStorage
 from aiogram.fsm.context import FSMContext
+from log_setup import setup_logging, stop_logging
+import metrics
+from tracing import TracingMiddleware
+from throttling import ThrottlingMiddleware, Throttler
+from shared_state import SharedStateWatcher
+
+# Логирование настраиваем до импорта хендлеров: они пишут в лог уже при импорте
+setup_logging()
+logger = logging.getLogger("bot")
 
 # Импортируем регистраторы
 from handlers.ID import register_userlog_handler
@@ -13,11 +26,10 @@ from handlers.contests import register_contest_handlers, main_keyboard
 from handlers.AI import register_ai_handlers
 from handlers.admin import register_admin_ai_myid_handler
 from handlers.echo import register_echo_handler
-
-logging.basicConfig(level=logging.INFO)
+from handlers.search import register_search_handlers
 
 async def start_command(message: types.Message):
-    print(f"🟢 /start от {message.from_user.id}")
+    logger.debug(f"🟢 /start от {message.from_user.id}")
     await message.answer(
         "👋 Добро пожаловать в бот для работы с конкурсами!\n"
         "Используйте кнопки ниже для навигации.",
@@ -25,44 +37,111 @@ async def start_command(message: types.Message):
     )
 
 async def menu_command(message: types.Message):
-    print(f"🟢 /menu от {message.from_user.id}")
+    logger.debug(f"🟢 /menu от {message.from_user.id}")
     await message.answer(
         "📋 Главное меню:",
         reply_markup=main_keyboard(message.from_user.id)
     )
 
-async def main():
+async def on_startup(deepseek: DeepSeekClient):
+    """Открываем общий клиент DeepSeek (keep-alive соединения) и сервер метрик"""
+    await deepseek.start()
+    if METRICS_PORT:
+        try:
+            await metrics.start_server(METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            # Занятый порт не должен мешать боту работать: метрики просто недоступны
+            logger.warning(f"Сервер метрик не запущен ({METRICS_HOST}:{METRICS_PORT}): {e}")
+            await metrics.stop_server()
+
+async def on_shutdown(deepseek: DeepSeekClient):
+    """Закрываем клиент DeepSeek и сервер метрик при остановке"""
+    await deepseek.close()
+    await metrics.stop_server()
+
+def build_dispatcher():
+    """Бот и диспетчер со всеми middleware и хендлерами (общие для polling, webhook и процессов shard.py)"""
     session = AiohttpSession()
     bot = Bot(token=TOKEN, session=session)
-    dp = Dispatcher(storage=MemoryStorage())
+    # FSM в SQLite: загрузки и диалоги с ИИ переживают перезапуск
+    dp = Dispatcher(storage=SQLiteStorage())
+    # Доступен в хендлерах как аргумент deepseek
+    dp["deepseek"] = DeepSeekClient(DEEPSEEK_API_KEY)
+    dp["ai_scheduler"] = AIScheduler()
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    # Чёрный список и настройки из базы; изменения из других процессов подхватываются в фоне
+    watcher = SharedStateWatcher()
+    dp.startup.register(watcher.start)
+    dp.shutdown.register(watcher.stop)
+
+    # Антифлуд и чёрный список /troll: outer-middleware срабатывает до фильтров и хендлеров
+    throttler = Throttler()
+    dp.message.outer_middleware(ThrottlingMiddleware(throttler))
+    dp.callback_query.outer_middleware(ThrottlingMiddleware(throttler))
+    dp.inline_query.outer_middleware(ThrottlingMiddleware(throttler))
+    # Метрики: апдейты и время каждого хендлера, размер FSM
+    dp.message.middleware(metrics.MetricsMiddleware("message"))
+    dp.callback_query.middleware(metrics.MetricsMiddleware("callback_query"))
+    dp.inline_query.middleware(metrics.MetricsMiddleware("inline_query"))
+    # Трассировка: время на CPU / в ожидании I/O, профили медленных хендлеров в logs/profiles
+    dp.message.middleware(TracingMiddleware("message"))
+    dp.callback_query.middleware(TracingMiddleware("callback_query"))
+
+    async def collect_fsm_size():
+        for where, value in (await dp.storage.size()).items():
+            metrics.fsm_states.set(where, value=value)
+
+    metrics.add_collector(collect_fsm_size)
 
     dp.message.register(start_command, Command("start"))
     dp.message.register(menu_command, Command("menu"))
 
     
-    print("🟢 Регистрируем contest хендлеры...")
+    logger.info("🟢 Регистрируем contest хендлеры...")
     register_contest_handlers(dp)  
     
-    print("🟢 Регистрируем AI хендлеры...")
+    logger.info("🟢 Регистрируем AI хендлеры...")
     register_ai_handlers(dp)  
     
-    print("🟢 Регистрируем admin хендлеры...")
+    logger.info("🟢 Регистрируем search хендлеры...")
+    register_search_handlers(dp)
+
+    logger.info("🟢 Регистрируем admin хендлеры...")
     register_admin_ai_myid_handler(dp) 
     
-    print("🟢 Регистрируем userlog хендлер...")
+    logger.info("🟢 Регистрируем userlog хендлер...")
     register_userlog_handler(dp)  
     
-    print("🟢 Регистрируем echo хендлер...")
+    logger.info("🟢 Регистрируем echo хендлер...")
     register_echo_handler(dp)  
 
-    print("✅ Бот запущен!")
-    print("📋 Кнопки в меню:")
-    print("   - ❓ Задать вопрос")
-    print("   - 📂 Положения конкурсов")
-    print("   - 📄 Загрузить положение (админ)")
-    print("   - 🗑 Удалить положение (админ)")
+    logger.info("✅ Бот запущен!")
+    logger.info("📋 Кнопки в меню:")
+    logger.info("   - ❓ Задать вопрос")
+    logger.info("   - 📂 Положения конкурсов")
+    logger.info("   - 📄 Загрузить положение (админ)")
+    logger.info("   - 🗑 Удалить положение (админ)")
+    return bot, dp
 
-    await dp.start_polling(bot)
+async def main():
+    # Единая база: миграции до запуска диспетчера, закрытие - после всех shutdown-хендлеров
+    # (они ещё сбрасывают пользователей и FSM)
+    init_db()
+    bot, dp = build_dispatcher()
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        close_db()
+        stop_logging()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if BOT_MODE == "sharded":
+        # Несколько процессов: каждый вызывает build_dispatcher, апдейты раздаются по чатам
+        from shard import run_sharded
+        run_sharded(build_dispatcher)
+    else:
+        asyncio.run(main())
\ No newline at end of file
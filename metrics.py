@@ -0,0 +1,231 @@
+# metrics.py
+"""
+Метрики бота в формате Prometheus (text exposition) без внешних зависимостей.
+Счётчики и гистограммы обновляются прямо в коде (хендлеры, DeepSeek, БД),
+значения вроде размера FSM собираются коллекторами в момент запроса.
+Отдаются локальным HTTP-сервером на /metrics, кратко - в админской /stats.
+"""
+
+import bisect
+import logging
+import time
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+
+logger = logging.getLogger("metrics")
+
+# Границы бакетов латентности (сек): от быстрых SQL-запросов до ответа ИИ
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        parts.append(f'{name}="{value}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, value: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def get(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def total(self) -> float:
+        return sum(self._values.values())
+
+    def items(self):
+        return self._values.items()
+
+    def render(self) -> list:
+        lines = self._header()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels, value: float):
+        self._values[labels] = value
+
+
+class _HistogramValue:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value: float):
+        h = self._values.get(labels)
+        if h is None:
+            h = self._values[labels] = _HistogramValue(len(self.buckets) + 1)
+        h.counts[bisect.bisect_left(self.buckets, value)] += 1
+        h.sum += value
+        h.count += 1
+
+    def time(self, *labels):
+        """Контекстный менеджер: замерить длительность блока"""
+        return _Timer(self, labels)
+
+    def summary(self, *labels) -> dict:
+        """count / avg / p50 / p95 (квантили оцениваются по бакетам)"""
+        h = self._values.get(labels)
+        if h is None or not h.count:
+            return {"count": 0, "avg": 0.0, "p50": 0.0, "p95": 0.0}
+        return {"count": h.count, "avg": h.sum / h.count,
+                "p50": self._quantile(h, 0.5), "p95": self._quantile(h, 0.95)}
+
+    def _quantile(self, h: _HistogramValue, q: float) -> float:
+        rank = q * h.count
+        seen = 0
+        for i, c in enumerate(h.counts):
+            if seen + c >= rank and c:
+                low = self.buckets[i - 1] if i > 0 else 0.0
+                high = self.buckets[i] if i < len(self.buckets) else low
+                return low + (high - low) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+    def label_sets(self) -> list:
+        return list(self._values)
+
+    def render(self) -> list:
+        lines = self._header()
+        for labels, h in sorted(self._values.items()):
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), h.counts):
+                cumulative += c
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {h.sum}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {h.count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(*self.labels, value=time.perf_counter() - self.started)
+
+
+REGISTRY = []
+_collectors = []
+_runner = None
+
+
+# ---------------- МЕТРИКИ БОТА ----------------
+updates_total = Counter("bot_updates_total", "Обработанные апдейты по хендлерам", ("handler", "type"))
+handler_errors_total = Counter("bot_handler_errors_total", "Исключения в хендлерах", ("handler",))
+handler_seconds = Histogram("bot_handler_seconds", "Время обработки апдейта хендлером", ("handler",))
+
+deepseek_seconds = Histogram("deepseek_request_seconds", "Время запроса к DeepSeek (с повторами)", ("method",))
+deepseek_tokens_total = Counter("deepseek_tokens_total", "Токены DeepSeek", ("kind",))
+deepseek_errors_total = Counter("deepseek_errors_total", "Ошибки DeepSeek после всех повторов", ("status",))
+
+db_query_seconds = Histogram("db_query_seconds", "Время функций database.py через run_db (с ожиданием пула)", ("func",))
+
+fsm_states = Gauge("fsm_states", "Состояния FSM", ("where",))
+
+
+def add_collector(collect):
+    """Асинхронная функция, обновляющая gauge-метрики перед выдачей /metrics и /stats"""
+    _collectors.append(collect)
+
+
+async def collect():
+    for func in _collectors:
+        try:
+            await func()
+        except Exception as e:
+            logger.error(f"Ошибка сбора метрик {getattr(func, '__name__', func)}: {e}")
+
+
+async def render() -> str:
+    await collect()
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- MIDDLEWARE ----------------
+class MetricsMiddleware(BaseMiddleware):
+    """Считает апдейты, время и ошибки каждого хендлера (вешается на message и callback_query)"""
+
+    def __init__(self, update_type: str):
+        self.update_type = update_type
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        updates_total.inc(name, self.update_type)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors_total.inc(name)
+            raise
+        finally:
+            handler_seconds.observe(name, value=time.perf_counter() - started)
+
+
+# ---------------- HTTP ----------------
+async def _metrics_view(request: web.Request) -> web.Response:
+    return web.Response(text=await render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_server(host: str, port: int):
+    global _runner
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics_view)
+    _runner = web.AppRunner(app, access_log=None)
+    await _runner.setup()
+    await web.TCPSite(_runner, host, port).start()
+    logger.info(f"📈 Метрики: http://{host}:{port}/metrics")
+
+
+async def stop_server():
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
@@ -1,48 +1,25 @@
 # migrate_db.py
-import sqlite3
-import os
+import logging
+
+import database
+from migrations import MIGRATIONS, migrate, current_version
 
 def migrate_database():
-    """Добавляет отделы в существующую базу данных"""
+    """Применяет недостающие миграции схемы (то же делает init_db при старте бота)"""
     print("Миграция базы данных...")
-    
-    conn = sqlite3.connect('data/contests.db')
-    c = conn.cursor()
-    
-    # 1. Создаем таблицу отделов если её нет
-    c.execute('''CREATE TABLE IF NOT EXISTS departments
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  name TEXT UNIQUE NOT NULL)''')
-    
-    # 2. Добавляем поле department_id в таблицу конкурсов если его нет
-    c.execute("PRAGMA table_info(contests)")
-    columns = [col[1] for col in c.fetchall()]
-    
-    if 'department_id' not in columns:
-        c.execute("ALTER TABLE contests ADD COLUMN department_id INTEGER")
-        print("✅ Добавлено поле department_id в таблицу contests")
-    
-    # 3. Добавляем стандартные отделы
-    default_departments = [
-        "Пожарная безопасность",
-        "Судомодельные",
-        "Шашки",
-        "БПЛА",
-        "Автомодельные соревнования",
-        "Робототехника"
-    ]
-    
-    for dept in default_departments:
-        c.execute("INSERT OR IGNORE INTO departments (name) VALUES (?)", (dept,))
-    
-    # 4. Обновляем существующие конкурсы (ставим им department_id = 1 по умолчанию)
-    c.execute("UPDATE contests SET department_id = 1 WHERE department_id IS NULL")
-    
-    conn.commit()
-    conn.close()
-    print("✅ Миграция завершена успешно!")
-    print("✅ Все конкурсы привязаны к отделу 'Пожарная безопасность'")
-    print("⚠️  Не забудь вручную поправить department_id у конкурсов!")
+
+    conn = database.get_connection()
+    before = current_version(conn)
+    applied = migrate(conn)
+
+    print(f"Версия схемы: {before} -> {current_version(conn)} (последняя: {MIGRATIONS[-1][0]})")
+    for number, name, _ in MIGRATIONS:
+        if number in applied:
+            print(f"✅ {number}: {name}")
+    if not applied:
+        print("✅ Схема уже актуальна")
+    database.close_db()
 
 if __name__ == "__main__":
-    migrate_database()
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO)
+    migrate_database()
@@ -0,0 +1,310 @@
+# migrations.py
+"""
+Версионированные миграции схемы data/contests.db.
+Применённые версии записываются в schema_version, при старте (database.init_db)
+выполняются только новые, каждая - в своей транзакции: упавшая миграция
+откатывается целиком и не оставляет схему наполовину изменённой.
+Новая миграция - функция _mNNN_... и строка в конце списка MIGRATIONS;
+уже выпущенные миграции не редактируются.
+Все миграции идемпотентны: базы, созданные до появления schema_version
+(старый init_db и migrate_db.py), проходят их с первой версии без потерь.
+Вручную: python migrate_db.py
+"""
+
+import logging
+import os
+import sqlite3
+import time
+
+import database
+
+logger = logging.getLogger("migrations")
+
+
+def _columns(c, table: str) -> set:
+    c.execute(f"PRAGMA table_info({table})")
+    return {col[1] for col in c.fetchall()}
+
+
+def _add_columns(c, table: str, columns: list):
+    existing = _columns(c, table)
+    for column, ddl in columns:
+        if column not in existing:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+DEFAULT_DEPARTMENTS = [
+    "Пожарная безопасность",
+    "Судомодельные",
+    "Шашки",
+    "БПЛА",
+    "Автомодельные соревнования",
+    "Робототехника",
+]
+
+LEGACY_USERS_DB = "bot.db"  # пользователи жили в отдельной базе до миграции 6
+
+CONTESTS_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_contests_file_hash ON contests(file_hash)",
+    "CREATE INDEX IF NOT EXISTS idx_contests_file_path ON contests(file_path)",
+    "CREATE INDEX IF NOT EXISTS idx_contests_dept_day ON contests(department_id, contest_day DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_contests_created ON contests(created_date)",
+]
+
+
+# ---------------- МИГРАЦИИ ----------------
+def _m001_base(c):
+    """Отделы, конкурсы, кэши текста и ответов ИИ, FSM (схема старого init_db)"""
+    c.execute('''CREATE TABLE IF NOT EXISTS departments
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  name TEXT UNIQUE NOT NULL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS contests
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  title TEXT NOT NULL,
+                  contest_date TEXT NOT NULL,
+                  file_name TEXT,
+                  file_path TEXT,
+                  department_id INTEGER,
+                  created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  FOREIGN KEY (department_id) REFERENCES departments(id))''')
+    # Базы до появления отделов (бывший migrate_db.py)
+    _add_columns(c, "contests", [("department_id", "INTEGER")])
+    c.executemany("INSERT OR IGNORE INTO departments (name) VALUES (?)", [(name,) for name in DEFAULT_DEPARTMENTS])
+    c.execute("UPDATE contests SET department_id = 1 WHERE department_id IS NULL")
+    # Результаты фоновой обработки PDF
+    _add_columns(c, "contests", [("file_hash", "TEXT"),
+                                 ("page_count", "INTEGER"),
+                                 ("preview_path", "TEXT"),
+                                 ("status", "TEXT NOT NULL DEFAULT 'ready'"),
+                                 ("status_error", "TEXT"),
+                                 ("tg_file_id", "TEXT")])
+    c.execute("CREATE INDEX IF NOT EXISTS idx_contests_file_hash ON contests(file_hash)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_contests_file_path ON contests(file_path)")
+
+    c.execute('''CREATE TABLE IF NOT EXISTS contest_texts
+                 (contest_id INTEGER PRIMARY KEY,
+                  file_hash TEXT NOT NULL,
+                  content TEXT NOT NULL,
+                  created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_contest_texts_hash ON contest_texts(file_hash)")
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS contest_chunks USING fts5
+                 (content, contest_id UNINDEXED, page UNINDEXED,
+                  tokenize = 'unicode61 remove_diacritics 2')''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS ai_answer_cache
+                 (contest_id INTEGER NOT NULL,
+                  file_hash TEXT NOT NULL,
+                  question TEXT NOT NULL,
+                  answer TEXT NOT NULL,
+                  created_at REAL NOT NULL,
+                  last_used REAL NOT NULL,
+                  PRIMARY KEY (contest_id, file_hash, question))''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ai_answer_cache_used ON ai_answer_cache(last_used)")
+
+    c.execute('''CREATE TABLE IF NOT EXISTS fsm_states
+                 (key TEXT PRIMARY KEY,
+                  state TEXT,
+                  data TEXT,
+                  updated_at REAL NOT NULL)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_fsm_states_updated ON fsm_states(updated_at)")
+
+
+def _m002_contest_day(c):
+    """ISO-дата конкурса рядом со свободным текстом и индекс страниц отдела"""
+    _add_columns(c, "contests", [("contest_day", "TEXT NOT NULL DEFAULT ''")])
+    c.execute("SELECT id, contest_date FROM contests WHERE contest_day = ''")
+    days = [(database.parse_contest_day(text), cid) for cid, text in c.fetchall()]
+    c.executemany("UPDATE contests SET contest_day = ? WHERE id = ?", [(day, cid) for day, cid in days if day])
+    # (department_id, ...) покрывает и простые выборки по отделу
+    c.execute(CONTESTS_INDEXES[2])
+
+
+def _m003_contest_search(c):
+    """Полнотекстовый поиск по конкурсам"""
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS contest_search USING fts5
+                 (title, contest_date, department, content,
+                  tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')''')
+    database.fill_contest_search(c)
+
+
+def _m004_file_size(c):
+    """Размер файла положения (хэш и число страниц уже есть)"""
+    _add_columns(c, "contests", [("file_size", "INTEGER")])
+    c.execute("SELECT id, file_path FROM contests WHERE file_size IS NULL AND file_path IS NOT NULL")
+    sizes = [(os.path.getsize(path), cid) for cid, path in c.fetchall() if os.path.exists(path)]
+    c.executemany("UPDATE contests SET file_size = ? WHERE id = ?", sizes)
+    c.execute(CONTESTS_INDEXES[3])
+
+
+def _rebuild_contests(c):
+    """Пересоздать contests с внешним ключом на отдел (в старых базах department_id добавлен ALTER TABLE)"""
+    c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'contests'")
+    row = c.fetchone()
+    seq = row[0] if row else 0
+    c.execute('''CREATE TABLE contests_new
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  title TEXT NOT NULL,
+                  contest_date TEXT NOT NULL,
+                  file_name TEXT,
+                  file_path TEXT,
+                  department_id INTEGER REFERENCES departments(id),
+                  created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  file_hash TEXT,
+                  page_count INTEGER,
+                  preview_path TEXT,
+                  status TEXT NOT NULL DEFAULT 'ready',
+                  status_error TEXT,
+                  tg_file_id TEXT,
+                  contest_day TEXT NOT NULL DEFAULT '',
+                  file_size INTEGER)''')
+    columns = ("id, title, contest_date, file_name, file_path, created_date, file_hash, page_count, "
+               "preview_path, status, status_error, tg_file_id, contest_day, file_size")
+    # ссылки на несуществующие отделы иначе не пройдут проверку ключа
+    c.execute(f'''INSERT INTO contests_new ({columns}, department_id)
+                  SELECT {columns}, (SELECT d.id FROM departments d WHERE d.id = contests.department_id)
+                  FROM contests''')
+    c.execute("DROP TABLE contests")
+    c.execute("ALTER TABLE contests_new RENAME TO contests")
+    c.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'contests'", (seq,))
+    for sql in CONTESTS_INDEXES:
+        c.execute(sql)
+
+
+def _m005_foreign_keys(c):
+    """Конкурс ссылается на отдел; кэши текста и ответов ИИ - на конкурс и удаляются вместе с ним"""
+    c.execute("PRAGMA foreign_key_list(contests)")
+    if not c.fetchall():
+        _rebuild_contests(c)
+
+    c.execute('''CREATE TABLE contest_texts_new
+                 (contest_id INTEGER PRIMARY KEY REFERENCES contests(id) ON DELETE CASCADE,
+                  file_hash TEXT NOT NULL,
+                  content TEXT NOT NULL,
+                  created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    c.execute('''INSERT INTO contest_texts_new (contest_id, file_hash, content, created_date)
+                 SELECT contest_id, file_hash, content, created_date FROM contest_texts
+                 WHERE contest_id IN (SELECT id FROM contests)''')
+    c.execute("DROP TABLE contest_texts")
+    c.execute("ALTER TABLE contest_texts_new RENAME TO contest_texts")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_contest_texts_hash ON contest_texts(file_hash)")
+
+    c.execute('''CREATE TABLE ai_answer_cache_new
+                 (contest_id INTEGER NOT NULL REFERENCES contests(id) ON DELETE CASCADE,
+                  file_hash TEXT NOT NULL,
+                  question TEXT NOT NULL,
+                  answer TEXT NOT NULL,
+                  created_at REAL NOT NULL,
+                  last_used REAL NOT NULL,
+                  PRIMARY KEY (contest_id, file_hash, question))''')
+    c.execute('''INSERT INTO ai_answer_cache_new
+                 SELECT contest_id, file_hash, question, answer, created_at, last_used FROM ai_answer_cache
+                 WHERE contest_id IN (SELECT id FROM contests)''')
+    c.execute("DROP TABLE ai_answer_cache")
+    c.execute("ALTER TABLE ai_answer_cache_new RENAME TO ai_answer_cache")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ai_answer_cache_used ON ai_answer_cache(last_used)")
+    # FTS-таблицы внешних ключей не поддерживают - чистим осиротевшие фрагменты вручную
+    c.execute("DELETE FROM contest_chunks WHERE contest_id NOT IN (SELECT id FROM contests)")
+
+
+def _import_legacy_users(c):
+    """Перенести пользователей из старого bot.db (сам файл не трогаем)"""
+    if not os.path.exists(LEGACY_USERS_DB):
+        return
+    legacy = sqlite3.connect(f"file:{LEGACY_USERS_DB}?mode=ro", uri=True)
+    try:
+        columns = {col[1] for col in legacy.execute("PRAGMA table_info(users)")}
+        if not columns:
+            return
+        last_seen = "last_seen" if "last_seen" in columns else "NULL"
+        message_count = "message_count" if "message_count" in columns else "0"
+        rows = legacy.execute(f"SELECT user_id, username, first_seen, {last_seen}, {message_count} FROM users").fetchall()
+    finally:
+        legacy.close()
+    c.executemany("INSERT OR IGNORE INTO users (user_id, username, first_seen, last_seen, message_count) "
+                  "VALUES (?, ?, ?, ?, ?)", rows)
+    logger.info(f"👥 Из {LEGACY_USERS_DB} перенесено пользователей: {len(rows)}, файл больше не используется")
+
+
+def _m006_users(c):
+    """Пользователи и вопросы ИИ в общей базе: кто и о каком конкурсе спрашивал"""
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                 (user_id INTEGER PRIMARY KEY,
+                  username TEXT,
+                  first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  last_seen TIMESTAMP,
+                  message_count INTEGER NOT NULL DEFAULT 0)''')
+    # user_id без внешнего ключа: активность пользователей пишется в БД пачками, позже вопроса
+    c.execute('''CREATE TABLE IF NOT EXISTS ai_questions
+                 (id INTEGER PRIMARY KEY,
+                  user_id INTEGER NOT NULL,
+                  contest_id INTEGER NOT NULL REFERENCES contests(id) ON DELETE CASCADE,
+                  source TEXT NOT NULL,
+                  asked_at REAL NOT NULL)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ai_questions_contest ON ai_questions(contest_id, user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ai_questions_user ON ai_questions(user_id)")
+    _import_legacy_users(c)
+
+
+def _m007_shared_state(c):
+    """Общее состояние процессов бота (режим sharded): чёрный список, настройки и счётчик изменений"""
+    c.execute('''CREATE TABLE IF NOT EXISTS blocked_users
+                 (entry TEXT PRIMARY KEY,
+                  added_at REAL NOT NULL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS bot_settings
+                 (key TEXT PRIMARY KEY,
+                  value TEXT NOT NULL)''')
+    # одна строка; растёт при каждом изменении общих данных, процессы сверяют её раз в секунду
+    c.execute('''CREATE TABLE IF NOT EXISTS shared_state
+                 (id INTEGER PRIMARY KEY CHECK (id = 1),
+                  version INTEGER NOT NULL)''')
+    c.execute("INSERT OR IGNORE INTO shared_state (id, version) VALUES (1, 0)")
+
+
+MIGRATIONS = [
+    (1, "base", _m001_base),
+    (2, "contest_day", _m002_contest_day),
+    (3, "contest_search", _m003_contest_search),
+    (4, "file_size", _m004_file_size),
+    (5, "foreign_keys", _m005_foreign_keys),
+    (6, "users", _m006_users),
+    (7, "shared_state", _m007_shared_state),
+]
+
+
+# ---------------- RUNNER ----------------
+def current_version(conn) -> int:
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version
+                    (version INTEGER PRIMARY KEY,
+                     name TEXT NOT NULL,
+                     applied_at REAL NOT NULL)''')
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(conn) -> list:
+    """Применить недостающие миграции; вернуть список применённых версий"""
+    version = current_version(conn)
+    applied = []
+    for number, name, func in MIGRATIONS:
+        if number <= version:
+            continue
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        # несколько процессов (shard.py) могут стартовать одновременно: миграцию применяет первый
+        if conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0] >= number:
+            conn.rollback()
+            continue
+        try:
+            func(conn.cursor())
+            conn.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                         (number, name, time.time()))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception(f"❌ Миграция {number} ({name}) не применена")
+            raise
+        applied.append(number)
+        logger.info(f"🛠 Миграция {number} ({name}) применена за {time.perf_counter() - started:.2f} с")
+
+    for table, rowid, parent, _ in conn.execute("PRAGMA foreign_key_check"):
+        logger.warning(f"Нарушение внешнего ключа: {table} rowid={rowid} -> {parent}")
+    return applied
@@ -0,0 +1,112 @@
+# pdf_pipeline.py
+"""
+Фоновая обработка загруженных положений.
+После подтверждения загрузки админом PDF обрабатывается в пуле процессов
+pdf_worker (проверка, текст, превью, хэш, число страниц), результат пишется в БД,
+а админ получает уведомление. Event loop на PyMuPDF не блокируется.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from database import (run_db, set_contest_processed, get_processed_by_hash, get_contest_text,
+                      save_contest_text, copy_contest_chunks)
+from pdf_tools import save_contest_index
+from pdf_worker import pdf_worker
+
+logger = logging.getLogger("pdf_pipeline")
+
+MAX_JOBS_KEPT = 50  # сколько последних задач показывать в /jobs
+
+_tasks = set()
+jobs = OrderedDict()  # id задачи -> UploadJob
+_job_ids = iter(range(1, 10 ** 9))
+
+
+class UploadJob:
+    def __init__(self, contest_id: int, title: str):
+        self.id = next(_job_ids)
+        self.contest_id = contest_id
+        self.title = title
+        self.status = "queued"      # queued -> running -> done / error
+        self.error = None
+        self.page_count = None
+        self.previews = []
+        self.reused = False         # результат скопирован у конкурса с тем же файлом
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def duration(self) -> float:
+        return (self.finished_at or time.time()) - self.created_at
+
+
+async def _reuse_processed(job: UploadJob, file_hash: str) -> bool:
+    """Такой же файл уже обработан для другого конкурса - копируем результат без разбора PDF"""
+    source = await run_db(get_processed_by_hash, file_hash, job.contest_id)
+    if source is None:
+        return False
+    source_id, page_count, preview = source
+    cached = await run_db(get_contest_text, source_id)
+    if cached is None:
+        return False
+    await run_db(copy_contest_chunks, source_id, job.contest_id)
+    await run_db(save_contest_text, job.contest_id, file_hash, cached[1])
+    await run_db(set_contest_processed, job.contest_id, "ready", file_hash, page_count, preview)
+    job.page_count = page_count
+    job.previews = [preview] if preview and os.path.exists(preview) else []
+    job.reused = True
+    return True
+
+
+async def _run(job: UploadJob, file_path: str, notify, file_hash: str = None):
+    try:
+        job.status = "running"
+        if not (file_hash and await _reuse_processed(job, file_hash)):
+            result = await pdf_worker.process(file_path)
+            await run_db(save_contest_index, job.contest_id, result["file_hash"], result["pages"])
+            preview = result["previews"][0] if result["previews"] else None
+            await run_db(set_contest_processed, job.contest_id, "ready",
+                         result["file_hash"], result["page_count"], preview)
+            job.page_count = result["page_count"]
+            job.previews = result["previews"]
+        job.status = "done"
+    except Exception as e:
+        job.status = "error"
+        job.error = str(e)
+        logger.error(f"Ошибка обработки PDF конкурса {job.contest_id}: {e}")
+        try:
+            await run_db(set_contest_processed, job.contest_id, "error", None, None, None, job.error)
+        except Exception as db_error:
+            logger.error(f"Не удалось сохранить статус обработки: {db_error}")
+    job.finished_at = time.time()
+    if notify is not None:
+        try:
+            await notify(job)
+        except Exception as e:
+            logger.error(f"Не удалось уведомить о завершении обработки: {e}")
+
+
+def submit_upload(contest_id: int, title: str, file_path: str, notify=None, file_hash: str = None) -> UploadJob:
+    """Поставить PDF в фоновую обработку; notify(job) вызывается по завершении.
+
+    Если известен хэш и такой файл уже обрабатывался, PDF повторно не разбирается.
+    """
+    job = UploadJob(contest_id, title)
+    jobs[job.id] = job
+    while len(jobs) > MAX_JOBS_KEPT:
+        jobs.popitem(last=False)
+    task = asyncio.create_task(_run(job, file_path, notify, file_hash))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+
+
+async def shutdown():
+    """Дождаться запущенных обработок и остановить пул процессов"""
+    if _tasks:
+        await asyncio.wait(list(_tasks), timeout=60)
+    await pdf_worker.close()
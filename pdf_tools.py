@@ -0,0 +1,133 @@
+# pdf_tools.py
+"""
+Работа с PDF положений: хэш файла, извлечение текста, кэш текста в БД
+и локальный полнотекстовый индекс фрагментов (SQLite FTS5, ранжирование BM25).
+PDF разбирается один раз (в пуле процессов pdf_worker), дальше ИИ получает
+из индекса только фрагменты, относящиеся к вопросу.
+"""
+
+import asyncio
+import re
+import weakref
+
+from database import (run_db, get_contest_index_state, get_text_by_hash, save_contest_text, save_contest_chunks,
+                      copy_contest_chunks, search_contest_chunks, get_first_chunks)
+from pdf_worker import pdf_worker, file_sha256
+
+CHUNK_SIZE = 800  # примерный размер фрагмента в символах
+TOP_K = 4         # сколько фрагментов отправлять ИИ
+
+# Слова, которые есть почти в любом вопросе и только размывают поиск
+STOP_WORDS = {
+    "как", "какой", "какая", "какие", "каком", "какую", "когда", "где", "что", "чем", "кто",
+    "это", "для", "или", "при", "над", "под", "про", "без", "так", "уже", "ещё", "еще",
+    "можно", "нужно", "надо", "ли", "есть", "быть", "будет", "конкурс", "конкурса", "конкурсе",
+}
+
+
+def split_chunks(pages: list, size: int = CHUNK_SIZE) -> list:
+    """Разбить страницы на фрагменты ~size символов по границам строк: [(page, text)]"""
+    chunks = []
+    for page_no, page_text in enumerate(pages, 1):
+        current = ""
+        for line in page_text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            current = f"{current} {line}" if current else line
+            if len(current) >= size:
+                chunks.append((page_no, current))
+                current = ""
+        if current:
+            chunks.append((page_no, current))
+    return chunks
+
+
+def save_contest_index(contest_id: int, file_hash: str, pages: list) -> str:
+    """Положить уже извлечённый текст в кэш и построить индекс фрагментов"""
+    content = "\n".join(pages)  # без разделителя слова на стыке страниц склеиваются
+    save_contest_chunks(contest_id, split_chunks(pages))
+    save_contest_text(contest_id, file_hash, content)
+    return content
+
+
+# ---------------- ПОИСК КОНТЕКСТА ----------------
+def _stem(word: str) -> str:
+    """Окончания русских слов отрезаем грубо (вместо стемминга), чтобы
+    "участников" находило "участники" и "участия"."""
+    return word[:max(4, len(word) - 3)] if len(word) > 5 else word
+
+
+def build_match_query(question: str) -> str:
+    """FTS5-запрос из вопроса: значимые слова с префиксным поиском через OR"""
+    terms = []
+    for word in re.findall(r"\w+", question.lower()):
+        if len(word) < 3 or word in STOP_WORDS:
+            continue
+        term = f'"{_stem(word)}"*'
+        if term not in terms:
+            terms.append(term)
+    return " OR ".join(terms)
+
+
+def build_search_query(text: str) -> str:
+    """FTS5-запрос для поиска конкурсов: все слова обязательны, каждое - префиксом.
+
+    Однобуквенные слова пропускаем, короткие ищем целиком ("3д*", "бпла*").
+    """
+    terms = []
+    for word in re.findall(r"\w+", text.lower()):
+        if len(word) < 2:
+            continue
+        term = f'"{_stem(word)}"*'
+        if term not in terms:
+            terms.append(term)
+    return " ".join(terms)
+
+
+def select_context(contest_id: int, question: str, top_k: int = TOP_K) -> list:
+    """Top-k фрагментов уже проиндексированного положения для вопроса: [(page, text)]"""
+    query = build_match_query(question)
+    chunks = search_contest_chunks(contest_id, query, top_k) if query else []
+    if not chunks:
+        chunks = get_first_chunks(contest_id, top_k)
+    return chunks
+
+
+# ---------------- ASYNC API ----------------
+# contest_id -> Lock, чтобы не строить индекс одного положения дважды; запись живёт,
+# пока лок кто-то держит или ждёт, и удаляется сама
+_index_locks = weakref.WeakValueDictionary()
+
+
+async def ensure_contest_index(contest_id: int, file_path: str) -> str:
+    """Текст положения из кэша; для конкурсов без индекса строим его один раз.
+
+    Если такой же файл (по хэшу) уже разбирался для другого конкурса,
+    повторно PDF не открываем. Разбор идёт в пуле процессов.
+    Скан без текстового слоя даёт пустой текст и ни одного фрагмента - это тоже
+    готовый индекс: заново разбираем, только если у конкурса сменился хэш файла.
+    """
+    lock = _index_locks.get(contest_id)
+    if lock is None:
+        lock = _index_locks[contest_id] = asyncio.Lock()
+    async with lock:
+        cached = await run_db(get_contest_index_state, contest_id)
+        if cached is not None:
+            text_hash, content, contest_hash, has_chunks = cached
+            if (has_chunks or not content.strip()) and contest_hash in (None, text_hash):
+                return content
+        file_hash = await asyncio.to_thread(file_sha256, file_path)
+        same_file = await run_db(get_text_by_hash, file_hash)
+        if same_file is not None and same_file[0] != contest_id:
+            source_id, content = same_file
+            await run_db(copy_contest_chunks, source_id, contest_id)
+            await run_db(save_contest_text, contest_id, file_hash, content)
+            return content
+        pages = await pdf_worker.extract_text(file_path)
+        return await run_db(save_contest_index, contest_id, file_hash, pages)
+
+
+async def select_context_async(contest_id: int, file_path: str, question: str, top_k: int = TOP_K) -> list:
+    await ensure_contest_index(contest_id, file_path)
+    return await run_db(select_context, contest_id, question, top_k)
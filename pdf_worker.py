@@ -0,0 +1,234 @@
+# pdf_worker.py
+"""
+Сервис работы с PDF в отдельных процессах.
+Весь PyMuPDF (текст, рендер страниц, метаданные) выполняется в ProcessPoolExecutor:
+разбор большого положения не останавливает обработку апдейтов и раскладывается
+по ядрам. Очередь ограничена, у каждой задачи есть таймаут, у документа - лимит страниц.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz  # PyMuPDF
+
+from config import PDF_WORKERS, PDF_QUEUE_SIZE, PDF_JOB_TIMEOUT, PDF_MAX_PAGES
+
+logger = logging.getLogger("pdf_worker")
+
+PREVIEW_DIR = "pdf_previews"
+
+
+class PDFWorkerError(Exception):
+    """Задача не выполнена по причине самого сервиса (очередь, таймаут, сбой процесса)"""
+
+
+class PDFQueueFull(PDFWorkerError):
+    pass
+
+
+class PDFTimeout(PDFWorkerError):
+    pass
+
+
+# ---------------- ФУНКЦИИ, ВЫПОЛНЯЕМЫЕ В ПРОЦЕССАХ ПУЛА ----------------
+def file_sha256(file_path: str) -> str:
+    """SHA-256 содержимого файла (читаем блоками, не целиком)"""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _open_pdf(file_path: str, max_pages: int = PDF_MAX_PAGES):
+    """Открыть и проверить PDF; ValueError, если файл не подходит"""
+    try:
+        doc = fitz.open(file_path)
+    except Exception as e:
+        raise ValueError(f"файл не открывается как PDF: {e}")
+    try:
+        if not doc.is_pdf:
+            raise ValueError("файл не является PDF")
+        if doc.needs_pass:
+            raise ValueError("PDF защищён паролем")
+        if len(doc) == 0:
+            raise ValueError("в PDF нет страниц")
+        if max_pages and len(doc) > max_pages:
+            raise ValueError(f"в PDF {len(doc)} стр., допускается не больше {max_pages}")
+    except Exception:
+        doc.close()
+        raise
+    return doc
+
+
+def pdf_metadata(file_path: str, max_pages: int = PDF_MAX_PAGES) -> dict:
+    """Число страниц и метаданные документа"""
+    with _open_pdf(file_path, max_pages) as doc:
+        meta = doc.metadata or {}
+        return {
+            "page_count": len(doc),
+            "title": meta.get("title") or "",
+            "author": meta.get("author") or "",
+            "created": meta.get("creationDate") or "",
+            "size": os.path.getsize(file_path),
+        }
+
+
+def extract_pages(file_path: str, max_pages: int = PDF_MAX_PAGES) -> list:
+    """Текст PDF постранично"""
+    with _open_pdf(file_path, max_pages) as doc:
+        return [page.get_text() for page in doc]
+
+
+def _render(doc, page_no: int, zoom: float) -> str:
+    pix = doc[page_no].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    path = os.path.join(PREVIEW_DIR, f"{uuid.uuid4().hex}.png")
+    pix.save(path)
+    return path
+
+
+def render_page(file_path: str, page_no: int = 0, zoom: float = 1.0, max_pages: int = PDF_MAX_PAGES) -> str:
+    """PNG одной страницы; возвращает путь к картинке"""
+    with _open_pdf(file_path, max_pages) as doc:
+        if not 0 <= page_no < len(doc):
+            raise ValueError(f"нет страницы {page_no + 1}, в PDF {len(doc)} стр.")
+        return _render(doc, page_no, zoom)
+
+
+def process_pdf(file_path: str, preview_pages: int = 1, max_pages: int = PDF_MAX_PAGES) -> dict:
+    """Полная обработка загруженного PDF за одно открытие файла.
+
+    Проверяет файл, извлекает текст постранично, делает превью и считает хэш.
+    Ничего не пишет в БД.
+    """
+    with _open_pdf(file_path, max_pages) as doc:
+        pages = [page.get_text() for page in doc]
+        previews = []
+        for i in range(min(preview_pages, len(doc))):
+            try:
+                previews.append(_render(doc, i, 1.0))
+            except Exception as e:
+                logger.error(f"Ошибка генерации превью PDF: {e}")
+    return {
+        "file_hash": file_sha256(file_path),
+        "page_count": len(pages),
+        "pages": pages,
+        "previews": previews,
+    }
+
+
+# ---------------- СЕРВИС ----------------
+class PDFWorker:
+    """Пул процессов для PDF с ограниченной очередью и таймаутом на задачу.
+
+    Одновременно выполняется не больше workers задач, ждать может не больше
+    queue_size; остальные сразу получают PDFQueueFull. Зависшую задачу
+    нельзя отменить внутри процесса, поэтому по таймауту пул перезапускается,
+    а задачи, попавшие под перезапуск, выполняются повторно один раз.
+    """
+
+    def __init__(self, workers: int = PDF_WORKERS, queue_size: int = PDF_QUEUE_SIZE,
+                 timeout: float = PDF_JOB_TIMEOUT):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor = None
+        self._slots = asyncio.Semaphore(workers)
+        self._queued = 0
+        self._running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _restart(self, executor):
+        """Убить процессы пула; следующий вызов создаст новый"""
+        if self._executor is not executor:
+            return  # уже перезапущен другой задачей
+        self._executor = None
+        self.restarts += 1
+        # у ProcessPoolExecutor нет публичного способа остановить занятый процесс
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, func, args, retry: bool = True):
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(executor, func, *args), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._restart(executor)
+            raise PDFTimeout(f"обработка PDF заняла больше {self.timeout:.0f} с")
+        except BrokenProcessPool:
+            self._restart(executor)
+            if not retry:
+                raise PDFWorkerError("процесс обработки PDF аварийно завершился")
+            return await self._run(func, args, retry=False)
+
+    async def submit(self, func, *args):
+        """Выполнить func(*args) в пуле процессов с учётом очереди и таймаута"""
+        if self._queued >= self.queue_size:
+            self.rejected += 1
+            raise PDFQueueFull("очередь обработки PDF переполнена, попробуйте позже")
+        self._queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+        self._running += 1
+        try:
+            result = await self._run(func, args)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._running -= 1
+            self._slots.release()
+
+    # ---------------- ASYNC API ----------------
+    async def metadata(self, file_path: str) -> dict:
+        return await self.submit(pdf_metadata, file_path)
+
+    async def extract_text(self, file_path: str) -> list:
+        return await self.submit(extract_pages, file_path)
+
+    async def render_page(self, file_path: str, page_no: int = 0, zoom: float = 1.0) -> str:
+        return await self.submit(render_page, file_path, page_no, zoom)
+
+    async def process(self, file_path: str, preview_pages: int = 1) -> dict:
+        return await self.submit(process_pdf, file_path, preview_pages)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": self._queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+        }
+
+    async def close(self):
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, True)
+
+
+pdf_worker = PDFWorker()
@@ -0,0 +1,350 @@
+# shard.py
+"""
+Режим sharded: апдейты обрабатывают несколько процессов (SHARD_WORKERS).
+Главный процесс только принимает апдейты - webhook, если задан WEBHOOK_URL,
+иначе getUpdates - и раскладывает их по очередям обработчиков по id чата.
+Все апдейты одного чата попадают в один процесс, поэтому их порядок сохраняется,
+а кэш FSM (SQLiteStorage), антифлуд и кэш поиска остаются согласованными.
+Внутри процесса апдейты одного чата идут строго по очереди, разных чатов - параллельно.
+Общее у процессов - база (WAL), файлы contests_files/ и shared_state.py.
+AI_MAX_IN_FLIGHT и PDF_WORKERS делятся между процессами (config.py); пользователь
+пишет боту из своего чата, поэтому правило "один вопрос ИИ в очереди" соблюдается
+внутри его процесса. Очередь ИИ, счётчики кэша ответов и метрики - у каждого процесса
+свои (/stats показывает процесс чата админа, метрики - на METRICS_PORT + номер).
+Запуск: BOT_MODE=sharded python main.py
+"""
+
+import asyncio
+import hmac
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from aiohttp import web
+from aiogram import Bot
+
+import database
+from config import (TOKEN, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+                    SHARD_WORKERS, SHARD_QUEUE_SIZE, SHARD_MAX_CONCURRENT)
+from log_setup import stop_logging
+
+logger = logging.getLogger("shard")
+
+BATCH_SIZE = 100        # сколько апдейтов обработчик забирает из очереди за раз
+START_TIMEOUT = 120     # сколько ждать готовности обработчиков при запуске (сек)
+SHUTDOWN_TIMEOUT = 30   # сколько ждать, пока обработчики доделают очереди (сек)
+MONITOR_INTERVAL = 5    # как часто проверять, что обработчики живы (сек)
+POLL_TIMEOUT = 30       # long polling getUpdates (сек)
+
+
+# ---------------- РАСПРЕДЕЛЕНИЕ ----------------
+def shard_key(update: dict) -> int:
+    """Id чата апдейта; у inline-запросов и прочего без чата - id пользователя"""
+    for event in update.values():
+        if not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+    return update.get("update_id", 0)
+
+
+class ChatSequencer:
+    """Апдейты одного чата - строго по очереди, разных чатов - параллельно (не больше max_concurrent)"""
+
+    def __init__(self, handle, max_concurrent: int = SHARD_MAX_CONCURRENT):
+        self.handle = handle
+        self.max_pending = max_concurrent * 10
+        self.processed = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._tails = {}    # чат -> задача его последнего апдейта
+        self._tasks = set()
+
+    async def submit(self, key: int, update: dict):
+        """Поставить апдейт за предыдущим апдейтом того же чата; ждёт, если незавершённых слишком много"""
+        while len(self._tasks) >= self.max_pending:
+            await asyncio.wait(self._tasks, return_when=asyncio.FIRST_COMPLETED)
+        task = asyncio.create_task(self._run(key, self._tails.get(key), update))
+        self._tails[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: int, previous, update: dict):
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])  # ошибка предыдущего апдейта не мешает следующему
+            async with self._semaphore:
+                await self.handle(update)
+            self.processed += 1
+        except Exception as e:
+            logger.error(f"Ошибка обработки апдейта {update.get('update_id')}: {e}")
+        finally:
+            if self._tails.get(key) is asyncio.current_task():
+                del self._tails[key]
+
+    async def drain(self):
+        while self._tasks:
+            await asyncio.wait(self._tasks)
+
+
+# ---------------- ОБРАБОТЧИК ----------------
+def _take(updates) -> list:
+    """Забрать из очереди пачку апдейтов (блокирующе, в потоке)"""
+    try:
+        items = [updates.get(timeout=1)]
+    except queue.Empty:
+        return []
+    while len(items) < BATCH_SIZE and items[-1] is not None:
+        try:
+            items.append(updates.get_nowait())
+        except queue.Empty:
+            break
+    return items
+
+
+async def _worker(index: int, updates, events, build):
+    bot, dp = build()
+    database.init_db()
+    workflow = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+    await dp.emit_startup(bot=bot, **workflow)
+
+    async def handle(update: dict):
+        await dp.feed_raw_update(bot, update, dispatcher=dp, bots=[bot])
+
+    sequencer = ChatSequencer(handle)
+    events.put(("ready", index, dp.resolve_used_update_types()))
+    logger.info(f"Обработчик {index} (pid {os.getpid()}) готов")
+
+    loop = asyncio.get_running_loop()
+    parent = multiprocessing.parent_process()
+    running = True
+    try:
+        while running:
+            items = await loop.run_in_executor(None, _take, updates)
+            if not items and parent is not None and not parent.is_alive():
+                logger.error(f"Обработчик {index}: главный процесс завершился")
+                break
+            for item in items:
+                if item is None:  # сигнал остановки от главного процесса
+                    running = False
+                    break
+                await sequencer.submit(*item)
+    finally:
+        await sequencer.drain()
+        await dp.emit_shutdown(bot=bot, **workflow)
+        await bot.session.close()
+        database.close_db()
+        events.put(("done", index, sequencer.processed))
+
+
+def _worker_main(index: int, updates, events, build):
+    # Останавливает обработчик главный процесс (None в очереди) - после того, как очередь разобрана
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    try:
+        asyncio.run(_worker(index, updates, events, build))
+    finally:
+        stop_logging()
+
+
+class ShardPool:
+    """Процессы-обработчики и их очереди.
+
+    build - функция без аргументов, возвращающая (bot, dispatcher); передаётся
+    в процессы по имени, поэтому должна быть объявлена на уровне модуля.
+    """
+
+    def __init__(self, build, workers: int = SHARD_WORKERS, queue_size: int = SHARD_QUEUE_SIZE):
+        self.build = build
+        self._ctx = multiprocessing.get_context("spawn")
+        self.events = self._ctx.Queue()
+        self.queues = [self._ctx.Queue(queue_size) for _ in range(workers)]
+        self.processes = [None] * workers
+        self.allowed_updates = None
+        self.stopping = False
+
+    def _spawn(self, index: int):
+        # config обработчика читает номер из окружения: свои файлы логов, порт метрик и доля лимитов
+        os.environ["BOT_WORKER_ID"] = str(index)
+        os.environ["BOT_WORKER_COUNT"] = str(len(self.queues))
+        try:
+            process = self._ctx.Process(target=_worker_main, name=f"bot-worker-{index}",
+                                        args=(index, self.queues[index], self.events, self.build))
+            process.start()
+        finally:
+            os.environ.pop("BOT_WORKER_ID", None)
+            os.environ.pop("BOT_WORKER_COUNT", None)
+        self.processes[index] = process
+
+    async def start(self):
+        """Запустить обработчики и дождаться, пока все выполнят startup"""
+        for index in range(len(self.queues)):
+            self._spawn(index)
+        loop = asyncio.get_running_loop()
+        ready = set()
+        while len(ready) < len(self.queues):
+            kind, index, payload = await loop.run_in_executor(None, self.events.get, True, START_TIMEOUT)
+            if kind == "ready":
+                ready.add(index)
+                self.allowed_updates = payload
+
+    def put_nowait(self, update: dict):
+        """Отдать апдейт обработчику его чата; queue.Full, если очередь обработчика заполнена"""
+        key = shard_key(update)
+        self.queues[key % len(self.queues)].put_nowait((key, update))
+
+    async def put(self, update: dict):
+        """То же, но с ожиданием места в очереди"""
+        while True:
+            try:
+                return self.put_nowait(update)
+            except queue.Full:
+                await asyncio.sleep(0.05)
+
+    async def monitor(self):
+        """Перезапускать упавшие обработчики; их очередь и чаты остаются за ними"""
+        while True:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if not self.stopping and not process.is_alive():
+                    logger.error(f"Обработчик {index} завершился (код {process.exitcode}), перезапускаем")
+                    self._spawn(index)
+
+    async def stop(self) -> dict:
+        """Остановить обработчики, дав им разобрать очереди; вернуть номер -> сколько апдейтов обработал"""
+        self.stopping = True
+        return await asyncio.get_running_loop().run_in_executor(None, self._stop)
+
+    def _stop(self) -> dict:
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for updates in self.queues:
+            try:
+                updates.put(None, timeout=SHUTDOWN_TIMEOUT)
+            except queue.Full:
+                pass
+        done = {}
+        while len(done) < len(self.processes) and time.monotonic() < deadline:
+            try:
+                kind, index, payload = self.events.get(timeout=1)
+            except queue.Empty:
+                if not any(p.is_alive() for i, p in enumerate(self.processes) if i not in done):
+                    break
+                continue
+            if kind == "done":
+                done[index] = payload
+        for index, process in enumerate(self.processes):
+            process.join(max(1, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.error(f"Обработчик {index} не остановился за {SHUTDOWN_TIMEOUT} с, завершаем")
+                process.terminate()
+                process.join()
+        # неразобранные апдейты упавших обработчиков не должны держать выход из процесса
+        for updates in self.queues:
+            updates.cancel_join_thread()
+        return done
+
+
+# ---------------- ГЛАВНЫЙ ПРОЦЕСС ----------------
+async def _serve_webhook(bot: Bot, pool: ShardPool, stop: asyncio.Event):
+    if not WEBHOOK_SECRET:
+        raise ValueError("Для webhook нужен WEBHOOK_SECRET")
+
+    async def handle(request: web.Request) -> web.Response:
+        secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(secret, WEBHOOK_SECRET):
+            return web.Response(status=401)
+        try:
+            pool.put_nowait(await request.json())
+        except queue.Full:
+            logger.warning("Очередь обработчика переполнена, Telegram повторит доставку")
+            return web.Response(status=503)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    await bot.set_webhook(f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}", secret_token=WEBHOOK_SECRET,
+                          allowed_updates=pool.allowed_updates, max_connections=100)
+    logger.info(f"✅ Webhook-сервер слушает {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+
+
+async def _poll(bot: Bot, pool: ShardPool, stop: asyncio.Event):
+    offset = None
+
+    async def poll_loop():
+        nonlocal offset
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT,
+                                                allowed_updates=pool.allowed_updates)
+            except Exception as e:
+                logger.error(f"Ошибка getUpdates: {e}")
+                await asyncio.sleep(5)
+                continue
+            for update in updates:
+                await pool.put(update.model_dump(mode="json", exclude_none=True))
+                offset = update.update_id + 1
+
+    task = asyncio.create_task(poll_loop())
+    logger.info("✅ Получаем апдейты через getUpdates")
+    try:
+        await stop.wait()
+    finally:
+        task.cancel()
+        if offset is not None:
+            # подтвердить уже розданные апдейты, чтобы после перезапуска они не пришли снова
+            try:
+                await bot.get_updates(offset=offset, timeout=0, limit=1)
+            except Exception as e:
+                logger.error(f"Не удалось подтвердить апдейты: {e}")
+
+
+async def _front(build, workers: int):
+    pool = ShardPool(build, workers)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    bot = Bot(token=TOKEN)
+    monitor = None
+    try:
+        await pool.start()
+        logger.info(f"✅ Запущено обработчиков: {workers}")
+        monitor = asyncio.create_task(pool.monitor())
+        if WEBHOOK_URL:
+            await _serve_webhook(bot, pool, stop)
+        else:
+            await _poll(bot, pool, stop)
+    finally:
+        if monitor is not None:
+            monitor.cancel()
+        done = await pool.stop()
+        logger.info(f"Обработчики остановлены, обработано апдейтов: {sum(done.values())}")
+        await bot.session.close()
+
+
+def run_sharded(build, workers: int = SHARD_WORKERS):
+    """Точка входа режима sharded: main.py передаёт свою build_dispatcher"""
+    # Миграции - один раз, до запуска обработчиков
+    database.init_db()
+    database.close_db()
+    try:
+        asyncio.run(_front(build, workers))
+    finally:
+        stop_logging()
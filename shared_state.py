@@ -0,0 +1,86 @@
+# shared_state.py
+"""
+Общее состояние нескольких процессов бота (режим sharded, shard.py).
+Чёрный список /troll и настройки (грубый режим ИИ) хранятся в базе, у каждого
+процесса - копия в памяти, поэтому хендлеры и антифлуд не ходят за ними в БД.
+Любое изменение увеличивает счётчик в таблице shared_state; процесс раз в
+SHARED_STATE_POLL секунд сверяет его со своим и при расхождении перечитывает
+чёрный список и настройки, а каталог (catalog.py) сбрасывает через data_version.
+В обычном режиме работает так же, просто других процессов нет.
+"""
+
+import asyncio
+import logging
+
+import database
+import throttling
+from config import SHARED_STATE_POLL
+
+logger = logging.getLogger("shared_state")
+
+SECRET_MODE = "secret_mode"
+
+# Копия таблицы bot_settings: ключ -> строка
+settings = {}
+
+
+def get_flag(key: str) -> bool:
+    return settings.get(key) == "1"
+
+
+async def set_flag(key: str, value: bool):
+    settings[key] = "1" if value else "0"
+    await database.run_db(database.set_setting, key, settings[key])
+
+
+def _load():
+    # версию читаем первой: изменение между запросами просто даст ещё одно перечитывание
+    return database.get_state_version(), database.load_blocked_users(), database.load_settings()
+
+
+class SharedStateWatcher:
+    """Фоновая сверка общего состояния с базой"""
+
+    def __init__(self, poll_interval: float = SHARED_STATE_POLL):
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self._task = None
+
+    async def start(self):
+        await self.reload()
+        self._task = asyncio.create_task(self._poll_loop())
+        logger.info(f"Общее состояние загружено: заблокированных {len(throttling.blocked_users)}, "
+                    f"настроек {len(settings)}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def reload(self):
+        version, blocked, loaded = await database.run_db(_load)
+        # множества и словари заменяем на месте: другие модули держат ссылки на них
+        throttling.blocked_users.clear()
+        throttling.blocked_users.update(blocked)
+        settings.clear()
+        settings.update(loaded)
+        database.state_version = version
+        self.reloads += 1
+
+    async def check(self):
+        """Перечитать состояние, если его изменил другой процесс"""
+        version = await database.run_db(database.get_state_version)
+        if version == database.state_version:
+            return False
+        database.data_version += 1  # каталог перечитается при следующем обращении
+        await self.reload()
+        logger.debug(f"Общее состояние обновлено до версии {version}")
+        return True
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Ошибка сверки общего состояния: {e}")
@@ -0,0 +1,84 @@
+# tg_stream.py
+"""
+Постепенный вывод потокового ответа в одно сообщение Telegram.
+Входящие куски текста копятся в буфере, а сообщение правится не чаще
+одного раза за интервал на чат, поэтому число вызовов editMessageText
+на ответ ограничено длительностью генерации, а не её длиной.
+"""
+
+import asyncio
+import logging
+import time
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message
+
+from config import AI_EDIT_INTERVAL
+
+logger = logging.getLogger("tg_stream")
+
+# Когда в чате можно делать следующую правку (общая для всех потоков чата).
+# Прошедшие моменты ничего не ограничивают и удаляются после каждого ответа
+_next_edit_at = {}
+
+
+def _prune(now: float):
+    for chat_id in [c for c, at in _next_edit_at.items() if at <= now]:
+        del _next_edit_at[chat_id]
+
+
+class StreamingMessage:
+    def __init__(self, message: Message, interval: float = AI_EDIT_INTERVAL, cursor: str = " ⏳"):
+        self.message = message
+        self.interval = interval
+        self.cursor = cursor
+        self.text = ""
+        self.edits = 0
+        self._shown = message.text or ""
+
+    def _can_edit(self) -> bool:
+        return time.monotonic() >= _next_edit_at.get(self.message.chat.id, 0)
+
+    async def _edit(self, text: str, **kwargs) -> bool:
+        chat_id = self.message.chat.id
+        try:
+            await self.message.edit_text(text, **kwargs)
+        except TelegramRetryAfter as e:
+            # Флуд-контроль: в этом чате ждём столько, сколько просит Telegram
+            _next_edit_at[chat_id] = time.monotonic() + e.retry_after
+            return False
+        except TelegramBadRequest as e:
+            logger.warning(f"Не удалось отредактировать сообщение: {e}")
+            return False
+        _next_edit_at[chat_id] = time.monotonic() + self.interval
+        self._shown = text
+        self.edits += 1
+        return True
+
+    async def push(self, delta: str):
+        """Добавить кусок ответа; сообщение обновится, если интервал уже прошёл"""
+        self.text += delta
+        if self._can_edit() and self.text.strip():
+            await self._edit(self.text + self.cursor)
+
+    async def finish(self, text: str = None, **kwargs) -> bool:
+        """Финальная правка (без курсора, с клавиатурой): дожидается разрешённого момента"""
+        try:
+            return await self._finish(text, **kwargs)
+        finally:
+            _prune(time.monotonic())
+
+    async def _finish(self, text: str = None, **kwargs) -> bool:
+        if text is not None:
+            self.text = text
+        if self.text == self._shown and not kwargs:
+            return True
+        for _ in range(2):
+            delay = _next_edit_at.get(self.message.chat.id, 0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if await self._edit(self.text, **kwargs):
+                return True
+            if self._can_edit():
+                return False  # не флуд-контроль, повтор не поможет
+        return False
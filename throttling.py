@@ -0,0 +1,182 @@
+# throttling.py
+"""
+Антифлуд: token bucket на каждого пользователя и вид запроса.
+У пользователя три независимые корзины - вопросы ИИ, скачивание положений
+и всё остальное, поэтому спам кнопками не отнимает у него вопросы к ИИ и наоборот.
+Каждый запрос забирает токен, токены пополняются с постоянной скоростью;
+пустая корзина - апдейт отбрасывается до фильтров и хендлеров.
+Здесь же применяется чёрный список /troll (проверка по множеству, O(1)); сам список
+хранится в базе, копию в памяти обновляет shared_state.py.
+"""
+
+import logging
+import time
+
+from aiogram import BaseMiddleware, types
+
+import database
+import metrics
+from callbacks import ContestsCallback, ContestAction, AICallback, AIAction
+from config import (ADMIN_ID,
+                    THROTTLE_AI_BURST, THROTTLE_AI_PER_MIN,
+                    THROTTLE_DOWNLOAD_BURST, THROTTLE_DOWNLOAD_PER_MIN,
+                    THROTTLE_GENERIC_BURST, THROTTLE_GENERIC_PER_MIN)
+
+logger = logging.getLogger("throttling")
+
+AI = "ai"
+DOWNLOAD = "download"
+GENERIC = "generic"
+
+# вид запроса -> (ёмкость корзины, токенов в секунду)
+LIMITS = {
+    AI: (THROTTLE_AI_BURST, THROTTLE_AI_PER_MIN / 60),
+    DOWNLOAD: (THROTTLE_DOWNLOAD_BURST, THROTTLE_DOWNLOAD_PER_MIN / 60),
+    GENERIC: (THROTTLE_GENERIC_BURST, THROTTLE_GENERIC_PER_MIN / 60),
+}
+
+AI_BUTTON = "❓ Задать вопрос"
+AI_QUESTION_STATE = "AIStates:waiting_question"  # handlers.AI.AIStates.waiting_question.state
+# Кнопки, которые отправляют PDF положения: скачивание и выбор конкурса для вопроса ИИ
+DOWNLOAD_PREFIXES = tuple(
+    callback.pack().rsplit(callback.__separator__, 1)[0] + callback.__separator__
+    for callback in (ContestsCallback(action=ContestAction.DOWNLOAD), AICallback(action=AIAction.SELECT))
+)
+
+WARN_INTERVAL = 10        # не чаще раза в N секунд сообщаем пользователю об ограничении
+CLEANUP_EVERY = 1000      # раз в столько апдейтов удаляем корзины, которые уже полные
+
+# Чёрный список /troll: id (int) и "@username" в нижнем регистре (копия таблицы blocked_users)
+blocked_users = set()
+
+throttled_total = metrics.Counter("bot_throttled_total", "Апдейты, отброшенные антифлудом", ("kind",))
+
+
+async def block_user(user) -> str:
+    """Добавить в чёрный список id или @username; вернуть сохранённое значение"""
+    if isinstance(user, str) and user.startswith("@"):
+        user = user.lower()
+    else:
+        user = int(user)
+    await database.run_db(database.add_blocked_user, user)
+    blocked_users.add(user)
+    return user
+
+
+def is_blocked(user: types.User) -> bool:
+    if user.id in blocked_users:
+        return True
+    return bool(user.username) and f"@{user.username.lower()}" in blocked_users
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated", "warned")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+        self.warned = 0.0
+
+    def take(self, capacity: float, rate: float, now: float) -> bool:
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self, rate: float) -> float:
+        """Через сколько секунд появится следующий токен"""
+        return (1 - self.tokens) / rate if rate else float("inf")
+
+
+class Throttler:
+    """Корзины всех пользователей: словарь (user_id, вид) -> TokenBucket"""
+
+    def __init__(self, limits: dict = LIMITS):
+        self.limits = limits
+        self.buckets = {}
+        self._calls = 0
+
+    def take(self, user_id: int, kind: str, now: float = None):
+        """(разрешено, корзина)"""
+        now = time.monotonic() if now is None else now
+        capacity, rate = self.limits[kind]
+        key = (user_id, kind)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(capacity, now)
+        allowed = bucket.take(capacity, rate, now)
+
+        self._calls += 1
+        if self._calls >= CLEANUP_EVERY:
+            self._calls = 0
+            self.cleanup(now)
+        return allowed, bucket
+
+    def cleanup(self, now: float):
+        """Полная корзина ничем не отличается от новой - её можно забыть"""
+        stale = []
+        for (user_id, kind), bucket in self.buckets.items():
+            capacity, rate = self.limits[kind]
+            if bucket.tokens + (now - bucket.updated) * rate >= capacity:
+                stale.append((user_id, kind))
+        for key in stale:
+            del self.buckets[key]
+
+
+def classify(event, raw_state: str = None) -> str:
+    """Вид запроса для выбора корзины"""
+    if isinstance(event, types.CallbackQuery):
+        if event.data and event.data.startswith(DOWNLOAD_PREFIXES):
+            return DOWNLOAD
+        return GENERIC
+    if getattr(event, "text", None) == AI_BUTTON or raw_state == AI_QUESTION_STATE:
+        return AI
+    return GENERIC
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Outer-middleware на message, callback_query и inline_query: чёрный список и лимиты до фильтров и хендлеров"""
+
+    def __init__(self, throttler: Throttler):
+        self.throttler = throttler
+
+    async def __call__(self, handler, event, data):
+        user = getattr(event, "from_user", None)
+        if user is None or user.id == ADMIN_ID:
+            return await handler(event, data)
+
+        if is_blocked(user):
+            throttled_total.inc("blocked")
+            logger.debug(f"Апдейт от заблокированного {user.id} отброшен")
+            return None
+
+        kind = classify(event, data.get("raw_state"))
+        allowed, bucket = self.throttler.take(user.id, kind)
+        if allowed:
+            return await handler(event, data)
+
+        throttled_total.inc(kind)
+        if isinstance(event, types.InlineQuery):
+            return None  # inline-запрос без ответа Telegram просто не покажет результатов
+        now = time.monotonic()
+        if now - bucket.warned >= WARN_INTERVAL:
+            bucket.warned = now
+            logger.info(f"Антифлуд: {user.id} превысил лимит {kind}", extra={"user_id": user.id, "kind": kind})
+            wait = max(1, round(bucket.retry_after(self.throttler.limits[kind][1])))
+            text = f"⏳ Слишком часто. Попробуйте через {wait} с."
+            try:
+                if isinstance(event, types.CallbackQuery):
+                    await event.answer(text, show_alert=False)
+                else:
+                    await event.answer(text)
+            except Exception as e:
+                logger.debug(f"Не удалось предупредить {user.id}: {e}")
+        elif isinstance(event, types.CallbackQuery):
+            # без ответа у кнопки крутятся часики; answerCallbackQuery сообщений не отправляет
+            try:
+                await event.answer()
+            except Exception:
+                pass
+        return None
@@ -0,0 +1,146 @@
+# tracing.py
+"""
+Трассировка апдейтов и профилирование медленных хендлеров.
+Middleware выполняет каждый хендлер пошагово и считает, сколько времени он реально
+занимал event loop (CPU), а сколько ждал ввода-вывода (БД, Telegram, DeepSeek) - это
+дёшево и пишется в лог для всех апдейтов. cProfile дорогой, поэтому включается по порогу:
+после апдейта медленнее TRACE_SLOW_MS следующие TRACE_PROFILE_NEXT вызовов того же
+хендлера выполняются под профилятором (плюс случайная доля TRACE_PROFILE_RATE, по
+умолчанию 0). Профилятор работает только на шагах этого хендлера, чужие задачи в профиль
+не попадают. Профили медленных вызовов сохраняются в TRACE_PROFILE_DIR с именем
+хендлера и типом апдейта; сам первый медленный вызов профиля не имеет - только тайминги.
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import time
+from datetime import datetime
+
+from aiogram import BaseMiddleware
+
+import metrics
+from config import TRACE_SLOW_MS, TRACE_PROFILE_NEXT, TRACE_PROFILE_RATE, TRACE_PROFILE_DIR
+
+logger = logging.getLogger("trace")
+
+PROFILE_TOP = 40  # сколько строк pstats писать в текстовый отчёт
+
+handler_busy_seconds = metrics.Histogram("bot_handler_busy_seconds",
+                                         "Время, которое хендлер занимал event loop (без ожидания I/O)",
+                                         ("handler",))
+slow_updates_total = metrics.Counter("bot_slow_updates_total", "Апдейты медленнее TRACE_SLOW_MS", ("handler",))
+
+
+class _TracedCoroutine:
+    """Выполняет корутину шаг за шагом, замеряя время каждого шага.
+
+    Между шагами корутина ждёт I/O, поэтому сумма шагов - чистое время на CPU.
+    """
+
+    def __init__(self, coro, profiler: cProfile.Profile = None):
+        self.coro = coro
+        self.profiler = profiler
+        self.busy = 0.0
+        self.steps = 0
+
+    def _step(self, value, exc):
+        started = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+        try:
+            if exc is not None:
+                return self.coro.throw(exc)
+            return self.coro.send(value)
+        finally:
+            if self.profiler is not None:
+                self.profiler.disable()
+            self.busy += time.perf_counter() - started
+            self.steps += 1
+
+    def __await__(self):
+        value, exc = None, None
+        while True:
+            try:
+                future = self._step(value, exc)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                value, exc = (yield future), None
+            except GeneratorExit:
+                self.coro.close()
+                raise
+            except BaseException as e:  # в т.ч. CancelledError - пробрасываем в хендлер
+                value, exc = None, e
+
+
+def _save_profile(profiler: cProfile.Profile, handler_name: str, update_type: str, wall: float) -> str:
+    os.makedirs(TRACE_PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    base = os.path.join(TRACE_PROFILE_DIR, f"{stamp}_{update_type}_{handler_name}")
+    profiler.dump_stats(f"{base}.prof")
+    report = io.StringIO()
+    report.write(f"{handler_name} ({update_type}), {wall * 1000:.0f} мс\n\n")
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(PROFILE_TOP)
+    with open(f"{base}.txt", "w", encoding="utf-8") as f:
+        f.write(report.getvalue())
+    return f"{base}.prof"
+
+
+class TracingMiddleware(BaseMiddleware):
+    """Время хендлера: полное, на CPU и в ожидании I/O; профиль медленных апдейтов"""
+
+    def __init__(self, update_type: str, slow_ms: float = TRACE_SLOW_MS, profile_next: int = TRACE_PROFILE_NEXT,
+                 profile_rate: float = TRACE_PROFILE_RATE):
+        self.update_type = update_type
+        self.slow = slow_ms / 1000
+        self.profile_next = profile_next
+        self.profile_rate = profile_rate
+        self._armed = {}  # хендлер -> сколько ещё его вызовов профилировать
+
+    def _want_profile(self, name: str) -> bool:
+        left = self._armed.get(name, 0)
+        if left > 0:
+            if left == 1:
+                del self._armed[name]
+            else:
+                self._armed[name] = left - 1
+            return True
+        return self.profile_rate > 0 and random.random() < self.profile_rate
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        profiler = cProfile.Profile() if self._want_profile(name) else None
+        traced = _TracedCoroutine(handler(event, data), profiler)
+        started = time.perf_counter()
+        try:
+            return await traced
+        finally:
+            wall = time.perf_counter() - started
+            handler_busy_seconds.observe(name, value=traced.busy)
+            fields = {
+                "handler": name,
+                "update_type": self.update_type,
+                "user_id": getattr(getattr(event, "from_user", None), "id", None),
+                "wall_ms": round(wall * 1000, 1),
+                "cpu_ms": round(traced.busy * 1000, 1),
+                "io_ms": round((wall - traced.busy) * 1000, 1),
+                "steps": traced.steps,
+            }
+            if wall >= self.slow:
+                slow_updates_total.inc(name)
+                if profiler is not None:
+                    try:
+                        fields["profile"] = _save_profile(profiler, name, self.update_type, wall)
+                    except Exception as e:
+                        logger.error(f"Не удалось сохранить профиль {name}: {e}")
+                elif self.profile_next > 0:
+                    # профиля нет - снимем его на следующих вызовах этого хендлера
+                    self._armed[name] = self.profile_next
+                logger.warning(f"Медленный хендлер {name}", extra=fields)
+            else:
+                logger.debug(f"Хендлер {name}", extra=fields)
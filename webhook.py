@@ -0,0 +1,97 @@
+# webhook.py
+"""
+Режим webhook: Telegram сам присылает апдейты на наш aiohttp-сервер.
+Запрос проверяется по секретному токену (X-Telegram-Bot-Api-Secret-Token),
+Telegram получает ответ сразу, а апдейт обрабатывается в фоне. Одновременно
+обрабатывается не больше max_concurrent апдейтов; если очередь слишком
+длинная, отвечаем 503 и Telegram повторит доставку позже.
+"""
+
+import asyncio
+import logging
+import signal
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from config import (WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+                    WEBHOOK_MAX_CONCURRENT)
+
+logger = logging.getLogger("webhook")
+
+SHUTDOWN_TIMEOUT = 30  # сколько ждать незавершённые апдейты при остановке (сек)
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str,
+                 max_concurrent: int = WEBHOOK_MAX_CONCURRENT, **data):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_concurrent * 10
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def _background_feed_update(self, bot: Bot, update: dict) -> None:
+        async with self._semaphore:
+            try:
+                await super()._background_feed_update(bot, update)
+            except Exception as e:
+                logger.error(f"Ошибка обработки апдейта {update.get('update_id')}: {e}")
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        if len(self._background_feed_update_tasks) >= self.max_pending:
+            logger.warning("Очередь апдейтов переполнена, Telegram повторит доставку")
+            return web.Response(status=503)
+        return await super()._handle_request_background(bot, request)
+
+    async def close(self) -> None:
+        """Дождаться уже принятых апдейтов, затем закрыть сессию бота"""
+        pending = list(self._background_feed_update_tasks)
+        if pending:
+            logger.info(f"Ждём завершения {len(pending)} апдейтов...")
+            await asyncio.wait(pending, timeout=SHUTDOWN_TIMEOUT)
+        await super().close()
+
+
+def build_app(dp: Dispatcher, bot: Bot, secret_token: str = WEBHOOK_SECRET,
+              path: str = WEBHOOK_PATH, **data) -> web.Application:
+    app = web.Application()
+    LimitedRequestHandler(dp, bot, secret_token=secret_token, **data).register(app, path=path)
+    setup_application(app, dp, bot=bot, **data)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    if not WEBHOOK_URL or not WEBHOOK_SECRET:
+        raise ValueError("Для режима webhook нужны WEBHOOK_URL и WEBHOOK_SECRET")
+
+    app = build_app(dp, bot)
+
+    async def set_webhook(app: web.Application):
+        await bot.set_webhook(
+            f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=min(WEBHOOK_MAX_CONCURRENT, 100),
+        )
+        logger.info(f"Webhook установлен: {WEBHOOK_URL}{WEBHOOK_PATH}")
+
+    app.on_startup.append(set_webhook)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    logger.info(f"✅ Webhook-сервер слушает {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+    try:
+        await stop.wait()
+    finally:
+        # Webhook не снимаем: пока бот перезапускается, Telegram копит апдейты у себя
+        await runner.cleanup()